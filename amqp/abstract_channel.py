@@ -6,6 +6,7 @@ import logging
 from vine import ensure_promise, promise
 
 from .exceptions import AMQPNotImplementedError, RecoverableConnectionError
+from .method_framing import METHOD_TEMPLATES
 from .serialization import dumps, loads
 
 __all__ = ('AbstractChannel',)
@@ -65,9 +66,14 @@ class AbstractChannel:
         conn = self.connection
         if conn is None:
             raise RecoverableConnectionError('connection already closed')
-        args = dumps(format, args) if format else ''
+        write_method = getattr(conn.frame_writer, 'write_method', None)
         try:
-            conn.frame_writer(1, self.channel_id, sig, args, content)
+            if format and content is None and write_method is not None \
+                    and METHOD_TEMPLATES.get(sig) == format:
+                write_method(self.channel_id, sig, args)
+            else:
+                args = dumps(format, args) if format else ''
+                conn.frame_writer(1, self.channel_id, sig, args, content)
         except StopIteration:
             raise RecoverableConnectionError('connection already closed')
 
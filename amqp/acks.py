@@ -0,0 +1,121 @@
+"""Coalesced message acknowledgements."""
+from time import monotonic
+
+__all__ = ('AckBatcher',)
+
+
+class AckBatcher:
+    """Acknowledge messages with as few ``basic_ack`` frames as possible.
+
+    Acks given to :meth:`ack` are held back and sent as a single
+    ``basic_ack(tag, multiple=True)`` covering the contiguous range of
+    delivery tags settled so far, once ``max_pending`` acks are held,
+    ``max_delay`` seconds after the oldest one, before the connection
+    blocks waiting for more frames, or when the channel is closed.
+
+    Acks after a gap, that is a message not settled yet, cannot be
+    covered by ``multiple`` without acking that message too: they are
+    kept until the gap is filled, and sent one by one if they have to
+    be flushed before that.
+
+    Note:
+        Every message delivered on the channel must be settled through
+        the batcher, with :meth:`ack` or :meth:`reject`, and the batcher
+        must be created before consuming from the channel. Do not use it
+        on channels with ``no_ack`` consumers.
+
+    Example::
+
+        batcher = AckBatcher(channel, max_pending=100, max_delay=0.1)
+
+        def on_message(message):
+            handle(message)
+            batcher.ack(message.delivery_tag)
+    """
+
+    def __init__(self, channel, max_pending=100, max_delay=0.1):
+        self.channel = channel
+        self.max_pending = max_pending
+        self.max_delay = max_delay
+        #: Highest delivery tag up to which all messages are settled.
+        self.settled_up_to = 0
+        #: Tags acked but not sent yet.
+        self.pending = set()
+        # tags after a gap that are settled already.
+        self._settled = set()
+        self._oldest = None
+        channel.ack_batcher = self
+        channel.connection.before_read.add(self.flush)
+
+    def __len__(self):
+        return len(self.pending)
+
+    def ack(self, delivery_tag):
+        """Acknowledge message, the ack may be sent later."""
+        if delivery_tag <= self.settled_up_to:
+            return
+        if not self.pending:
+            self._oldest = monotonic()
+        self.pending.add(delivery_tag)
+        if len(self.pending) >= self.max_pending:
+            self._send_contiguous()
+            if len(self.pending) >= self.max_pending:
+                self.flush()
+        elif monotonic() - self._oldest >= self.max_delay:
+            self.flush()
+
+    def reject(self, delivery_tag, requeue=True):
+        """Reject message, this is sent right away."""
+        self.channel.basic_reject(delivery_tag, requeue)
+        self._settled.add(delivery_tag)
+        self._send_contiguous()
+
+    def flush(self):
+        """Send all acks held back."""
+        self._send_contiguous()
+        if self.pending:
+            basic_ack = self.channel.basic_ack
+            for tag in sorted(self.pending):
+                basic_ack(tag)
+            self._settled.update(self.pending)
+            self.pending.clear()
+        self._oldest = None
+
+    def close(self):
+        """Send all acks held back and detach from the channel."""
+        self.flush()
+        if self.channel.ack_batcher is self:
+            self.channel.ack_batcher = None
+        connection = self.channel.connection
+        if connection is not None:
+            connection.before_read.discard(self.flush)
+
+    def reset(self):
+        """Forget the delivery tags, when the channel is reopened.
+
+        The broker starts counting delivery tags from 1 again on the new
+        channel, and the acks held back cannot be sent on it.
+        """
+        self.settled_up_to = 0
+        self.pending.clear()
+        self._settled.clear()
+        self._oldest = None
+
+    def _send_contiguous(self):
+        pending, settled = self.pending, self._settled
+        tag = self.settled_up_to
+        last_ack = None
+        while True:
+            if tag + 1 in pending:
+                pending.remove(tag + 1)
+                last_ack = tag + 1
+            elif tag + 1 in settled:
+                settled.remove(tag + 1)
+            else:
+                break
+            tag += 1
+        self.settled_up_to = tag
+        if last_ack is not None:
+            self.channel.basic_ack(last_ack, multiple=True)
+        if not pending:
+            self._oldest = None
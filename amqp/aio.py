@@ -0,0 +1,535 @@
+"""AMQP connections for :mod:`asyncio`.
+
+:class:`AsyncConnection` and :class:`AsyncChannel` run the same protocol
+code as :class:`~amqp.connection.Connection` and
+:class:`~amqp.channel.Channel` (:mod:`~amqp.spec`,
+:mod:`~amqp.serialization` and :mod:`~amqp.method_framing`), but frames
+are received by an :class:`asyncio.BufferedProtocol` and dispatched
+from the event loop, and the methods waiting for a reply are coroutines.
+"""
+import asyncio
+import inspect
+import ssl
+from collections import defaultdict
+
+from . import spec
+from .channel import Channel
+from .connection import Connection
+from .exceptions import (ConnectionForced, MessageNacked,
+                         RecoverableConnectionError)
+from .protocol import queue_declare_ok_t
+from .transport import (AMQP_PORT, AMQP_PROTOCOL_HEADER, RECV_CHUNK_SIZE,
+                        RecvBuffer, _AbstractTransport, _frozen,
+                        to_host_port)
+
+__all__ = ('AsyncConnection', 'AsyncChannel', 'AsyncTransport')
+
+
+class AsyncTransport(asyncio.BufferedProtocol):
+    """Protocol receiving the frames of an :class:`AsyncConnection`.
+
+    Data is received straight into a :class:`~amqp.transport.RecvBuffer`
+    and every complete frame is passed to the connection frame handler.
+    Writes go to the :mod:`asyncio` transport, which buffers them: use
+    :meth:`drain` to wait until the peer catches up. Buffers the frame
+    writers reuse are copied first, as the transport may keep a
+    reference to them until they are sent.
+    """
+
+    read_buffered_frame = _AbstractTransport.read_buffered_frame
+    _sendfile = _AbstractTransport._sendfile
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.transport = None
+        self.connected = False
+        self.body_target = None
+        self.zero_copy_body = connection.zero_copy_body
+        self._read_buffer = RecvBuffer()
+        #: False while the asyncio write buffer is above its high-water
+        #: mark, see :meth:`pause_writing`.
+        self.writable = True
+        self._drain_waiters = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.connected = True
+        transport.write(AMQP_PROTOCOL_HEADER)
+
+    def connection_lost(self, exc):
+        self.connected = False
+        self._wake_drain_waiters(
+            exc or RecoverableConnectionError('connection already closed'))
+        self.connection._on_connection_lost(exc)
+
+    def get_buffer(self, sizehint):
+        rbuf = self._read_buffer
+        return rbuf.reserve(len(rbuf) + RECV_CHUNK_SIZE)
+
+    def buffer_updated(self, nbytes):
+        self._read_buffer.commit(nbytes)
+        connection = self.connection
+        try:
+            on_inbound_frame = connection.on_inbound_frame
+            frame = self.read_buffered_frame()
+            while frame is not None:
+                on_inbound_frame(frame)
+                if not self.connected:
+                    break
+                frame = self.read_buffered_frame()
+        except Exception as exc:
+            connection._on_connection_error(exc)
+
+    def eof_received(self):
+        # close the transport.
+        return False
+
+    def pause_writing(self):
+        self._set_writable(False)
+
+    def resume_writing(self):
+        self._set_writable(True)
+        self._wake_drain_waiters()
+
+    def _set_writable(self, writable):
+        self.writable = writable
+        callback = self.connection.on_writability_changed
+        if callback is not None:
+            callback(writable)
+
+    def _wake_drain_waiters(self, exc=None):
+        waiters, self._drain_waiters = self._drain_waiters, []
+        for waiter in waiters:
+            if not waiter.done():
+                if exc is None:
+                    waiter.set_result(None)
+                else:
+                    waiter.set_exception(exc)
+
+    async def drain(self):
+        """Wait until the write buffer is below its high-water mark."""
+        if not self.connected:
+            raise RecoverableConnectionError('connection already closed')
+        if not self.writable:
+            waiter = asyncio.get_running_loop().create_future()
+            self._drain_waiters.append(waiter)
+            await waiter
+
+    def write(self, s):
+        self.transport.write(_frozen(s))
+
+    _write = write
+
+    def writev(self, buffers):
+        self.transport.writelines([_frozen(s) for s in buffers])
+
+    def sendfile(self, file, offset, count):
+        self._sendfile(file, offset, count)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+        self.connected = False
+
+
+class _AsyncWaitMixin:
+    """Waiting for replies without blocking the event loop."""
+
+    async def wait(self, method, callback=None, timeout=None,
+                   returns_tuple=False):
+        conn = self.connection
+        if conn is None:
+            raise RecoverableConnectionError('connection already closed')
+        future = asyncio.get_running_loop().create_future()
+
+        def on_reply(*args):
+            if future.done():
+                return
+            try:
+                if callback is not None:
+                    callback(*args)
+            except Exception as exc:
+                future.set_exception(exc)
+            else:
+                future.set_result(args)
+
+        pending = self._pending
+        if not isinstance(method, list):
+            method = [method]
+        prev = [pending.get(m) for m in method]
+        for m in method:
+            pending[m] = on_reply
+        waiters = conn._waiters[self.channel_id]
+        waiters.add(future)
+        try:
+            args = await asyncio.wait_for(future, timeout)
+        finally:
+            waiters.discard(future)
+            for i, m in enumerate(method):
+                if prev[i] is not None:
+                    pending[m] = prev[i]
+                else:
+                    pending.pop(m, None)
+        args = args[1:]  # We are not returning method back
+        return args if returns_tuple else (args and args[0])
+
+
+class AsyncChannel(_AsyncWaitMixin, Channel):
+    """Channel of an :class:`AsyncConnection`.
+
+    The methods waiting for a reply are coroutines. Those inherited from
+    :class:`~amqp.channel.Channel` that return the reply as received
+    (``exchange_declare``, ``queue_bind``, ``basic_qos``...) return an
+    awaitable when a reply is expected.
+
+    Callbacks given to :meth:`basic_consume` are called from the event
+    loop, coroutine functions are run as tasks.
+    """
+
+    async def open(self):
+        """Open the channel."""
+        if self.is_open:
+            return
+        self.send_method(spec.Channel.Open, 's', ('',))
+        await self.wait(spec.Channel.OpenOk)
+
+    def _do_revive(self):
+        # reopened in the background, _on_open_ok marks it open again.
+        self.is_open = False
+        self._reset_confirms(self.channel_id)
+        self._discard_get_many()
+        if self.ack_batcher is not None:
+            self.ack_batcher.reset()
+        self.send_method(spec.Channel.Open, 's', ('',))
+
+    async def close(self, reply_code=0, reply_text='', method_sig=(0, 0),
+                    argsig='BsBB'):
+        """Request a channel close and wait for the confirmation."""
+        try:
+            if self.connection is None:
+                return
+            if self.connection.channels is None:
+                return
+            if not self.is_open:
+                return
+            if self.ack_batcher is not None:
+                self.ack_batcher.close()
+
+            self.is_closing = True
+            self.send_method(
+                spec.Channel.Close, argsig,
+                (reply_code, reply_text, method_sig[0], method_sig[1]),
+            )
+            return await self.wait(spec.Channel.CloseOk)
+        finally:
+            self.is_closing = False
+            self.connection = None
+
+    async def queue_declare(self, queue='', passive=False, durable=False,
+                            exclusive=False, auto_delete=True, nowait=False,
+                            arguments=None, argsig='BsbbbbbF'):
+        """Declare queue, see :meth:`amqp.channel.Channel.queue_declare`."""
+        self.send_method(
+            spec.Queue.Declare, argsig,
+            (0, queue, passive, durable, exclusive, auto_delete,
+             nowait, arguments),
+        )
+        if not nowait:
+            return queue_declare_ok_t(*await self.wait(
+                spec.Queue.DeclareOk, returns_tuple=True,
+            ))
+
+    async def basic_consume(self, queue='', consumer_tag='', no_local=False,
+                            no_ack=False, exclusive=False, nowait=False,
+                            callback=None, arguments=None, on_cancel=None,
+                            argsig='BssbbbbF'):
+        """Start a queue consumer and return its consumer tag.
+
+        See :meth:`amqp.channel.Channel.basic_consume`.
+        """
+        if nowait and not consumer_tag:
+            raise ValueError(
+                'Consumer tag must be specified when nowait is True'
+            )
+        callback = _task_callback(callback)
+
+        def on_consume_ok(method_sig, consumer_tag):
+            # deliveries may follow in the same read, before we resume.
+            self.callbacks[consumer_tag] = callback
+            if on_cancel:
+                self.cancel_callbacks[consumer_tag] = on_cancel
+            if no_ack:
+                self.no_ack_consumers.add(consumer_tag)
+
+        self.send_method(
+            spec.Basic.Consume, argsig,
+            (
+                0, queue, consumer_tag, no_local, no_ack, exclusive,
+                nowait, arguments
+            ),
+        )
+        if nowait:
+            on_consume_ok(spec.Basic.ConsumeOk, consumer_tag)
+            return consumer_tag
+        return await self.wait(spec.Basic.ConsumeOk, callback=on_consume_ok)
+
+    async def basic_get(self, queue='', no_ack=False, argsig='Bsb'):
+        """Get a message, or :const:`None` if the queue is empty."""
+        self.send_method(spec.Basic.Get, argsig, (0, queue, no_ack))
+        ret = await self.wait(
+            [spec.Basic.GetOk, spec.Basic.GetEmpty], returns_tuple=True,
+        )
+        if not ret or len(ret) < 2:
+            return self._on_get_empty(*ret)
+        return self._on_get_ok(*ret)
+
+    def basic_get_many(self, *args, **kwargs):
+        """Not supported, as it blocks reading the replies."""
+        raise NotImplementedError(
+            'basic_get_many is not supported by AsyncChannel')
+
+    async def _basic_publish(self, msg, exchange='', routing_key='',
+                             mandatory=False, immediate=False, timeout=None,
+                             argsig='Bssbb'):
+        """Publish a message.
+
+        Returns once the message is handed to the transport, waiting
+        for at most ``timeout`` seconds for its write buffer to drain.
+        """
+        conn = self.connection
+        if conn is None:
+            raise RecoverableConnectionError(
+                'basic_publish: connection closed')
+        self.send_method(
+            spec.Basic.Publish, argsig,
+            (0, exchange, routing_key, mandatory, immediate), msg
+        )
+        if self.next_publish_seq_no:
+            self.next_publish_seq_no += 1
+        await asyncio.wait_for(conn.transport.drain(), timeout)
+
+    basic_publish = _basic_publish
+
+    async def basic_publish_confirm(self, *args, **kwargs):
+        """Publish a message and wait for the broker to confirm it."""
+        confirm_timeout = kwargs.pop('confirm_timeout', None)
+
+        def confirm_handler(method, *args):
+            # When RMQ nacks message we are raising MessageNacked exception
+            if method == spec.Basic.Nack:
+                raise MessageNacked()
+
+        if not self._confirm_selected:
+            self._confirm_selected = True
+            await self.confirm_select()
+        await self._basic_publish(*args, **kwargs)
+        timeout = confirm_timeout or kwargs.get('timeout', None)
+        await self.wait([spec.Basic.Ack, spec.Basic.Nack],
+                        callback=confirm_handler, timeout=timeout)
+
+
+def _task_callback(callback):
+    if not inspect.iscoroutinefunction(callback):
+        return callback
+
+    def run_task(message):
+        return asyncio.ensure_future(callback(message))
+    return run_task
+
+
+class AsyncConnection(_AsyncWaitMixin, Connection):
+    """Connection to an AMQP broker driven by the :mod:`asyncio` loop.
+
+    Takes the same arguments as :class:`~amqp.connection.Connection`.
+    ``ssl`` can be :const:`True`, an :class:`ssl.SSLContext` or a
+    dictionary of :func:`ssl.wrap_socket` style options. Streamed
+    message bodies (``stream_body_threshold``) are not supported, nor
+    are :meth:`~amqp.channel.Channel.basic_get_many` and
+    :class:`~amqp.confirms.ConfirmTracker`, which block reading frames.
+
+    Example::
+
+        conn = AsyncConnection('localhost:5672')
+        await conn.connect()
+        channel = await conn.channel()
+        await channel.basic_consume('q', callback=on_message)
+
+    Errors raised while handling a frame are set on the coroutines
+    waiting for a reply on that channel, or on all of them for
+    connection errors. Errors nobody waits for are passed to the event
+    loop exception handler.
+    """
+
+    Channel = AsyncChannel
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.stream_body_threshold is not None:
+            raise ValueError(
+                'stream_body_threshold is not supported by AsyncConnection')
+        self._waiters = defaultdict(set)
+        self._opened = None
+        self._heartbeat_timer = None
+
+    async def connect(self, callback=None):
+        """Connect and wait for the handshake to complete."""
+        if self.connected:
+            return callback() if callback else None
+        loop = asyncio.get_running_loop()
+        self._opened = loop.create_future()
+        host, port = to_host_port(self.host, AMQP_PORT)
+        context, server_hostname = self._ssl_context(host)
+        try:
+            _, self.transport = await asyncio.wait_for(
+                loop.create_connection(
+                    lambda: AsyncTransport(self), host, port,
+                    ssl=context, server_hostname=server_hostname,
+                ),
+                self.connect_timeout,
+            )
+            self.on_inbound_frame = self.frame_handler_cls(
+                self, self.on_inbound_method)
+            self.transport.body_target = getattr(
+                self.on_inbound_frame, 'body_target', None)
+            self.frame_writer = self.frame_writer_cls(self, self.transport)
+            await asyncio.wait_for(
+                asyncio.shield(self._opened), self.connect_timeout)
+        except BaseException:
+            self.collect()
+            raise
+        if callback:
+            callback()
+
+    def _ssl_context(self, host):
+        opts = self.ssl
+        if not opts:
+            return None, None
+        if isinstance(opts, ssl.SSLContext):
+            return opts, host
+        if not isinstance(opts, dict):
+            return ssl.create_default_context(), host
+        context = opts.get('context')
+        if context is None:
+            context = ssl.create_default_context(cafile=opts.get('ca_certs'))
+            if opts.get('certfile'):
+                context.load_cert_chain(opts['certfile'], opts.get('keyfile'))
+            cert_reqs = opts.get('cert_reqs')
+            if cert_reqs is not None:
+                if cert_reqs == ssl.CERT_NONE:
+                    context.check_hostname = False
+                context.verify_mode = cert_reqs
+        return context, opts.get('server_hostname', host)
+
+    def _on_open_ok(self):
+        super()._on_open_ok()
+        if self._opened is not None and not self._opened.done():
+            self._opened.set_result(None)
+        if self.heartbeat:
+            self._schedule_heartbeat()
+
+    def _schedule_heartbeat(self, rate=2):
+        self._heartbeat_timer = asyncio.get_running_loop().call_later(
+            self.heartbeat / rate, self._heartbeat_tick, rate)
+
+    def _heartbeat_tick(self, rate):
+        self._heartbeat_timer = None
+        if not self.connected:
+            return
+        try:
+            self.heartbeat_tick(rate)
+        except ConnectionForced as exc:
+            self._on_connection_error(exc)
+            self._transport.close()
+        else:
+            self._schedule_heartbeat(rate)
+
+    async def channel(self, channel_id=None, callback=None):
+        """Create a new channel, or return the open one with this id."""
+        if self.channels is None:
+            raise RecoverableConnectionError('Connection already closed.')
+
+        try:
+            return self.channels[channel_id]
+        except KeyError:
+            channel = self.Channel(self, channel_id, on_open=callback)
+            await channel.open()
+            return channel
+
+    async def close(self, reply_code=0, reply_text='', method_sig=(0, 0),
+                    argsig='BsBB'):
+        """Request a connection close and wait for the confirmation."""
+        if self._transport is None:
+            # already closed
+            return
+
+        try:
+            self.is_closing = True
+            self.send_method(
+                spec.Connection.Close, argsig,
+                (reply_code, reply_text, method_sig[0], method_sig[1]),
+            )
+            return await self.wait(spec.Connection.CloseOk)
+        except OSError:
+            self.collect()
+            raise
+        finally:
+            self.is_closing = False
+
+    def collect(self):
+        if self._heartbeat_timer is not None:
+            self._heartbeat_timer.cancel()
+            self._heartbeat_timer = None
+        super().collect()
+
+    def drain_events(self, timeout=None):
+        raise NotImplementedError(
+            'Frames are dispatched by the event loop')
+
+    blocking_read = drain_events
+
+    def on_inbound_method(self, channel_id, method_sig, payload, content):
+        try:
+            return super().on_inbound_method(
+                channel_id, method_sig, payload, content)
+        except Exception as exc:
+            if channel_id:
+                self._fail_waiters(exc, channel_id)
+            else:
+                self._on_connection_error(exc)
+
+    def _fail_waiters(self, exc, channel_id=None):
+        if channel_id is None:
+            waiters = [w for ws in self._waiters.values() for w in ws]
+        else:
+            waiters = self._waiters.get(channel_id, ())
+        failed = False
+        for waiter in list(waiters):
+            if not waiter.done():
+                waiter.set_exception(exc)
+                failed = True
+        if not failed:
+            asyncio.get_running_loop().call_exception_handler({
+                'message': 'Unhandled error in AMQP connection',
+                'exception': exc,
+                'connection': self,
+            })
+
+    def _on_connection_error(self, exc):
+        if self._opened is not None and not self._opened.done():
+            self._opened.set_exception(exc)
+            return
+        self._fail_waiters(exc)
+
+    def _on_connection_lost(self, exc):
+        if self._transport is None:
+            return
+        if exc is None:
+            exc = RecoverableConnectionError('Server closed the connection')
+        waiters = [w for ws in self._waiters.values() for w in ws]
+        if any(not w.done() for w in waiters) or \
+                not self._opened.done():
+            self._on_connection_error(exc)
+        self.collect()
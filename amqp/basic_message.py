@@ -1,5 +1,7 @@
 """AMQP Messages."""
 # Copyright (C) 2007-2008 Barry Pederson <bp@barryp.org>
+from collections import deque
+
 from .serialization import GenericContent
 # Intended to fix #85: ImportError: cannot import name spec
 # Encountered on python 2.7.3
@@ -12,7 +14,7 @@ from .serialization import GenericContent
 #   http://stackoverflow.com/a/14216937/4982251
 from .spec import Basic
 
-__all__ = ('Message',)
+__all__ = ('Message', 'BodyReader')
 
 
 class Message(GenericContent):
@@ -20,7 +22,8 @@ class Message(GenericContent):
 
     Expected arg types
 
-        body: string
+        body: string, bytes-like object, file object or iterable
+        body_size: int (length of file object or iterable bodies)
         children: (not supported)
 
     Keyword properties may include:
@@ -71,6 +74,18 @@ class Message(GenericContent):
         Unicode bodies are encoded according to the 'content_encoding'
         argument. If that's None, it's set to 'UTF-8' automatically.
 
+        File objects and iterables of bytes-like chunks are streamed
+        in body frames when the message is published, without loading
+        the whole body in memory. ``body_size`` must give the number of
+        bytes they produce, except for seekable files where it defaults
+        to the size of the file after the current position. Only
+        ``body_size`` bytes are read from file objects, and a seekable
+        file shorter than that raises :exc:`ValueError` before anything
+        is sent. Other bodies turning out to be longer or shorter than
+        ``body_size`` are only noticed once part of them is sent, this
+        aborts the connection with
+        :exc:`~amqp.exceptions.IrrecoverableConnectionError`.
+
         Example::
 
             msg = Message('hello world',
@@ -100,12 +115,15 @@ class Message(GenericContent):
         ('cluster_id', 's')
     ]
 
-    def __init__(self, body='', children=None, channel=None, **properties):
+    def __init__(self, body='', children=None, channel=None, body_size=None,
+                 **properties):
         super().__init__(**properties)
         #: set by basic_consume/basic_get
         self.delivery_info = None
         self.body = body
         self.channel = channel
+        if body_size is not None:
+            self.body_size = body_size
 
     __slots__ = (
         "delivery_info",
@@ -120,3 +138,87 @@ class Message(GenericContent):
     @property
     def delivery_tag(self):
         return self.delivery_info.get('delivery_tag')
+
+
+class BodyReader:
+    """File-like reader over the body of a message as it is received.
+
+    Used as the body of messages delivered before their content body
+    was received, see ``stream_body_threshold`` of
+    :class:`~amqp.connection.Connection`. Reading blocks on the
+    connection until the next body frame arrives, dispatching any other
+    frame received meanwhile, so only the frames not read yet are
+    held in memory.
+
+    Iterating over the reader yields the body frames as received.
+    """
+
+    #: Timeout in seconds used when waiting for the next body frame.
+    timeout = None
+
+    def __init__(self, connection, size):
+        self.connection = connection
+        self.size = size
+        self.received = 0
+        self.closed = False
+        self._chunks = deque()
+
+    def __repr__(self):
+        return f'<{type(self).__name__}: {self.received}/{self.size}>'
+
+    @property
+    def complete(self):
+        """True once the whole body was received."""
+        return self.received >= self.size
+
+    def feed(self, chunk):
+        """Add the next body frame received."""
+        self.received += len(chunk)
+        if not self.closed:
+            self._chunks.append(chunk)
+
+    def _next_chunk(self):
+        chunks = self._chunks
+        while not chunks:
+            if self.closed or self.complete:
+                return None
+            self.connection.blocking_read(self.timeout)
+        return chunks.popleft()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        chunk = self._next_chunk()
+        if chunk is None:
+            raise StopIteration()
+        return chunk
+
+    def readinto(self, b):
+        """Read up to ``len(b)`` bytes into ``b``, return the count."""
+        chunk = self._next_chunk()
+        if chunk is None:
+            return 0
+        n = min(len(b), len(chunk))
+        memoryview(b)[:n] = chunk[:n]
+        if n < len(chunk):
+            self._chunks.appendleft(memoryview(chunk)[n:])
+        return n
+
+    def read(self, n=-1):
+        """Read up to ``n`` bytes, or the rest of the body if negative."""
+        if n is None or n < 0:
+            return b''.join(bytes(chunk) for chunk in self)
+        buf = bytearray(n)
+        return bytes(buf[:self.readinto(buf)])
+
+    def close(self):
+        """Discard the part of the body not read yet."""
+        self.closed = True
+        self._chunks.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -3,7 +3,7 @@
 
 import logging
 import socket
-from collections import defaultdict
+from collections import defaultdict, deque
 from queue import Queue
 
 from vine import ensure_promise
@@ -119,6 +119,18 @@ class Channel(AbstractChannel):
         # set first time basic_publish_confirm is called
         # and publisher confirms are enabled for this channel.
         self._confirm_selected = False
+        #: Delivery tag the broker will assign to the confirm of the next
+        #: published message, zero until confirm mode is selected.
+        self.next_publish_seq_no = 0
+        #: :class:`~amqp.acks.AckBatcher` settling deliveries on this
+        #: channel, if any.
+        self.ack_batcher = None
+        #: :class:`~amqp.confirms.ConfirmTracker` of the messages
+        #: published on this channel, if any.
+        self.confirm_tracker = None
+        #: Replies still expected and messages received, for every
+        #: :meth:`basic_get_many` call not fully answered yet.
+        self._get_many_batches = deque()
         if self.connection.confirm_publish:
             self.basic_publish = self.basic_publish_confirm
 
@@ -132,6 +144,7 @@ class Channel(AbstractChannel):
         "no_ack_consumers",
         "on_open",
         "_confirm_selected",
+        "ack_batcher",
         )
 
     def then(self, on_success, on_error=None):
@@ -160,7 +173,12 @@ class Channel(AbstractChannel):
         self.is_open = False
         channel_id, self.channel_id = self.channel_id, None
         connection, self.connection = self.connection, None
+        batcher, self.ack_batcher = self.ack_batcher, None
+        self._reset_confirms(channel_id)
+        self._discard_get_many()
         if connection:
+            if batcher is not None:
+                connection.before_read.discard(batcher.flush)
             connection.channels.pop(channel_id, None)
             try:
                 connection._used_channel_ids.remove(channel_id)
@@ -174,8 +192,21 @@ class Channel(AbstractChannel):
 
     def _do_revive(self):
         self.is_open = False
+        self._reset_confirms(self.channel_id)
+        self._discard_get_many()
+        if self.ack_batcher is not None:
+            self.ack_batcher.reset()
         self.open()
 
+    def _reset_confirms(self, channel_id):
+        # Confirm mode and the delivery tags do not survive the channel,
+        # so the messages still waiting for a confirm will never get one.
+        self._confirm_selected = False
+        self.next_publish_seq_no = 0
+        if self.confirm_tracker is not None:
+            self.confirm_tracker._fail_unconfirmed(RecoverableConnectionError(
+                f'Channel {channel_id!r} closed before confirm'))
+
     def close(self, reply_code=0, reply_text='', method_sig=(0, 0),
               argsig='BsBB'):
         """Request a channel close.
@@ -230,6 +261,8 @@ class Channel(AbstractChannel):
                 return
             if not self.is_open:
                 return
+            if self.ack_batcher is not None:
+                self.ack_batcher.close()
 
             self.is_closing = True
             return self.send_method(
@@ -1665,6 +1698,9 @@ class Channel(AbstractChannel):
         Non-blocking, returns a amqp.basic_message.Message object,
         or None if queue is empty.
         """
+        while self._get_many_batches:
+            # replies to an interrupted basic_get_many() come first.
+            self.connection.drain_events()
         ret = self.send_method(
             spec.Basic.Get, argsig, (0, queue, no_ack),
             wait=[spec.Basic.GetOk, spec.Basic.GetEmpty], returns_tuple=True,
@@ -1673,6 +1709,83 @@ class Channel(AbstractChannel):
             return self._on_get_empty(*ret)
         return self._on_get_ok(*ret)
 
+    def basic_get_many(self, queue='', max_messages=10, no_ack=False,
+                       timeout=None, argsig='Bsb'):
+        """Get up to ``max_messages`` messages from a queue.
+
+        Like :meth:`basic_get`, but sends the ``max_messages`` requests
+        back to back before waiting for the replies, so it costs about
+        one round trip instead of one per message.
+
+        Returns the list of messages received, in queue order, which
+        is shorter than ``max_messages`` once the queue is empty.
+
+        Note:
+            This does not stop at the first empty reply: the
+            ``max_messages`` requests are all sent up front and all
+            their replies are waited for. The broker may still deliver
+            a message to a request sent after one that found the queue
+            empty, this message is returned too.
+
+        If waiting for the replies fails, for instance when ``timeout``
+        expires, the exception raised has a ``messages`` attribute with
+        the messages received so far. The replies still expected are
+        added to that same list as later calls read them from the
+        connection (:meth:`basic_get` waits for them first), so no
+        message is dropped. They are discarded when the channel is
+        closed or reopened.
+        """
+        messages = []
+        if max_messages < 1:
+            return messages
+        batch = [max_messages, messages]
+        batches = self._get_many_batches
+        if not batches:
+            self._callbacks.update({
+                spec.Basic.GetOk: self._on_get_many_ok,
+                spec.Basic.GetEmpty: self._on_get_many_empty,
+            })
+        batches.append(batch)
+        sent = 0
+        try:
+            while sent < max_messages:
+                self.send_method(spec.Basic.Get, argsig, (0, queue, no_ack))
+                sent += 1
+            while batch[0]:
+                conn = self.connection
+                if conn is None:
+                    raise RecoverableConnectionError(
+                        'connection already closed')
+                conn.drain_events(timeout=timeout)
+        except Exception as exc:
+            if sent < max_messages:
+                # no reply will come for the requests not sent.
+                self._on_get_many_reply(batch, None, max_messages - sent)
+            exc.messages = messages
+            raise
+        return messages
+
+    def _on_get_many_ok(self, *args):
+        self._on_get_many_reply(
+            self._get_many_batches[0], self._on_get_ok(*args))
+
+    def _on_get_many_empty(self, cluster_id=None):
+        self._on_get_many_reply(self._get_many_batches[0], None)
+
+    def _on_get_many_reply(self, batch, msg, count=1):
+        if msg is not None:
+            batch[1].append(msg)
+        batch[0] -= count
+        if not batch[0]:
+            self._get_many_batches.remove(batch)
+            if not self._get_many_batches:
+                self._discard_get_many()
+
+    def _discard_get_many(self):
+        self._get_many_batches.clear()
+        self._callbacks.pop(spec.Basic.GetOk, None)
+        self._callbacks.pop(spec.Basic.GetEmpty, None)
+
     def _on_get_empty(self, cluster_id=None):
         pass
 
@@ -1794,12 +1907,15 @@ class Channel(AbstractChannel):
 
         try:
             with self.connection.transport.having_timeout(timeout):
-                return self.send_method(
+                ret = self.send_method(
                     spec.Basic.Publish, argsig,
                     (0, exchange, routing_key, mandatory, immediate), msg
                 )
         except socket.timeout:
             raise RecoverableChannelError('basic_publish: timed out')
+        if self.next_publish_seq_no:
+            self.next_publish_seq_no += 1
+        return ret
 
     basic_publish = _basic_publish
 
@@ -2113,6 +2229,8 @@ class Channel(AbstractChannel):
             server could not complete the method it will raise a channel
             or connection exception.
         """
+        if not self.next_publish_seq_no:
+            self.next_publish_seq_no = 1
         return self.send_method(
             spec.Confirm.Select, 'b', (nowait,),
             wait=None if nowait else spec.Confirm.SelectOk,
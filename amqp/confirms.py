@@ -0,0 +1,123 @@
+"""Pipelined publisher confirms."""
+from collections import OrderedDict
+from inspect import iscoroutinefunction
+
+from vine import promise
+
+from .exceptions import MessageNacked
+
+__all__ = ('ConfirmTracker',)
+
+
+class ConfirmTracker:
+    """Publish messages without waiting for each confirm in turn.
+
+    Puts the channel in confirm mode (RabbitMQ extension) and keeps up to
+    ``max_in_flight`` messages unconfirmed. Every message published with
+    :meth:`publish` gets a promise that is fulfilled with its delivery tag
+    when the broker acks it, or fails with
+    :exc:`~amqp.exceptions.MessageNacked` when the broker nacks it.
+    Acks with ``multiple`` set settle all messages up to the given tag
+    at once.  When the channel is closed or reopened after a channel
+    error, the messages not confirmed yet fail with
+    :exc:`~amqp.exceptions.RecoverableConnectionError`.
+
+    When the window is full, :meth:`publish` reads from the connection
+    until enough confirms arrived, so producers cannot run away from the
+    broker.
+
+    Note:
+        Delivery tags are counted by the channel, so other publishes on
+        the same channel in confirm mode are accounted for, but only
+        messages published through the tracker get promises. The
+        tracker blocks reading from the connection, so it cannot be used
+        with :class:`~amqp.aio.AsyncChannel`.
+
+    Example::
+
+        tracker = ConfirmTracker(channel, max_in_flight=1000)
+        for body in bodies:
+            tracker.publish(Message(body), routing_key='queue')
+        tracker.wait_for_confirms()
+    """
+
+    def __init__(self, channel, max_in_flight=1000):
+        if iscoroutinefunction(channel._basic_publish):
+            # waiting for confirms blocks reading from the connection.
+            raise TypeError('ConfirmTracker needs a blocking channel')
+        self.channel = channel
+        self.max_in_flight = max_in_flight
+        #: Mapping of delivery tag to promise, in publish order.
+        self.unconfirmed = OrderedDict()
+        channel.events['basic_ack'].add(self._on_ack)
+        channel.events['basic_nack'].add(self._on_nack)
+        channel.confirm_tracker = self
+        self._select()
+
+    def _select(self):
+        channel = self.channel
+        if not channel._confirm_selected:
+            channel._confirm_selected = True
+            channel.confirm_select()
+
+    def __len__(self):
+        return len(self.unconfirmed)
+
+    def publish(self, msg, *args, **kwargs):
+        """Publish message and return promise settled by its confirm.
+
+        Arguments are the same as for
+        :meth:`~amqp.channel.Channel.basic_publish`, blocks when
+        ``max_in_flight`` messages are not confirmed yet.
+        """
+        self.wait_for_window(timeout=kwargs.get('timeout'))
+        # confirm mode is lost when the channel is reopened.
+        self._select()
+        channel = self.channel
+        delivery_tag = channel.next_publish_seq_no
+        channel._basic_publish(msg, *args, **kwargs)
+        p = self.unconfirmed[delivery_tag] = promise()
+        return p
+
+    def wait_for_window(self, timeout=None):
+        """Wait until another message can be published."""
+        while len(self.unconfirmed) >= self.max_in_flight:
+            self.channel.connection.drain_events(timeout=timeout)
+
+    def wait_for_confirms(self, timeout=None):
+        """Wait until all published messages are confirmed."""
+        while self.unconfirmed:
+            self.channel.connection.drain_events(timeout=timeout)
+
+    def close(self):
+        """Stop tracking confirms for the channel."""
+        self.channel.events['basic_ack'].discard(self._on_ack)
+        self.channel.events['basic_nack'].discard(self._on_nack)
+        if self.channel.confirm_tracker is self:
+            self.channel.confirm_tracker = None
+
+    def _settle(self, delivery_tag, multiple):
+        unconfirmed = self.unconfirmed
+        if not multiple:
+            p = unconfirmed.pop(delivery_tag, None)
+            return [(delivery_tag, p)] if p is not None else []
+        settled = []
+        while unconfirmed:
+            tag = next(iter(unconfirmed))
+            if tag > delivery_tag:
+                break
+            settled.append(unconfirmed.popitem(last=False))
+        return settled
+
+    def _on_ack(self, delivery_tag, multiple):
+        for tag, p in self._settle(delivery_tag, multiple):
+            p(tag)
+
+    def _on_nack(self, delivery_tag, multiple):
+        for tag, p in self._settle(delivery_tag, multiple):
+            p.throw(MessageNacked(tag), propagate=False)
+
+    def _fail_unconfirmed(self, exc):
+        unconfirmed, self.unconfirmed = self.unconfirmed, OrderedDict()
+        for p in unconfirmed.values():
+            p.throw(exc, propagate=False)
@@ -6,6 +6,7 @@ import socket
 import uuid
 import warnings
 from array import array
+from struct import unpack_from
 from time import monotonic
 
 from vine import ensure_promise
@@ -59,6 +60,16 @@ NEGOTIATE_CAPABILITIES = {
     'authentication_failure_close': True,
 }
 
+#: Asynchronous methods :meth:`Connection.drain_events` may dispatch in
+#: batches. Any other method ends the batch, so that code waiting for
+#: a synchronous reply runs before the frames received after it.
+BATCHABLE_METHODS = frozenset([
+    spec.Basic.Deliver,
+    spec.Basic.Return,
+    spec.Basic.Ack,
+    spec.Basic.Nack,
+])
+
 
 class Connection(AbstractChannel):
     """AMQP Connection.
@@ -99,12 +110,84 @@ class Connection(AbstractChannel):
     requiring certain certificates. For details, refer ``ssl`` parameter of
     :class:`~amqp.transport.SSLTransport`.
 
+    When "ssl_memory_bio" is set to True along with "ssl", TLS is done
+    in memory by :class:`~amqp.transport.SSLBIOTransport`, which
+    receives ciphertext in large blocks and decrypts many records at a
+    time, instead of making a system call and SSL read per frame.
+
+    When "ssl_ktls" is set to True along with "ssl", the encryption is
+    handed over to the kernel where Python, OpenSSL and Linux support
+    it, see :class:`~amqp.transport.SSLTransport`. Frames are then sent
+    and received with plain socket calls.
+
+    When "ssl_session_cache" is set along with "ssl", the TLS session is
+    cached on connect and close, and resumed when reconnecting to save
+    most of the handshake: pass True to share
+    :data:`amqp.transport.tls_session_cache` with the other connections
+    of the process, or a :class:`~amqp.transport.TLSSessionCache`.
+
+    When "resolver_cache" is set, the addresses of the broker are looked
+    up through a cache of ``getaddrinfo`` results, dropped when none of
+    them could be connected to: pass True to share
+    :data:`amqp.transport.addrinfo_cache` with the other connections of
+    the process, or a :class:`~amqp.transport.ResolverCache`.
+
     The "socket_settings" parameter is a dictionary defining tcp
     settings which will be applied as socket options.
 
     When "confirm_publish" is set to True, the channel is put to
     confirm mode. In this mode, each published message is
     confirmed using Publisher confirms RabbitMQ extension.
+
+    When "max_frames_per_drain" is set, :meth:`drain_events` keeps
+    dispatching the deliveries, returns and publisher confirms already
+    sitting in the read buffer after the first complete method, up to
+    that many frames per call, instead of returning to the socket for
+    every frame. The cap makes sure the caller regains control often
+    enough to service heartbeats.
+
+    When "write_buffer_size" is set, frames are coalesced in an output
+    buffer of the transport and sent with a single write once it holds
+    that many bytes, before waiting for anything from the server, when a
+    heartbeat is sent, or when :meth:`flush` is called. This cuts the
+    number of system calls and TCP segments for bursts of small
+    publishes.
+
+    When "zero_copy_body" is set to True, the body of messages received
+    in a single body frame is a read-only :class:`memoryview` into the
+    receive buffer instead of a copy, and is never decoded (see
+    ``auto_decode`` of :class:`~amqp.channel.Channel`). The memory is
+    recycled once the message body is released or garbage collected,
+    so consumers that only hash or forward payloads avoid copying them.
+
+    The body of messages split over several body frames is received
+    directly into a buffer of the announced body size. It is returned
+    as :class:`bytes`, which copies the buffer once, so the whole body
+    is briefly held twice in memory. When "zero_copy_body" is set, it
+    is a read-only :class:`memoryview` of that buffer instead, and such
+    a body takes only its own size in memory.
+
+    When "stream_body_threshold" is set, messages with a body of at
+    least this many bytes are delivered as soon as their content header
+    is received, with a :class:`~amqp.basic_message.BodyReader` as body.
+    Reading from it, or iterating over its chunks, waits for the body
+    frames, so memory use is bounded by the frame size rather than by
+    the message size as long as the body is read from the callback.
+
+    When "lazy_headers" is set to True, the ``application_headers`` of
+    messages received are a :class:`~amqp.serialization.LazyTable`
+    mapping, decoded only when first accessed and sent back unchanged
+    if republished without being accessed. Consumers that never look at
+    the headers skip decoding them altogether.
+
+    When "write_high_water" is set, writing frames never blocks: they
+    are queued and sent as the socket accepts them, the rest being sent
+    while waiting for frames from the server. Once that many bytes are
+    queued, :attr:`writable` becomes False and "on_writability_changed"
+    is called with False, then with True once the queue drained down to
+    "write_low_water" bytes, so producers can apply backpressure rather
+    than block in :meth:`~amqp.channel.Channel.basic_publish` on a slow
+    or blocked broker.
     """
 
     Channel = Channel
@@ -197,7 +280,13 @@ class Connection(AbstractChannel):
                  on_unblocked=None, confirm_publish=False,
                  on_tune_ok=None, read_timeout=None, write_timeout=None,
                  socket_settings=None, frame_handler=frame_handler,
-                 frame_writer=frame_writer, **kwargs):
+                 frame_writer=frame_writer, max_frames_per_drain=None,
+                 write_buffer_size=None, zero_copy_body=False,
+                 stream_body_threshold=None, lazy_headers=False,
+                 write_high_water=None, write_low_water=None,
+                 on_writability_changed=None, ssl_memory_bio=False,
+                 ssl_ktls=False, ssl_session_cache=None,
+                 resolver_cache=None, **kwargs):
         self._connection_id = uuid.uuid4().hex
         channel_max = channel_max or 65535
         frame_max = frame_max or 131072
@@ -259,9 +348,25 @@ class Connection(AbstractChannel):
 
         self.confirm_publish = confirm_publish
         self.ssl = ssl
+        self.ssl_memory_bio = ssl_memory_bio
+        self.ssl_ktls = ssl_ktls
+        self.ssl_session_cache = ssl_session_cache
+        self.resolver_cache = resolver_cache
         self.read_timeout = read_timeout
         self.write_timeout = write_timeout
         self.socket_settings = socket_settings
+        self.max_frames_per_drain = max_frames_per_drain
+        self.write_buffer_size = write_buffer_size
+        self.zero_copy_body = zero_copy_body
+        self.stream_body_threshold = stream_body_threshold
+        self.lazy_headers = lazy_headers
+        self.write_high_water = write_high_water
+        self.write_low_water = write_low_water
+        self.on_writability_changed = on_writability_changed
+
+        #: Callbacks called before blocking to wait for frames, used to
+        #: send what was held back so far (see :class:`~amqp.acks.AckBatcher`).
+        self.before_read = set()
 
         # Callbacks
         self.on_blocked = on_blocked
@@ -320,10 +425,22 @@ class Connection(AbstractChannel):
                 self.host, self.connect_timeout, self.ssl,
                 self.read_timeout, self.write_timeout,
                 socket_settings=self.socket_settings,
+                write_buffer_size=self.write_buffer_size,
+                zero_copy_body=self.zero_copy_body,
+                write_high_water=self.write_high_water,
+                write_low_water=self.write_low_water,
+                on_writability_changed=self.on_writability_changed,
+                ssl_memory_bio=self.ssl_memory_bio,
+                ssl_ktls=self.ssl_ktls,
+                ssl_session_cache=self.ssl_session_cache,
+                resolver_cache=self.resolver_cache,
             )
             self.transport.connect()
             self.on_inbound_frame = self.frame_handler_cls(
                 self, self.on_inbound_method)
+            # let the transport receive body frames into the message.
+            self.transport.body_target = getattr(
+                self.on_inbound_frame, 'body_target', None)
             self.frame_writer = self.frame_writer_cls(self, self.transport)
 
             while not self._handshake_complete:
@@ -466,6 +583,11 @@ class Connection(AbstractChannel):
     def connected(self):
         return self._transport and self._transport.connected
 
+    @property
+    def writable(self):
+        """False while the outbound queue is above its high-water mark."""
+        return self._transport is None or self._transport.writable
+
     def collect(self):
         if self._transport:
             self._transport.close()
@@ -480,6 +602,7 @@ class Connection(AbstractChannel):
 
             for ch in channels:
                 ch.collect()
+        self.before_read.clear()
         self._transport = self.connection = self.channels = None
 
     def _get_free_channel_id(self):
@@ -522,15 +645,56 @@ class Connection(AbstractChannel):
         raise NotImplementedError('Use AMQP heartbeats')
 
     def drain_events(self, timeout=None):
+        if self.max_frames_per_drain:
+            return self._drain_events_batch(
+                timeout, self.max_frames_per_drain)
         # read until message is ready
         while not self.blocking_read(timeout):
             pass
 
+    def _drain_events_batch(self, timeout, max_frames,
+                            batchable=BATCHABLE_METHODS):
+        transport = self.transport
+        read_buffered_frame = transport.read_buffered_frame
+        on_inbound_frame = self.on_inbound_frame
+        ready = last = False
+        frames = 0
+        while True:
+            frame = read_buffered_frame()
+            if frame is None:
+                if ready:
+                    # everything received so far has been dispatched.
+                    return
+                if self.before_read:
+                    self._before_read()
+                with transport.having_timeout(timeout):
+                    frame = transport.read_frame()
+            frame_type, _, payload = frame
+            if frame_type == 1 and \
+                    unpack_from('>HH', payload, 0) not in batchable:
+                last = True
+            if on_inbound_frame(frame):
+                ready = True
+            frames += 1
+            if ready and (last or frames >= max_frames):
+                return
+
     def blocking_read(self, timeout=None):
-        with self.transport.having_timeout(timeout):
-            frame = self.transport.read_frame()
+        transport = self.transport
+        frame = None
+        if self.before_read:
+            frame = transport.read_buffered_frame()
+            if frame is None:
+                self._before_read()
+        if frame is None:
+            with transport.having_timeout(timeout):
+                frame = transport.read_frame()
         return self.on_inbound_frame(frame)
 
+    def _before_read(self):
+        for callback in list(self.before_read):
+            callback()
+
     def on_inbound_method(self, channel_id, method_sig, payload, content):
         if self.channels is None:
             raise RecoverableConnectionError('Connection already closed')
@@ -711,6 +875,15 @@ class Connection(AbstractChannel):
 
     def send_heartbeat(self):
         self.frame_writer(8, 0, None, None, None)
+        self.flush()
+
+    def flush(self):
+        """Send the frames held back by write coalescing or queued.
+
+        See the ``write_buffer_size`` and ``write_high_water`` arguments.
+        """
+        if self._transport is not None:
+            self._transport.flush()
 
     def heartbeat_tick(self, rate=2):
         """Send heartbeat packets if necessary.
@@ -0,0 +1,205 @@
+"""Event loop driving many connections from one thread."""
+import selectors
+from heapq import heappop, heappush
+from itertools import count
+from time import monotonic
+
+__all__ = ('EventLoop',)
+
+
+class EventLoop:
+    """Dispatch the frames of many connections with a single selector.
+
+    Connections added to the loop are watched with :mod:`selectors`,
+    the frames they receive are dispatched as soon as their socket is
+    readable, and :meth:`~amqp.connection.Connection.heartbeat_tick` is
+    called for them from a timer heap, ``heartbeat_rate`` times per
+    negotiated heartbeat interval.
+
+    The sockets stay in blocking mode: only the reads done by the loop
+    are non-blocking, so synchronous methods called from callbacks
+    (``basic_qos``, ``queue_declare``...) keep working as usual. The
+    outbound queue of connections with a ``write_high_water`` mark is
+    sent as their socket becomes writable.
+
+    Errors raised while servicing a connection are passed to
+    ``on_error(connection, exc)`` when given, and propagate otherwise.
+    Either way, a connection whose transport failed or that missed
+    heartbeats is removed from the loop first. Connections closed
+    while in the loop are removed silently.
+
+    Example::
+
+        loop = EventLoop()
+        for conn in connections:
+            conn.connect()
+            conn.default_channel.basic_consume('q', callback=on_message)
+            loop.add(conn)
+        loop.run()
+    """
+
+    def __init__(self, selector=None, heartbeat_rate=2, on_error=None):
+        self.selector = (selectors.DefaultSelector()
+                         if selector is None else selector)
+        self.heartbeat_rate = heartbeat_rate
+        self.on_error = on_error
+        #: Mapping of the connections serviced to their socket.
+        self.connections = {}
+        self._timers = []
+        self._timer_ids = {}
+        self._counter = count()
+        self._stopped = False
+
+    def __len__(self):
+        return len(self.connections)
+
+    def __contains__(self, connection):
+        return connection in self.connections
+
+    def add(self, connection):
+        """Start servicing an established connection."""
+        sock = connection.sock
+        self.selector.register(sock, selectors.EVENT_READ, connection)
+        self.connections[connection] = sock
+        if connection.heartbeat:
+            self._schedule(connection, monotonic())
+
+    def remove(self, connection):
+        """Stop servicing connection."""
+        sock = self.connections.pop(connection, None)
+        self._timer_ids.pop(connection, None)
+        if sock is not None:
+            try:
+                self.selector.unregister(sock)
+            except (KeyError, ValueError):
+                pass
+
+    def stop(self):
+        """Make :meth:`run` return."""
+        self._stopped = True
+
+    def run(self):
+        """Service the connections until stopped or none is left."""
+        self._stopped = False
+        while self.connections and not self._stopped:
+            self.run_once()
+
+    def run_once(self, timeout=None):
+        """Wait for at most ``timeout`` seconds and dispatch what arrived.
+
+        Returns the number of frames dispatched.
+        """
+        self._run_timers(monotonic())
+        frames = 0
+        for connection in list(self.connections):
+            frames += self._dispatch_buffered(connection)
+            self._before_select(connection)
+            if connection in self.connections and \
+                    connection._transport.pending():
+                timeout = 0
+        if frames:
+            timeout = 0
+        if self._timers:
+            delay = max(self._timers[0][0] - monotonic(), 0)
+            timeout = delay if timeout is None else min(timeout, delay)
+        for key, events in self.selector.select(timeout):
+            if events & selectors.EVENT_WRITE:
+                self._on_writable(key.data)
+            if events & selectors.EVENT_READ:
+                frames += self._on_readable(key.data)
+        return frames
+
+    def _on_writable(self, connection):
+        transport = self._transport(connection)
+        if transport is not None:
+            try:
+                transport.send_queued()
+            except Exception as exc:
+                self._on_connection_error(connection, exc)
+
+    def _on_readable(self, connection):
+        transport = self._transport(connection)
+        if transport is None:
+            return 0
+        try:
+            transport.receive_available()
+        except Exception as exc:
+            self._on_connection_error(connection, exc)
+            return 0
+        return self._dispatch_buffered(connection)
+
+    def _dispatch_buffered(self, connection):
+        transport = self._transport(connection)
+        if transport is None:
+            return 0
+        frames = 0
+        try:
+            read_buffered_frame = transport.read_buffered_frame
+            on_inbound_frame = connection.on_inbound_frame
+            frame = read_buffered_frame()
+            while frame is not None:
+                on_inbound_frame(frame)
+                frames += 1
+                if connection._transport is not transport:
+                    break
+                frame = read_buffered_frame()
+        except Exception as exc:
+            self._on_connection_error(connection, exc)
+        return frames
+
+    def _transport(self, connection):
+        # not using the property, that connects closed connections again.
+        transport = connection._transport
+        if transport is None and connection in self.connections:
+            # closed while in the loop.
+            self.remove(connection)
+        if connection not in self.connections:
+            return None
+        return transport
+
+    def _before_select(self, connection):
+        transport = self._transport(connection)
+        if transport is None:
+            return
+        try:
+            if connection.before_read:
+                connection._before_read()
+            if transport.write_high_water:
+                # never block on a full socket, wait until it is writable.
+                events = selectors.EVENT_READ
+                if transport.send_queued():
+                    events |= selectors.EVENT_WRITE
+                self.selector.modify(
+                    self.connections[connection], events, connection)
+            else:
+                connection.flush()
+        except Exception as exc:
+            self._on_connection_error(connection, exc)
+
+    def _schedule(self, connection, now):
+        timer_id = next(self._counter)
+        self._timer_ids[connection] = timer_id
+        interval = connection.heartbeat / self.heartbeat_rate
+        heappush(self._timers, (now + interval, timer_id, connection))
+
+    def _run_timers(self, now):
+        timers = self._timers
+        while timers and timers[0][0] <= now:
+            _, timer_id, connection = heappop(timers)
+            if self._timer_ids.get(connection) != timer_id:
+                # connection removed from the loop.
+                continue
+            try:
+                connection.heartbeat_tick(rate=self.heartbeat_rate)
+            except Exception as exc:
+                # missed heartbeats, the connection is dead.
+                self._on_connection_error(connection, exc, remove=True)
+            else:
+                self._schedule(connection, now)
+
+    def _on_connection_error(self, connection, exc, remove=False):
+        if remove or not connection.connected:
+            self.remove(connection)
+        if self.on_error is None:
+            raise exc
+        self.on_error(connection, exc)
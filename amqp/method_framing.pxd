@@ -3,6 +3,7 @@ from .basic_message cimport Message
 
 
 cdef object FRAME_OVERHEAD
+cdef object FRAME_END
 cdef object _CONTENT_METHODS
 
 cdef class Buffer:
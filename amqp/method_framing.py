@@ -1,12 +1,15 @@
 """Convert between frames and higher-level AMQP methods."""
 # Copyright (C) 2007-2008 Barry Pederson <bp@barryp.org>
 
+import os
+import stat
 from collections import defaultdict
-from struct import pack, pack_into, unpack_from
+from mmap import mmap
+from struct import Struct, pack, pack_into, unpack_from
 
 from . import spec
-from .basic_message import Message
-from .exceptions import UnexpectedFrame
+from .basic_message import BodyReader, Message
+from .exceptions import IrrecoverableConnectionError, UnexpectedFrame
 from .utils import str_to_bytes
 
 __all__ = ('frame_handler', 'frame_writer')
@@ -24,12 +27,97 @@ _CONTENT_METHODS = frozenset([
 #: and if it does not the message will fit into the preallocated buffer.
 FRAME_OVERHEAD = 40
 
+FRAME_END = b'\xce'
+
+#: Methods with fixed width arguments only, written from a precompiled
+#: frame template by ``frame_writer.write_method``.
+METHOD_TEMPLATES = {
+    spec.Basic.Ack: 'Lb',
+    spec.Basic.Reject: 'Lb',
+}
+
+_FIXED_WIDTH = {'o': 'B', 'B': 'H', 'l': 'I', 'L': 'Q'}
+
+
+def _compile_method_frame(format):
+    """Compile method frame for arguments of fixed width.
+
+    Returns the :class:`~struct.Struct` of the whole frame, the size of
+    its payload and a function converting arguments to struct values.
+    """
+    codes, fields = [], []
+    for i, p in enumerate(format):
+        if p == 'b':
+            if fields and isinstance(fields[-1], list) and \
+                    len(fields[-1]) < 8:
+                fields[-1].append(i)
+                continue
+            fields.append([i])
+            codes.append('B')
+        else:
+            fields.append(i)
+            codes.append(_FIXED_WIDTH[p])
+    frame = Struct('>BHIHH%sB' % ''.join(codes))
+
+    def values(args):
+        return [
+            sum(1 << j for j, k in enumerate(field) if args[k])
+            if isinstance(field, list) else args[field]
+            for field in fields
+        ]
+    return frame, frame.size - 8, values
+
+
+#: Body types sent from memory, other bodies are streamed.
+_BUFFER_TYPES = (bytes, bytearray, memoryview, mmap)
+
+
+def _regular_file(body):
+    """Return True if ``body`` is a regular file with a file descriptor."""
+    try:
+        return stat.S_ISREG(os.fstat(body.fileno()).st_mode)
+    except (AttributeError, OSError, ValueError):
+        return False
+
+
+def _stream_remaining(body):
+    """Return the number of bytes left in a seekable stream, or None."""
+    if _regular_file(body):
+        return os.fstat(body.fileno()).st_size - body.tell()
+    try:
+        if not body.seekable():
+            return None
+        pos = body.tell()
+        end = body.seek(0, os.SEEK_END)
+        body.seek(pos)
+    except (AttributeError, OSError, ValueError):
+        return None
+    return end - pos
+
+
+def _stream_size(content):
+    body = content.body
+    remaining = _stream_remaining(body)
+    if content.body_size:
+        # checked before the first frame is written, the broker
+        # cannot be told to drop a body it got part of.
+        if remaining is not None and remaining < content.body_size:
+            raise ValueError('Message body is shorter than body_size')
+        return content.body_size
+    if remaining is not None:
+        return remaining
+    if hasattr(body, 'read') or hasattr(body, '__iter__'):
+        raise ValueError(
+            f'body_size is required to publish {type(body).__name__} body')
+    raise TypeError(f'Unsupported message body: {body!r}')
+
 
 def frame_handler(connection, callback,
                   unpack_from=unpack_from, content_methods=_CONTENT_METHODS):
     """Create closure that reads frames."""
     expected_types = defaultdict(lambda: 1)
     partial_messages = {}
+    body_readers = {}
 
     def on_frame(frame):
         frame_type, channel, buf = frame
@@ -54,11 +142,18 @@ def frame_handler(connection, callback,
 
         elif frame_type == 2:
             msg = partial_messages[channel]
-            msg.inbound_header(buf)
+            msg.inbound_header(buf, lazy_tables=connection.lazy_headers)
 
             if not msg.ready:
                 # wait for the content-body
                 expected_types[channel] = 3
+                threshold = connection.stream_body_threshold
+                if threshold is not None and msg.body_size >= threshold:
+                    # deliver now, the body is read as it arrives.
+                    msg.body = body_readers[channel] = BodyReader(
+                        connection, msg.body_size)
+                    callback(channel, msg.frame_method, msg.frame_args, msg)
+                    return True
                 return False
 
             # bodyless message, we're done
@@ -68,7 +163,17 @@ def frame_handler(connection, callback,
 
         elif frame_type == 3:
             msg = partial_messages[channel]
-            msg.inbound_body(buf)
+            reader = body_readers.get(channel)
+            if reader is not None:
+                reader.feed(buf)
+                msg.body_received = reader.received
+                if reader.complete:
+                    msg.ready = True
+                    expected_types[channel] = 1
+                    partial_messages.pop(channel, None)
+                    body_readers.pop(channel, None)
+                return False
+            msg.inbound_body(buf, connection.zero_copy_body)
             if not msg.ready:
                 # wait for the rest of the content-body
                 return False
@@ -80,6 +185,12 @@ def frame_handler(connection, callback,
             return False
         return True
 
+    def body_target(channel, size):
+        # buffer the next body frame of a message can be received into.
+        if expected_types[channel] == 3 and channel not in body_readers:
+            return partial_messages[channel].body_target(size)
+
+    on_frame.body_target = body_target
     return on_frame
 
 
@@ -105,13 +216,66 @@ def frame_writer(connection, transport,
                  bytes=bytes, str_to_bytes=str_to_bytes, text_t=str):
     """Create closure that writes frames."""
     write = transport.write
+    writev = transport.writev
 
     buffer_store = Buffer(bytearray(connection.frame_max - 8))
 
+    def abort_body(reason):
+        # part of the body is sent already, so the broker would take
+        # the next frame as more of it: the connection is unusable.
+        transport.connected = False
+        raise IrrecoverableConnectionError(
+            f'{reason}, connection aborted mid-message')
+
+    def read_chunks(body, bodylen, chunk_size):
+        while bodylen:
+            chunk = body.read(min(chunk_size, bodylen))
+            if not chunk:
+                return
+            bodylen -= len(chunk)
+            yield chunk
+
+    def write_body_stream(channel, body, bodylen, chunk_size):
+        if _regular_file(body):
+            # the kernel copies the file to the socket, where possible.
+            sendfile = transport.sendfile
+            offset, frame_end = body.tell(), b''
+            for i in range(0, bodylen, chunk_size):
+                framelen = min(chunk_size, bodylen - i)
+                # the frame-end octet goes with the next frame header.
+                write(frame_end + pack('>BHI', 3, channel, framelen))
+                try:
+                    sendfile(body, offset + i, framelen)
+                except ValueError as exc:
+                    abort_body(str(exc))
+                frame_end = FRAME_END
+            if frame_end:
+                write(frame_end)
+            body.seek(offset + bodylen)
+            return
+
+        if hasattr(body, 'read'):
+            chunks = read_chunks(body, bodylen, chunk_size)
+        else:
+            chunks = body
+        remaining = bodylen
+        for chunk in chunks:
+            view = memoryview(chunk)
+            for i in range(0, len(view), chunk_size):
+                frame = view[i:i + chunk_size]
+                remaining -= len(frame)
+                if remaining < 0:
+                    abort_body('Message body is longer than body_size')
+                writev([pack('>BHI', 3, channel, len(frame)), frame,
+                        FRAME_END])
+        if remaining:
+            abort_body('Message body is shorter than body_size')
+
     def write_frame(type_, channel, method_sig, args, content):
         chunk_size = connection.frame_max - 8
         offset = 0
         properties = None
+        streamed = False
         args = str_to_bytes(args)
         if content:
             body = content.body
@@ -120,35 +284,48 @@ def frame_writer(connection, transport,
                     'content_encoding', 'utf-8')
                 body = body.encode(encoding)
             properties = content._serialize_properties()
-            bodylen = len(body)
-            properties_len = len(properties) or 0
-            framelen = len(args) + properties_len + bodylen + FRAME_OVERHEAD
-            bigbody = framelen > chunk_size
+            if isinstance(body, _BUFFER_TYPES):
+                bodylen = len(body)
+                properties_len = len(properties) or 0
+                framelen = len(args) + properties_len + bodylen
+                framelen += FRAME_OVERHEAD
+                bigbody = framelen > chunk_size
+            else:
+                # ## STREAM: file object or iterable of chunks
+                bodylen = _stream_size(content)
+                bigbody = streamed = True
         else:
             body, bodylen, bigbody = None, 0, 0
 
         if bigbody:
-            # ## SLOW: string copy and write for every frame
+            # ## LARGE: frames are sent as a list of buffers, body chunks
+            # ## are memoryviews so the body is never copied.
             frame = (b''.join([pack('>HH', *method_sig), args])
                      if type_ == 1 else b'')  # encode method frame
             framelen = len(frame)
-            write(pack('>BHI%dsB' % framelen,
-                       type_, channel, framelen, frame, 0xce))
-            if body:
+            buffers = [pack('>BHI%dsB' % framelen,
+                            type_, channel, framelen, frame, 0xce)]
+            if streamed or body:
                 frame = b''.join([
-                    pack('>HHQ', method_sig[0], 0, len(body)),
+                    pack('>HHQ', method_sig[0], 0, bodylen),
                     properties,
                 ])
                 framelen = len(frame)
-                write(pack('>BHI%dsB' % framelen,
-                           2, channel, framelen, frame, 0xce))
-
-                for i in range(0, bodylen, chunk_size):
-                    frame = body[i:i + chunk_size]
-                    framelen = len(frame)
-                    write(pack('>BHI%dsB' % framelen,
-                               3, channel, framelen,
-                               frame, 0xce))
+                buffers.append(pack('>BHI%dsB' % framelen,
+                                    2, channel, framelen, frame, 0xce))
+
+            if streamed:
+                writev(buffers)
+                write_body_stream(channel, body, bodylen, chunk_size)
+            else:
+                if body:
+                    view = memoryview(body)
+                    for i in range(0, bodylen, chunk_size):
+                        frame = view[i:i + chunk_size]
+                        buffers.append(pack('>BHI', 3, channel, len(frame)))
+                        buffers.append(frame)
+                        buffers.append(FRAME_END)
+                writev(buffers)
 
         else:
             # frame_max can be updated via connection._on_tune. If
@@ -159,31 +336,51 @@ def frame_writer(connection, transport,
             buf = buffer_store.buf
 
             # ## FAST: pack into buffer and single write
-            frame = (b''.join([pack('>HH', *method_sig), args])
-                     if type_ == 1 else b'')
-            framelen = len(frame)
-            pack_into('>BHI%dsB' % framelen, buf, offset,
-                      type_, channel, framelen, frame, 0xce)
+            if type_ == 1:
+                framelen = 4 + len(args)
+                pack_into('>BHIHH', buf, offset,
+                          type_, channel, framelen, *method_sig)
+                buf[offset + 11:offset + 7 + framelen] = args
+            else:
+                framelen = 0
+                pack_into('>BHI', buf, offset, type_, channel, framelen)
+            buf[offset + 7 + framelen] = 0xce
             offset += 8 + framelen
             if body is not None:
-                frame = b''.join([
-                    pack('>HHQ', method_sig[0], 0, len(body)),
-                    properties,
-                ])
-                framelen = len(frame)
-
-                pack_into('>BHI%dsB' % framelen, buf, offset,
-                          2, channel, framelen, frame, 0xce)
+                framelen = 12 + len(properties)
+                pack_into('>BHIHHQ', buf, offset, 2, channel, framelen,
+                          method_sig[0], 0, len(body))
+                buf[offset + 19:offset + 7 + framelen] = properties
+                buf[offset + 7 + framelen] = 0xce
                 offset += 8 + framelen
 
                 bodylen = len(body)
                 if bodylen > 0:
-                    framelen = bodylen
-                    pack_into('>BHI%dsB' % framelen, buf, offset,
-                              3, channel, framelen, body, 0xce)
-                    offset += 8 + framelen
+                    # copied with a slice so any bytes-like body works.
+                    pack_into('>BHI', buf, offset, 3, channel, bodylen)
+                    offset += 7
+                    buf[offset:offset + bodylen] = body
+                    offset += bodylen
+                    buf[offset] = 0xce
+                    offset += 1
 
             write(buffer_store.view[:offset])
 
         connection.bytes_sent += 1
+
+    templates = {
+        method_sig: _compile_method_frame(format)
+        for method_sig, format in METHOD_TEMPLATES.items()
+    }
+    template_buf = bytearray(max(t[0].size for t in templates.values()))
+
+    def write_method(channel, method_sig, args):
+        # method frame packed from its precompiled template.
+        frame, framelen, values = templates[method_sig]
+        frame.pack_into(template_buf, 0, 1, channel, framelen,
+                        method_sig[0], method_sig[1], *values(args), 0xce)
+        write(memoryview(template_buf)[:frame.size])
+        connection.bytes_sent += 1
+
+    write_frame.write_method = write_method
     return write_frame
@@ -1,7 +1,9 @@
 """Platform compatibility."""
 
+import os
 import platform
 import re
+import socket
 import sys
 # Jython does not have this attribute
 import typing
@@ -72,8 +74,36 @@ elif sys.platform.startswith('sunos'):
 elif sys.platform.startswith('aix'):
     KNOWN_TCP_OPTS.remove('TCP_MAXSEG')
     KNOWN_TCP_OPTS.remove('TCP_USER_TIMEOUT')
+
+# maximum number of buffers accepted by a single sendmsg(2) call.
+try:
+    IOV_MAX = os.sysconf('SC_IOV_MAX')
+except (AttributeError, ValueError, OSError):  # pragma: no cover
+    IOV_MAX = -1
+if IOV_MAX <= 0:  # pragma: no cover
+    IOV_MAX = 1024
+
+HAS_SENDMSG = hasattr(socket.socket, 'sendmsg')
+
+#: Flag making a single ``recv`` non-blocking, zero where not supported.
+MSG_DONTWAIT = getattr(socket, 'MSG_DONTWAIT', 0)
+
+#: Socket option level of kernel TLS (``linux/tls.h``), None where the
+#: kernel cannot do TLS.
+SOL_TLS = None
+if LINUX_VERSION and LINUX_VERSION >= (4, 13, 0):
+    SOL_TLS = getattr(socket, 'SOL_TLS', 282)
+#: Kernel TLS options telling whether sending/receiving is offloaded.
+TLS_TX, TLS_RX = 1, 2
+
 __all__ = (
     'LINUX_VERSION',
     'SOL_TCP',
     'KNOWN_TCP_OPTS',
+    'IOV_MAX',
+    'HAS_SENDMSG',
+    'MSG_DONTWAIT',
+    'SOL_TLS',
+    'TLS_TX',
+    'TLS_RX',
 )
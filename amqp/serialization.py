@@ -6,16 +6,16 @@
 # Copyright (C) 2007 Barry Pederson <bp@barryp.org>
 
 import calendar
+from collections.abc import MutableMapping
+from copy import deepcopy
 from datetime import datetime
 from datetime import timezone
 from decimal import Decimal
 from io import BytesIO
-from struct import pack, unpack_from
+from struct import Struct, pack, unpack_from
 
 from .exceptions import FrameSyntaxError
-from .spec import Basic
 from .utils import bytes_to_str as pstr_t
-from .utils import str_to_bytes
 
 ILLEGAL_TABLE_TYPE = """\
     Table type {0!r} not handled by amqp.
@@ -144,6 +144,211 @@ def _read_item(buf, offset):
     return val, offset
 
 
+#: Fixed width fields, fused into a single struct when adjacent.
+_FIXED_FORMATS = {'o': 'B', 'B': 'H', 'l': 'I', 'L': 'Q', 'f': 'f'}
+
+#: Compiled codecs by format string, see :func:`loads` and :func:`dumps`.
+_loaders = {}
+_dumpers = {}
+
+
+def _parse_format(format, strict=True):
+    """Split format string in runs of fixed width fields, bits and others.
+
+    Returns list of ``(kind, fields)`` tuples where kind is ``'fixed'``
+    or the format character, bits and short strings are grouped in runs
+    too. Unknown characters raise :exc:`~amqp.exceptions.FrameSyntaxError`
+    if ``strict`` is set.
+    """
+    runs = []
+    for p in pstr_t(format):
+        if p in _FIXED_FORMATS:
+            kind = 'fixed'
+        elif p in 'bsSxFAT' or not strict:
+            kind = p
+        else:
+            raise FrameSyntaxError(ILLEGAL_TABLE_TYPE.format(p))
+        if runs and kind in ('fixed', 'b', 's') and runs[-1][0] == kind:
+            runs[-1][1].append(p)
+        else:
+            runs.append((kind, [p]))
+    return runs
+
+
+def _load_fixed(fields):
+    st = Struct('>' + ''.join(_FIXED_FORMATS[p] for p in fields))
+    unpack_from, size = st.unpack_from, st.size
+
+    def load(buf, offset, values):
+        values.extend(unpack_from(buf, offset))
+        return offset + size
+    return load
+
+
+def _load_bits(fields):
+    count = len(fields)
+
+    def load(buf, offset, values):
+        for i in range(count):
+            if not i % 8:
+                bits = buf[offset]
+                offset += 1
+            values.append(bool(bits & 1))
+            bits >>= 1
+        return offset
+    return load
+
+
+def _load_shortstrs(fields):
+    count = len(fields)
+
+    def load(buf, offset, values):
+        append = values.append
+        for _ in range(count):
+            slen = buf[offset]
+            offset += 1
+            append(buf[offset:offset + slen].decode('utf-8', 'surrogatepass'))
+            offset += slen
+        return offset
+    return load
+
+
+def _load_longstr(buf, offset, values):
+    slen, = unpack_from('>I', buf, offset)
+    offset += 4
+    values.append(
+        buf[offset:offset + slen].decode('utf-8', 'surrogatepass'))
+    return offset + slen
+
+
+def _load_bytes(buf, offset, values):
+    blen, = unpack_from('>I', buf, offset)
+    offset += 4
+    values.append(buf[offset:offset + blen])
+    return offset + blen
+
+
+def _decode_table(buf, offset, limit):
+    val = {}
+    while offset < limit:
+        keylen = buf[offset]
+        offset += 1
+        key = pstr_t(buf[offset:offset + keylen])
+        offset += keylen
+        val[key], offset = _read_item(buf, offset)
+    return val
+
+
+def _load_table(buf, offset, values):
+    tlen, = unpack_from('>I', buf, offset)
+    offset += 4
+    values.append(_decode_table(buf, offset, offset + tlen))
+    return offset + tlen
+
+
+def _load_lazy_table(buf, offset, values):
+    tlen, = unpack_from('>I', buf, offset)
+    offset += 4
+    values.append(LazyTable(bytes(buf[offset:offset + tlen])))
+    return offset + tlen
+
+
+class LazyTable(MutableMapping):
+    """Field table decoded on first access.
+
+    Keeps the encoded table until then, and serializes it back as is
+    if it was never accessed.
+    """
+
+    __slots__ = ('raw', '_table')
+
+    def __init__(self, raw):
+        self.raw = raw
+        self._table = None
+
+    @property
+    def decoded(self):
+        """True once the table was decoded."""
+        return self._table is not None
+
+    def _decode(self):
+        if self._table is None:
+            self._table = _decode_table(self.raw, 0, len(self.raw))
+            self.raw = None
+        return self._table
+
+    def __getitem__(self, key):
+        return self._decode()[key]
+
+    def __setitem__(self, key, value):
+        self._decode()[key] = value
+
+    def __delitem__(self, key):
+        del self._decode()[key]
+
+    def __iter__(self):
+        return iter(self._decode())
+
+    def __len__(self):
+        return len(self._decode())
+
+    def __repr__(self):
+        return repr(self._decode())
+
+    def __reduce__(self):
+        return dict, (self._decode(),)
+
+    def copy(self):
+        return dict(self._decode())
+
+
+def _load_array(buf, offset, values):
+    alen, = unpack_from('>I', buf, offset)
+    offset += 4
+    limit = offset + alen
+    val = []
+    while offset < limit:
+        aval, offset = _read_item(buf, offset)
+        val.append(aval)
+    values.append(val)
+    return offset
+
+
+def _load_timestamp(buf, offset, values):
+    val, = unpack_from('>Q', buf, offset)
+    values.append(
+        datetime.fromtimestamp(val, tz=timezone.utc).replace(tzinfo=None))
+    return offset + 8
+
+
+_LOADERS = {
+    'S': _load_longstr, 'x': _load_bytes,
+    'F': _load_table, 'A': _load_array, 'T': _load_timestamp,
+}
+
+
+def _compile_loads(format, lazy_tables=False):
+    steps = []
+    for kind, fields in _parse_format(format):
+        if kind == 'F' and lazy_tables:
+            steps.append(_load_lazy_table)
+        elif kind == 'fixed':
+            steps.append(_load_fixed(fields))
+        elif kind == 'b':
+            steps.append(_load_bits(fields))
+        elif kind == 's':
+            steps.append(_load_shortstrs(fields))
+        else:
+            steps.append(_LOADERS[kind])
+
+    def loader(buf, offset):
+        values = []
+        for step in steps:
+            offset = step(buf, offset, values)
+        return values, offset
+    return loader
+
+
 def loads(format, buf, offset):
     """Deserialize amqp format.
 
@@ -158,97 +363,121 @@ def loads(format, buf, offset):
     table = F
     array = A
     timestamp = T
+
+    Each format is compiled into a decoder on first use.
     """
-    bitcount = bits = 0
+    try:
+        loader = _loaders[format]
+    except KeyError:
+        loader = _loaders[format] = _compile_loads(format)
+    return loader(buf, offset)
+
+
+def _dump_fixed(fields):
+    st = Struct('>' + ''.join(_FIXED_FORMATS[p] for p in fields))
+    pack, count = st.pack, len(fields)
+    shorts = [i for i, p in enumerate(fields) if p == 'B']
+
+    def dump(values, i, write):
+        args = values[i:i + count]
+        if shorts:
+            args = list(args)
+            for j in shorts:
+                args[j] = int(args[j])
+        write(pack(*args))
+    return dump
+
+
+def _dump_bits(fields):
+    count = len(fields)
+    size = (count + 7) // 8
+
+    def dump(values, i, write):
+        bits = 0
+        for j in range(count):
+            if values[i + j]:
+                bits |= 1 << j
+        write(bits.to_bytes(size, 'little'))
+    return dump
+
+
+def _dump_shortstrs(fields):
+    count = len(fields)
+
+    def dump(values, i, write):
+        for val in values[i:i + count]:
+            val = val or ''
+            if isinstance(val, str):
+                val = val.encode('utf-8', 'surrogatepass')
+            write(pack('B', len(val)))
+            write(val)
+    return dump
 
-    values = []
-    append = values.append
-    format = pstr_t(format)
 
-    for p in format:
-        if p == 'b':
-            if not bitcount:
-                bits = ord(buf[offset:offset + 1])
-                offset += 1
-                bitcount = 8
-            val = (bits & 1) == 1
-            bits >>= 1
-            bitcount -= 1
-        elif p == 'o':
-            bitcount = bits = 0
-            val, = unpack_from('>B', buf, offset)
-            offset += 1
-        elif p == 'B':
-            bitcount = bits = 0
-            val, = unpack_from('>H', buf, offset)
-            offset += 2
-        elif p == 'l':
-            bitcount = bits = 0
-            val, = unpack_from('>I', buf, offset)
-            offset += 4
-        elif p == 'L':
-            bitcount = bits = 0
-            val, = unpack_from('>Q', buf, offset)
-            offset += 8
-        elif p == 'f':
-            bitcount = bits = 0
-            val, = unpack_from('>f', buf, offset)
-            offset += 4
-        elif p == 's':
-            bitcount = bits = 0
-            slen, = unpack_from('B', buf, offset)
-            offset += 1
-            val = buf[offset:offset + slen].decode('utf-8', 'surrogatepass')
-            offset += slen
-        elif p == 'S':
-            bitcount = bits = 0
-            slen, = unpack_from('>I', buf, offset)
-            offset += 4
-            val = buf[offset:offset + slen].decode('utf-8', 'surrogatepass')
-            offset += slen
-        elif p == 'x':
-            blen, = unpack_from('>I', buf, offset)
-            offset += 4
-            val = buf[offset:offset + blen]
-            offset += blen
-        elif p == 'F':
-            bitcount = bits = 0
-            tlen, = unpack_from('>I', buf, offset)
-            offset += 4
-            limit = offset + tlen
-            val = {}
-            while offset < limit:
-                keylen, = unpack_from('>B', buf, offset)
-                offset += 1
-                key = pstr_t(buf[offset:offset + keylen])
-                offset += keylen
-                val[key], offset = _read_item(buf, offset)
-        elif p == 'A':
-            bitcount = bits = 0
-            alen, = unpack_from('>I', buf, offset)
-            offset += 4
-            limit = offset + alen
-            val = []
-            while offset < limit:
-                aval, offset = _read_item(buf, offset)
-                val.append(aval)
-        elif p == 'T':
-            bitcount = bits = 0
-            val, = unpack_from('>Q', buf, offset)
-            offset += 8
-            val = datetime.fromtimestamp(val, tz=timezone.utc).replace(
-                tzinfo=None)
-        else:
-            raise FrameSyntaxError(ILLEGAL_TABLE_TYPE.format(p))
-        append(val)
-    return values, offset
+def _dump_longstr(values, i, write):
+    val = values[i] or ''
+    if isinstance(val, str):
+        val = val.encode('utf-8', 'surrogatepass')
+    write(pack('>I', len(val)))
+    write(val)
+
 
+def _dump_table(values, i, write):
+    val = values[i]
+    if not isinstance(val, LazyTable):
+        # an empty lazy table would be decoded to tell it is empty.
+        val = val or {}
+    _write_table(val, write, [])
 
-def _flushbits(bits, write):
-    if bits:
-        write(pack('B' * len(bits), *bits))
-        bits[:] = []
-    return 0
+
+def _dump_array(values, i, write):
+    _write_array(values[i] or [], write, [])
+
+
+def _dump_timestamp(values, i, write):
+    write(pack('>Q', int(calendar.timegm(values[i].utctimetuple()))))
+
+
+_DUMPERS = {
+    'S': _dump_longstr, 'x': _dump_longstr,
+    'F': _dump_table, 'A': _dump_array, 'T': _dump_timestamp,
+}
+
+
+def _compile_dumps(format):
+    steps = []
+    count = 0
+    for kind, fields in _parse_format(format, strict=False):
+        if kind == 'fixed':
+            steps.append((count, _dump_fixed(fields)))
+        elif kind == 'b':
+            steps.append((count, _dump_bits(fields)))
+        elif kind == 's':
+            steps.append((count, _dump_shortstrs(fields)))
+        elif kind in _DUMPERS:
+            # values of unknown types are skipped.
+            steps.append((count, _DUMPERS[kind]))
+        count += len(fields)
+
+    def dumper(values):
+        if not isinstance(values, (list, tuple)):
+            values = list(values)
+        if len(values) != count:
+            return _dumps_partial(format, values)
+        out = []
+        write = out.append
+        for i, step in steps:
+            step(values, i, write)
+        return b''.join(out)
+    return dumper
+
+
+def _dumps_partial(format, values):
+    # fewer values than fields only serializes the leading fields.
+    format = pstr_t(format)
+    if len(values) > len(format):
+        raise IndexError('More values than fields in format')
+    return dumps(format[:len(values)], values)
 
 
 def dumps(format, values):
@@ -265,66 +494,22 @@ def dumps(format, values):
         byte array = x
         table = F
         array = A
-    """
-    bitcount = 0
-    bits = []
-    out = BytesIO()
-    write = out.write
 
-    format = pstr_t(format)
-
-    for i, val in enumerate(values):
-        p = format[i]
-        if p == 'b':
-            val = 1 if val else 0
-            shift = bitcount % 8
-            if shift == 0:
-                bits.append(0)
-            bits[-1] |= (val << shift)
-            bitcount += 1
-        elif p == 'o':
-            bitcount = _flushbits(bits, write)
-            write(pack('B', val))
-        elif p == 'B':
-            bitcount = _flushbits(bits, write)
-            write(pack('>H', int(val)))
-        elif p == 'l':
-            bitcount = _flushbits(bits, write)
-            write(pack('>I', val))
-        elif p == 'L':
-            bitcount = _flushbits(bits, write)
-            write(pack('>Q', val))
-        elif p == 'f':
-            bitcount = _flushbits(bits, write)
-            write(pack('>f', val))
-        elif p == 's':
-            val = val or ''
-            bitcount = _flushbits(bits, write)
-            if isinstance(val, str):
-                val = val.encode('utf-8', 'surrogatepass')
-            write(pack('B', len(val)))
-            write(val)
-        elif p == 'S' or p == 'x':
-            val = val or ''
-            bitcount = _flushbits(bits, write)
-            if isinstance(val, str):
-                val = val.encode('utf-8', 'surrogatepass')
-            write(pack('>I', len(val)))
-            write(val)
-        elif p == 'F':
-            bitcount = _flushbits(bits, write)
-            _write_table(val or {}, write, bits)
-        elif p == 'A':
-            bitcount = _flushbits(bits, write)
-            _write_array(val or [], write, bits)
-        elif p == 'T':
-            write(pack('>Q', int(calendar.timegm(val.utctimetuple()))))
-    _flushbits(bits, write)
-
-    return out.getvalue()
+    Each format is compiled into an encoder on first use.
+    """
+    try:
+        dumper = _dumpers[format]
+    except KeyError:
+        dumper = _dumpers[format] = _compile_dumps(format)
+    return dumper(values)
 
 
 def _write_table(d, write, bits):
+    if isinstance(d, LazyTable) and not d.decoded:
+        # never accessed, so unchanged.
+        write(pack('>I', len(d.raw)))
+        write(d.raw)
+        return 0
     out = BytesIO()
     twrite = out.write
     for k, v in d.items():
@@ -382,7 +567,7 @@ def _write_item(v, write, bits):
     elif isinstance(v, datetime):
         write(
             pack('>cQ', b'T', int(calendar.timegm(v.utctimetuple()))))
-    elif isinstance(v, dict):
+    elif isinstance(v, (dict, LazyTable)):
         write(b'F')
         _write_table(v, write, bits)
     elif isinstance(v, (list, tuple)):
@@ -394,81 +579,178 @@ def _write_item(v, write, bits):
         raise ValueError()
 
 
-def decode_properties_basic(buf, offset):
-    """Decode basic properties."""
-    properties = {}
+class PropertiesCodec:
+    """Encode and decode the properties of a content class.
 
-    flags, = unpack_from('>H', buf, offset)
-    offset += 2
+    Built from the ``PROPERTIES`` of a content class, it compiles a plan
+    for every combination of properties seen: the property names and
+    a codec for their values, compiled like those of :func:`loads` and
+    :func:`dumps`.
+    """
 
-    if flags & 0x8000:
-        slen, = unpack_from('>B', buf, offset)
-        offset += 1
-        properties['content_type'] = pstr_t(buf[offset:offset + slen])
-        offset += slen
-    if flags & 0x4000:
-        slen, = unpack_from('>B', buf, offset)
-        offset += 1
-        properties['content_encoding'] = pstr_t(buf[offset:offset + slen])
-        offset += slen
-    if flags & 0x2000:
-        _f, offset = loads('F', buf, offset)
-        properties['application_headers'], = _f
-    if flags & 0x1000:
-        properties['delivery_mode'], = unpack_from('>B', buf, offset)
-        offset += 1
-    if flags & 0x0800:
-        properties['priority'], = unpack_from('>B', buf, offset)
-        offset += 1
-    if flags & 0x0400:
-        slen, = unpack_from('>B', buf, offset)
-        offset += 1
-        properties['correlation_id'] = pstr_t(buf[offset:offset + slen])
-        offset += slen
-    if flags & 0x0200:
-        slen, = unpack_from('>B', buf, offset)
-        offset += 1
-        properties['reply_to'] = pstr_t(buf[offset:offset + slen])
-        offset += slen
-    if flags & 0x0100:
-        slen, = unpack_from('>B', buf, offset)
-        offset += 1
-        properties['expiration'] = pstr_t(buf[offset:offset + slen])
-        offset += slen
-    if flags & 0x0080:
-        slen, = unpack_from('>B', buf, offset)
-        offset += 1
-        properties['message_id'] = pstr_t(buf[offset:offset + slen])
-        offset += slen
-    if flags & 0x0040:
-        properties['timestamp'], = unpack_from('>Q', buf, offset)
-        offset += 8
-    if flags & 0x0020:
-        slen, = unpack_from('>B', buf, offset)
-        offset += 1
-        properties['type'] = pstr_t(buf[offset:offset + slen])
-        offset += slen
-    if flags & 0x0010:
-        slen, = unpack_from('>B', buf, offset)
-        offset += 1
-        properties['user_id'] = pstr_t(buf[offset:offset + slen])
-        offset += slen
-    if flags & 0x0008:
-        slen, = unpack_from('>B', buf, offset)
-        offset += 1
-        properties['app_id'] = pstr_t(buf[offset:offset + slen])
-        offset += slen
-    if flags & 0x0004:
-        slen, = unpack_from('>B', buf, offset)
-        offset += 1
-        properties['cluster_id'] = pstr_t(buf[offset:offset + slen])
-        offset += slen
-    return properties, offset
+    def __init__(self, properties):
+        self.properties = properties
+        self._decoders = {}
+        self._encoders = {}
 
+    def decode(self, buf, offset, lazy_tables=False):
+        """Decode property flags and values, return dict and new offset.
+
+        With ``lazy_tables`` set, field tables are returned as
+        :class:`LazyTable` decoded on first access.
+        """
+        flags, = unpack_from('>H', buf, offset)
+        try:
+            names, loader = self._decoders[flags, lazy_tables]
+        except KeyError:
+            names, loader = self._decoders[flags, lazy_tables] = (
+                self._decode_plan(flags, lazy_tables))
+        values, offset = loader(buf, offset + 2)
+        return dict(zip(names, values)), offset
+
+    def _decode_plan(self, flags, lazy_tables):
+        names, format = [], []
+        for i, (key, proptype) in enumerate(self.properties[:15]):
+            if flags & (1 << (15 - i)) and proptype != 'bit':
+                names.append(key)
+                format.append(proptype)
+        return tuple(names), _compile_loads(''.join(format), lazy_tables)
+
+    def encode(self, properties):
+        """Encode properties that are not :const:`None`."""
+        flags, names, dumper = self.encode_plan(properties)
+        return flags + dumper([properties[k] for k in names])
+
+    def encode_plan(self, properties):
+        """Return flags, names and codec of the properties to encode."""
+        key = tuple(k for k, v in properties.items() if v is not None)
+        try:
+            return self._encoders[key]
+        except KeyError:
+            plan = self._encoders[key] = self._encode_plan(key)
+            return plan
+
+    def _encode_plan(self, present):
+        present = set(present)
+        shift = 15
+        flag_bits = 0
+        flags = []
+        names, format = [], []
+        for key, proptype in self.properties:
+            if key in present:
+                if shift == 0:
+                    flags.append(flag_bits)
+                    flag_bits = 0
+                    shift = 15
+
+                flag_bits |= (1 << shift)
+                if proptype != 'bit':
+                    names.append(key)
+                    format.append(proptype)
+
+            shift -= 1
+        flags.append(flag_bits)
+        return (pack('>%dH' % len(flags), *flags), tuple(names),
+                _compile_dumps(''.join(format)))
+
+
+def _same_value(a, b):
+    """Return True if ``a`` and ``b`` are encoded the same way."""
+    # unlike ==, False is not 0 here, nor 1.0 is 1.
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(
+            _same_value(val, b[key]) for key, val in a.items())
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(map(_same_value, a, b))
+    return a == b
+
+
+class PropertiesTemplate:
+    """Properties shared by many messages, serialized once.
+
+    Messages created with this ``properties_template`` start with these
+    properties, with their own copy of the mutable ones such as
+    ``application_headers``. When such a message is published, the
+    properties still equal to those of the template, and of the same
+    type, reuse their encoded bytes, and only the others are encoded.
+
+    Example::
+
+        template = PropertiesTemplate(
+            Message, content_type='application/json', delivery_mode=2,
+            application_headers={'task': 'add'})
+        msg = Message(body, properties_template=template, message_id=uid)
+    """
+
+    def __init__(self, content_class, **properties):
+        self.content_class = content_class
+        self.properties = properties
+        self._codec = _properties_codec(content_class)
+        types = dict(content_class.PROPERTIES)
+        # values are copied so changes to the shared ones are noticed.
+        self._encoded = {
+            key: (deepcopy(val), dumps(types[key], (val,)))
+            for key, val in properties.items()
+            if val is not None and types.get(key, 'bit') != 'bit'
+        }
+        self._types = types
+        self._mutable = [
+            key for key, val in properties.items()
+            if isinstance(val, (dict, list))
+        ]
+
+    def __getstate__(self):
+        # the codec holds compiled closures, it is looked up again.
+        state = self.__dict__.copy()
+        del state['_codec']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._codec = _properties_codec(self.content_class)
+
+    def new_properties(self, props):
+        """Return the properties of a new message using this template."""
+        properties = dict(self.properties)
+        for key in self._mutable:
+            if key not in props:
+                properties[key] = deepcopy(properties[key])
+        properties.update(props)
+        return properties
+
+    def encode(self, properties):
+        """Encode properties, reusing the template for unchanged values."""
+        flags, names, _ = self._codec.encode_plan(properties)
+        encoded = self._encoded
+        parts = [flags]
+        for key in names:
+            val = properties[key]
+            try:
+                orig, data = encoded[key]
+            except KeyError:
+                data = None
+            else:
+                if not _same_value(val, orig):
+                    data = None
+            if data is None:
+                data = dumps(self._types[key], (val,))
+            parts.append(data)
+        return b''.join(parts)
 
-PROPERTY_CLASSES = {
-    Basic.CLASS_ID: decode_properties_basic,
-}
+
+#: :class:`PropertiesCodec` by content class.
+_property_codecs = {}
+
+
+def _properties_codec(content_class):
+    try:
+        return _property_codecs[content_class]
+    except KeyError:
+        codec = _property_codecs[content_class] = PropertiesCodec(
+            content_class.PROPERTIES)
+        return codec
 
 
 class GenericContent:
@@ -480,12 +762,16 @@ class GenericContent:
     CLASS_ID = None
     PROPERTIES = [('dummy', 's')]
 
-    def __init__(self, frame_method=None, frame_args=None, **props):
+    def __init__(self, frame_method=None, frame_args=None,
+                 properties_template=None, **props):
         self.frame_method = frame_method
         self.frame_args = frame_args
 
+        if properties_template is not None:
+            props = properties_template.new_properties(props)
+        self.properties_template = properties_template
         self.properties = props
-        self._pending_chunks = []
+        self._body_buffer = None
         self.body_received = 0
         self.body_size = 0
         self.ready = False
@@ -493,8 +779,9 @@ class GenericContent:
     __slots__ = (
         "frame_method",
         "frame_args",
+        "properties_template",
         "properties",
-        "_pending_chunks",
+        "_body_buffer",
         "body_received",
         "body_size",
         "ready",
@@ -514,15 +801,16 @@ class GenericContent:
             return self.properties[name]
         raise AttributeError(name)
 
-    def _load_properties(self, class_id, buf, offset):
+    def _load_properties(self, class_id, buf, offset, lazy_tables=False):
         """Load AMQP properties.
 
         Given the raw bytes containing the property-flags and property-list
         from a content-frame-header, parse and insert into a dictionary
         stored in this object as an attribute named 'properties'.
+        Field tables are decoded on first access if ``lazy_tables`` is set.
         """
-        # Read 16-bit shorts until we get one with a low bit set to zero
-        props, offset = PROPERTY_CLASSES[class_id](buf, offset)
+        props, offset = _properties_codec(type(self)).decode(
+            buf, offset, lazy_tables)
         self.properties = props
         return offset
 
@@ -533,52 +821,58 @@ class GenericContent:
         the raw bytes making up a set of property flags and a
         property list, suitable for putting into a content frame header.
         """
-        shift = 15
-        flag_bits = 0
-        flags = []
-        sformat, svalues = [], []
-        props = self.properties
-        for key, proptype in self.PROPERTIES:
-            val = props.get(key, None)
-            if val is not None:
-                if shift == 0:
-                    flags.append(flag_bits)
-                    flag_bits = 0
-                    shift = 15
-
-                flag_bits |= (1 << shift)
-                if proptype != 'bit':
-                    sformat.append(str_to_bytes(proptype))
-                    svalues.append(val)
-
-            shift -= 1
-        flags.append(flag_bits)
-        result = BytesIO()
-        write = result.write
-        for flag_bits in flags:
-            write(pack('>H', flag_bits))
-        write(dumps(b''.join(sformat), svalues))
-
-        return result.getvalue()
+        if self.properties_template is not None:
+            return self.properties_template.encode(self.properties)
+        return _properties_codec(type(self)).encode(self.properties)
 
-    def inbound_header(self, buf, offset=0):
+    def inbound_header(self, buf, offset=0, lazy_tables=False):
         class_id, self.body_size = unpack_from('>HxxQ', buf, offset)
         offset += 12
-        self._load_properties(class_id, buf, offset)
+        self._load_properties(class_id, buf, offset, lazy_tables)
         if not self.body_size:
             self.ready = True
         return offset
 
-    def inbound_body(self, buf):
-        chunks = self._pending_chunks
-        self.body_received += len(buf)
-        if self.body_received >= self.body_size:
-            if chunks:
-                chunks.append(buf)
-                self.body = bytes().join(chunks)
-                chunks[:] = []
-            else:
+    def body_target(self, size):
+        """Return the part of the body buffer the next body frame goes to.
+
+        Bodies split over several frames are assembled in a single
+        buffer of ``body_size`` bytes allocated for the first frame, so
+        the transport can receive the ``size`` bytes of the next frame
+        straight into it. Returns :const:`None` for single frame bodies.
+        """
+        start = self.body_received
+        if self._body_buffer is None:
+            if start or size >= self.body_size:
+                return None
+            self._body_buffer = bytearray(self.body_size)
+        if start + size > len(self._body_buffer):
+            return None
+        return memoryview(self._body_buffer)[start:start + size]
+
+    def inbound_body(self, buf, zero_copy=False):
+        """Add the payload of a body frame to the message body.
+
+        The body of messages split over several frames is assembled in a
+        buffer of ``body_size`` bytes. It is returned as :class:`bytes`,
+        a copy of the buffer, or as a read-only :class:`memoryview` of
+        the buffer when ``zero_copy`` is set: only then is the memory
+        of the copy saved.
+        """
+        body_buffer = self._body_buffer
+        start = self.body_received
+        self.body_received = end = start + len(buf)
+        if body_buffer is None:
+            if end >= self.body_size:
                 self.body = buf
+                self.ready = True
+                return
+            body_buffer = self._body_buffer = bytearray(self.body_size)
+        if not (isinstance(buf, memoryview) and buf.obj is body_buffer):
+            # not received in place by the transport, see body_target()
+            body_buffer[start:end] = buf
+        if end >= self.body_size:
+            self.body = (memoryview(body_buffer).toreadonly() if zero_copy
+                         else bytes(body_buffer))
+            self._body_buffer = None
             self.ready = True
-        else:
-            chunks.append(buf)
@@ -2,26 +2,72 @@
 # Copyright (C) 2009 Barry Pederson <bp@barryp.org>
 
 import errno
+import math
 import os
 import re
+import select
+import selectors
 import socket
 import ssl
+import threading
+from collections import OrderedDict, deque
 from contextlib import contextmanager
-from ssl import SSLError
-from struct import pack, unpack
+from functools import partial
+from itertools import zip_longest
+from ssl import SSLError, SSLWantReadError, SSLZeroReturnError
+from struct import pack, unpack, unpack_from
+from time import monotonic
 
 from .exceptions import UnexpectedFrame
-from .platform import KNOWN_TCP_OPTS, SOL_TCP
+from .platform import (HAS_SENDMSG, IOV_MAX, KNOWN_TCP_OPTS, MSG_DONTWAIT,
+                       SOL_TCP, SOL_TLS, TLS_RX, TLS_TX)
 from .utils import set_cloexec
 
 _UNAVAIL = {errno.EAGAIN, errno.EINTR, errno.ENOENT, errno.EWOULDBLOCK}
 
+_HAS_POLL = hasattr(select, 'poll')
+if _HAS_POLL:
+    _POLL_READ = select.POLLIN | select.POLLPRI
+    _POLL_WRITE = select.POLLOUT
+    _POLL_ERR = select.POLLERR | select.POLLHUP | select.POLLNVAL
+
+# Python 3.12+ built against OpenSSL 3.0+
+_OP_ENABLE_KTLS = getattr(ssl, 'OP_ENABLE_KTLS', 0)
+
 AMQP_PORT = 5672
 
 EMPTY_BUFFER = bytes()
 
 SIGNED_INT_MAX = 0x7FFFFFFF
 
+#: Initial size of the receive buffer, large enough to hold a frame of
+#: the default ``frame_max`` so most frames are parsed without growing it.
+RECV_BUFFER_SIZE = 131072
+
+#: Transports without scatter-gather I/O join the buffers passed to
+#: :meth:`~_AbstractTransport.writev` into writes of about this size.
+WRITEV_COALESCE_SIZE = 65536
+
+#: Once the receive buffer grew beyond this size (e.g. to hold a huge frame),
+#: it is released and reallocated at :data:`RECV_BUFFER_SIZE` when drained.
+RECV_BUFFER_MAX_IDLE = 16 * RECV_BUFFER_SIZE
+
+#: Free space made in the receive buffer for a non-blocking read
+#: (see :meth:`~_AbstractTransport.receive_available`).
+RECV_CHUNK_SIZE = 65536
+
+#: Size of the blocks of ciphertext received by :class:`SSLBIOTransport`,
+#: decrypted into the receive buffer many TLS records at a time.
+TLS_RECV_SIZE = 131072
+
+#: Plaintext encrypted at most per non-blocking send of the outbound queue
+#: by :class:`SSLBIOTransport`: the largest TLS record.
+TLS_RECORD_SIZE = 16384
+
+#: Delay before the next address is tried while a connection attempt is
+#: still in progress, see :meth:`~_AbstractTransport._connect_staggered`.
+CONNECT_ATTEMPT_DELAY = 0.25
+
 # Yes, Advanced Message Queuing Protocol Protocol is redundant
 AMQP_PROTOCOL_HEADER = b'AMQP\x00\x00\x09\x01'
 
@@ -52,6 +98,281 @@ def to_host_port(host, default=AMQP_PORT):
     return host, port
 
 
+def _is_released(buf):
+    """Tell whether no memoryview into ``buf`` is alive anymore."""
+    try:
+        # a bytearray cannot be resized while it is exported.
+        del buf[-1]
+    except BufferError:
+        return False
+    buf.append(0)
+    return True
+
+
+def _frozen(s):
+    """Return ``s``, or a copy of it when its memory may be reused."""
+    if isinstance(s, bytes) or (isinstance(s, memoryview) and s.readonly):
+        return s
+    # frame writers reuse their buffers.
+    return bytes(s)
+
+
+def _wait_for_socket(sock, readable=False, writable=False, timeout=None):
+    """Wait until ``sock`` is readable or writable, at most ``timeout``.
+
+    Returns a ``(readable, writable)`` tuple of booleans.  Uses ``poll``
+    where available, which unlike ``select`` takes any descriptor number.
+    """
+    if not _HAS_POLL:
+        r, w, _ = select.select(
+            (sock,) if readable else (), (sock,) if writable else (), (),
+            timeout)
+        return bool(r), bool(w)
+    poller = select.poll()
+    events = _POLL_READ if readable else 0
+    if writable:
+        events |= _POLL_WRITE
+    poller.register(sock, events)
+    events = poller.poll(
+        None if timeout is None else math.ceil(timeout * 1000))
+    mask = events[0][1] if events else 0
+    return (readable and bool(mask & (_POLL_READ | _POLL_ERR)),
+            writable and bool(mask & (_POLL_WRITE | _POLL_ERR)))
+
+
+def _interleave_families(entries):
+    """Order ``getaddrinfo`` entries alternating the address families.
+
+    The first family of ``entries`` comes first, as in RFC 8305.
+    """
+    by_family = {}
+    for entry in entries:
+        by_family.setdefault(entry[0], []).append(entry)
+    return [entry for group in zip_longest(*by_family.values())
+            for entry in group if entry is not None]
+
+
+def _ktls_offloaded(sock, direction):
+    """Tell whether the kernel does the TLS ``direction`` of ``sock``.
+
+    ``direction`` is :data:`~amqp.platform.TLS_TX` or
+    :data:`~amqp.platform.TLS_RX`.
+    """
+    if SOL_TLS is None:
+        return False
+    try:
+        # fails unless the crypto state was handed over to the kernel.
+        sock.getsockopt(SOL_TLS, direction, 64)
+    except OSError:
+        return False
+    return True
+
+
+class RecvBuffer:
+    """Growable receive buffer filled with ``recv_into``.
+
+    Data is appended to the free space at the tail of a preallocated
+    :class:`bytearray` and consumed from its head, so many frames can be
+    parsed out of a single large read without copying the leftover bytes.
+    The unconsumed data is moved back to the start of the buffer only when
+    the tail runs out of space.
+
+    Data consumed with :meth:`consume_view` is handed out as read-only
+    memoryviews instead of copies. The region they point to is never
+    overwritten: when such a buffer runs out of space, reading continues
+    in another buffer and the old one is kept aside until all views
+    into it are gone, to be reused after that.
+    """
+
+    __slots__ = (
+        '_buf', '_view', 'start', 'end', 'initial_size',
+        'exported', '_retired',
+    )
+
+    #: Number of buffers with live memoryviews kept aside for reuse.
+    max_retired = 8
+
+    def __init__(self, size=RECV_BUFFER_SIZE):
+        self.initial_size = size
+        self.exported = False
+        self._retired = []
+        self._buf = self._view = None
+        self._allocate(size)
+
+    def _allocate(self, size):
+        buf = None
+        if self.exported:
+            self._view.release()
+            if len(self._buf) == self.initial_size and \
+                    len(self._retired) < self.max_retired:
+                self._retired.append(self._buf)
+            self.exported = False
+        if size == self.initial_size:
+            for i, retired in enumerate(self._retired):
+                if _is_released(retired):
+                    buf = self._retired.pop(i)
+                    break
+        self._buf = buf if buf is not None else bytearray(size)
+        self._view = memoryview(self._buf)
+        self.start = self.end = 0
+
+    def __len__(self):
+        return self.end - self.start
+
+    def __bytes__(self):
+        return bytes(self._view[self.start:self.end])
+
+    @property
+    def capacity(self):
+        return len(self._buf)
+
+    def reserve(self, n):
+        """Make room for ``n`` pending bytes and return the free tail.
+
+        The returned memoryview is meant to be passed to ``recv_into`` and
+        followed by a call to :meth:`commit` with the number of bytes read.
+        """
+        pending = self.end - self.start
+        if n > len(self._buf) - self.start:
+            if n > len(self._buf) or self.exported:
+                # Continue in another buffer, existing views stay valid.
+                old = self._view[self.start:self.end]
+                self._allocate(max(n, self.initial_size) if self.exported
+                               else max(n, 2 * len(self._buf)))
+                self._view[:pending] = old
+            elif pending:
+                self._view[:pending] = self._view[self.start:self.end]
+            self.start, self.end = 0, pending
+        return self._view[self.end:]
+
+    def commit(self, n):
+        """Mark ``n`` bytes written into the free tail as received."""
+        self.end += n
+
+    def peek(self, n):
+        """Return a view of the next ``n`` received bytes without consuming."""
+        return self._view[self.start:self.start + n]
+
+    def skip(self, n):
+        """Discard the next ``n`` received bytes."""
+        self.start += n
+        if self.start >= self.end:
+            self.clear()
+
+    def consume(self, n):
+        """Remove and return the next ``n`` received bytes."""
+        start = self.start
+        result = bytes(self._view[start:start + n])
+        self.start = start + n
+        if self.start >= self.end:
+            self.clear()
+        return result
+
+    def consume_view(self, n):
+        """Remove the next ``n`` received bytes and return a view of them."""
+        start = self.start
+        result = self._view[start:start + n].toreadonly()
+        self.exported = True
+        self.start = start + n
+        return result
+
+    def unread(self, data):
+        """Push ``data`` back in front of the pending bytes."""
+        n = len(data)
+        if not n:
+            return
+        if n <= self.start and not self.exported:
+            self.start -= n
+            self._view[self.start:self.start + n] = data
+        else:
+            pending = bytes(self)
+            self.clear()
+            if self.exported:
+                self._allocate(max(n + len(pending), self.initial_size))
+            self.reserve(n + len(pending))
+            self._view[:n] = data
+            self._view[n:n + len(pending)] = pending
+            self.end = n + len(pending)
+
+    def clear(self):
+        """Discard all pending bytes."""
+        if self.exported:
+            # keep appending after the data handed out.
+            self.start = self.end
+        elif len(self._buf) > RECV_BUFFER_MAX_IDLE:
+            self._allocate(self.initial_size)
+        else:
+            self.start = self.end = 0
+
+
+class ResolverCache:
+    """Cache of ``getaddrinfo`` results, shared by connections.
+
+    Addresses are reused for ``ttl`` seconds, and failures to resolve
+    are remembered for ``negative_ttl`` seconds so a reconnect storm
+    does not hammer a slow or failing resolver.  The transports drop
+    the addresses of a host with :meth:`invalidate` when none of them
+    could be connected to, as they may be stale.  The least recently
+    used entries are evicted beyond ``maxsize``.
+
+    The cache is thread-safe, :data:`addrinfo_cache` is shared by the
+    connections created with ``resolver_cache=True``.
+    """
+
+    def __init__(self, ttl=60, negative_ttl=5, maxsize=1024):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def getaddrinfo(self, host, port, family=0, type=0, proto=0, flags=0):
+        """Return the cached result of :func:`socket.getaddrinfo`."""
+        key = (host, port, family, type, proto, flags)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires > monotonic():
+                    self._entries.move_to_end(key)
+                    if isinstance(result, socket.gaierror):
+                        raise socket.gaierror(*result.args)
+                    return list(result)
+                del self._entries[key]
+        try:
+            result = socket.getaddrinfo(host, port, family, type, proto, flags)
+        except socket.gaierror as exc:
+            self._store(key, exc, self.negative_ttl)
+            raise
+        self._store(key, tuple(result), self.ttl)
+        return result
+
+    def _store(self, key, result, ttl):
+        with self._lock:
+            self._entries[key] = (monotonic() + ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, host, port=None):
+        """Forget what was resolved for ``host``, on any or one port."""
+        with self._lock:
+            for key in [key for key in self._entries
+                        if key[0] == host and port in (None, key[1])]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+#: Cache shared by the transports created with ``resolver_cache=True``.
+addrinfo_cache = ResolverCache()
+
+
 class _AbstractTransport:
     """Common superclass for TCP and SSL transports.
 
@@ -82,37 +403,121 @@ class _AbstractTransport:
             when True, ``socket.timeout`` is raised
             when exception is received during first read. See ``_read()`` for
             details.
+
+        write_buffer_size: int
+
+            when set, frames written are held back in an output buffer
+            and sent together once it holds this many bytes, when
+            :meth:`flush` is called, or before the next blocking read.
+
+        zero_copy_body: bool
+
+            when True, the payload of content body frames is returned as
+            a read-only memoryview into the receive buffer instead of a
+            copy. See :class:`RecvBuffer`.
+
+        write_high_water: int
+
+            when set, writes never block: frames are added to an
+            outbound queue and sent as the socket accepts them, the
+            rest of the queue being sent while waiting for frames to
+            read. Once the queue holds this many bytes, :attr:`writable`
+            becomes False until it drains down to ``write_low_water``
+            bytes (a quarter of ``write_high_water`` by default).
+            Writing to a transport that is not writable sends the queue
+            in blocking mode down to ``write_low_water`` first, so the
+            queue stays bounded.
+
+        on_writability_changed: callable
+
+            called with the new value of :attr:`writable` when it
+            changes, so producers can pause and resume.
+
+        resolver_cache: bool|ResolverCache
+
+            when set, the broker address is resolved through this
+            cache, or the process-wide :data:`addrinfo_cache` when True,
+            instead of calling ``getaddrinfo`` on every connect.
+
+    The ``body_target`` attribute may be set to a callable
+    ``(channel, size)`` returning a writable buffer of ``size`` bytes:
+    the payload of content body frames is then received straight into
+    it. See :meth:`amqp.serialization.GenericContent.body_target`.
     """
 
     def __init__(self, host, connect_timeout=None,
                  read_timeout=None, write_timeout=None,
-                 socket_settings=None, raise_on_initial_eintr=True, **kwargs):
+                 socket_settings=None, raise_on_initial_eintr=True,
+                 write_buffer_size=None, zero_copy_body=False,
+                 write_high_water=None, write_low_water=None,
+                 on_writability_changed=None, resolver_cache=None,
+                 **kwargs):
         self.connected = False
         self.sock = None
         self.raise_on_initial_eintr = raise_on_initial_eintr
-        self._read_buffer = EMPTY_BUFFER
+        self._read_buffer = RecvBuffer()
+        self.write_buffer_size = write_buffer_size
+        self._write_buffer = bytearray()
+        self.zero_copy_body = zero_copy_body
+        self.body_target = None
+        self.write_high_water = write_high_water
+        if write_high_water and write_low_water is None:
+            write_low_water = write_high_water // 4
+        self.write_low_water = write_low_water
+        self.on_writability_changed = on_writability_changed
+        #: False while the outbound queue is above the high-water mark.
+        self.writable = True
+        self._write_queue = deque()
+        self._write_queue_size = 0
+        self._deadline = None
+        self._blocking_timeout = None
         self.host, self.port = to_host_port(host)
         self.connect_timeout = connect_timeout
         self.read_timeout = read_timeout
         self.write_timeout = write_timeout
         self.socket_settings = socket_settings
+        if resolver_cache is True:
+            resolver_cache = addrinfo_cache
+        elif resolver_cache is False:
+            resolver_cache = None
+        self.resolver_cache = resolver_cache
 
     __slots__ = (
         "connection",
         "sock",
         "raise_on_initial_eintr",
         "_read_buffer",
+        "write_buffer_size",
+        "_write_buffer",
+        "zero_copy_body",
+        "body_target",
+        "write_high_water",
+        "write_low_water",
+        "on_writability_changed",
+        "writable",
+        "_write_queue",
+        "_write_queue_size",
+        "_deadline",
+        "_blocking_timeout",
         "host",
         "port",
         "connect_timeout",
         "read_timeout",
         "write_timeout",
         "socket_settings",
+        "resolver_cache",
         # adding '__dict__' to get dynamic assignment
         "__dict__",
         "__weakref__",
         )
 
+    #: Errors on which a receive is retried, see :meth:`_recv_into`.
+    _recv_errnos = (errno.EAGAIN, errno.EINTR)
+
+    #: Whether :meth:`having_timeout` puts the socket in non-blocking
+    #: mode, for the calls that cannot be made non-blocking by a flag.
+    _nonblocking_deadline = not MSG_DONTWAIT
+
     def __repr__(self):
         if self.sock:
             src = f'{self.sock.getsockname()[0]}:{self.sock.getsockname()[1]}'
@@ -146,15 +551,27 @@ class _AbstractTransport:
 
     @contextmanager
     def having_timeout(self, timeout):
+        """Raise :exc:`socket.timeout` from I/O lasting beyond ``timeout``.
+
+        Reads and writes wait for the socket with ``poll`` until the
+        deadline, then are done without blocking. Where this needs the
+        socket in non-blocking mode, e.g. with :class:`ssl.SSLSocket`, it
+        is switched once for the outermost block rather than for every
+        call. Over TLS, the rest of a record received in part is waited
+        for until the deadline too.
+        """
         if timeout is None:
             yield self.sock
         else:
+            prev = self._deadline
+            self._deadline = monotonic() + timeout
             sock = self.sock
-            prev = sock.gettimeout()
-            if prev != timeout:
-                sock.settimeout(timeout)
+            switched = prev is None and sock and self._nonblocking_deadline
+            if switched:
+                self._blocking_timeout = sock.gettimeout()
+                sock.settimeout(0)
             try:
-                yield self.sock
+                yield sock
             except SSLError as exc:
                 if 'timed out' in str(exc):
                     # http://bugs.python.org/issue10272
@@ -168,13 +585,55 @@ class _AbstractTransport:
                     raise socket.timeout()
                 raise
             finally:
-                if timeout != prev:
-                    sock.settimeout(prev)
+                self._deadline = prev
+                if switched:
+                    try:
+                        sock.settimeout(self._blocking_timeout)
+                    except OSError:
+                        pass  # closed within the block.
+
+    def _call_nonblocking(self, fun, *args):
+        """Call ``fun`` with the socket in non-blocking mode."""
+        sock = self.sock
+        prev = sock.gettimeout()
+        if prev == 0:
+            # e.g. within having_timeout.
+            return fun(*args)
+        sock.settimeout(0)
+        try:
+            return fun(*args)
+        finally:
+            sock.settimeout(prev)
+
+    def _time_left(self):
+        """Return the seconds left before the deadline, if any.
+
+        Without a deadline this is the socket timeout.
+        """
+        deadline = self._deadline
+        if deadline is None:
+            return self.sock.gettimeout()
+        return max(deadline - monotonic(), 0)
 
     def _connect(self, host, port, timeout):
-        entries = socket.getaddrinfo(
+        resolver = self.resolver_cache
+        getaddrinfo = (socket.getaddrinfo if resolver is None
+                       else resolver.getaddrinfo)
+        entries = getaddrinfo(
             host, port, socket.AF_UNSPEC, socket.SOCK_STREAM, SOL_TCP,
         )
+        try:
+            self._connect_entries(entries, timeout)
+        except OSError:
+            if resolver is not None:
+                # the addresses may be stale, resolve them again next time.
+                resolver.invalidate(host, port)
+            raise
+
+    def _connect_entries(self, entries, timeout):
+        if len(entries) > 1:
+            self.sock = self._connect_staggered(entries, timeout)
+            return
         for i, res in enumerate(entries):
             af, socktype, proto, canonname, sa = res
             try:
@@ -194,6 +653,73 @@ class _AbstractTransport:
             else:
                 break
 
+    def _connect_staggered(self, entries, timeout):
+        """Race connections to the addresses of ``entries`` (RFC 8305).
+
+        An attempt is started every :data:`CONNECT_ATTEMPT_DELAY`
+        seconds, or as soon as the previous one failed, alternating
+        address families, and the first socket connected wins: a dead
+        address only delays the connection by the attempt delay
+        instead of ``timeout``.
+        """
+        pending = deque(_interleave_families(entries))
+        deadline = None if timeout is None else monotonic() + timeout
+        selector = selectors.DefaultSelector()
+        error = None
+        try:
+            next_attempt = monotonic()
+            while True:
+                now = monotonic()
+                if pending and (now >= next_attempt or not selector.get_map()):
+                    try:
+                        sock = self._start_connect(*pending.popleft())
+                    except OSError as exc:
+                        error = exc
+                        continue
+                    selector.register(sock, selectors.EVENT_WRITE)
+                    next_attempt = now + CONNECT_ATTEMPT_DELAY
+                    continue
+                if not selector.get_map():
+                    raise error
+                wait = max(next_attempt - now, 0) if pending else None
+                if deadline is not None:
+                    left = deadline - now
+                    if left <= 0:
+                        raise socket.timeout('timed out')
+                    wait = left if wait is None else min(wait, left)
+                for key, _ in selector.select(wait):
+                    sock = key.fileobj
+                    selector.unregister(sock)
+                    err = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if not err:
+                        return sock
+                    sock.close()
+                    error = OSError(err, os.strerror(err))
+                    # start the next attempt without waiting.
+                    next_attempt = now
+        finally:
+            for key in list(selector.get_map().values()):
+                key.fileobj.close()
+            selector.close()
+
+    def _start_connect(self, af, socktype, proto, canonname, sa):
+        """Create a non-blocking socket and start connecting it."""
+        sock = socket.socket(af, socktype, proto)
+        try:
+            try:
+                set_cloexec(sock, True)
+            except NotImplementedError:
+                pass
+            sock.setblocking(False)
+            err = sock.connect_ex(sa)
+            if err not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK,
+                           errno.EAGAIN):
+                raise OSError(err, os.strerror(err))
+        except BaseException:
+            sock.close()
+            raise
+        return sock
+
     def _init_socket(self, socket_settings, read_timeout, write_timeout):
         self.sock.settimeout(None)  # set socket back to blocking mode
         self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
@@ -241,10 +767,74 @@ class _AbstractTransport:
         for opt, val in tcp_opts.items():
             self.sock.setsockopt(SOL_TCP, opt, val)
 
-    def _read(self, n, initial=False):
-        """Read exactly n bytes from the peer."""
+    def _read(self, n, initial=False, view=False):
+        """Read exactly n bytes from the peer.
+
+        With ``view`` set, a read-only memoryview into the receive buffer
+        is returned instead of a copy.
+        """
         raise NotImplementedError('Must be overridden in subclass')
 
+    def _recv_into(self, buf, initial=False):
+        """Receive at most ``len(buf)`` bytes into ``buf``.
+
+        Retries the call when it fails with one of ``_recv_errnos``,
+        unless this is the ``initial`` read of a frame.  Within
+        :meth:`having_timeout`, waits for data until the deadline first.
+        """
+        while True:
+            if self._deadline is None:
+                recv_into = self._quick_recv_into
+            else:
+                self._wait_readable()
+                recv_into = self._recv_into_nonblocking
+            try:
+                nbytes = recv_into(buf)
+            except OSError as exc:
+                if exc.errno in self._recv_errnos:
+                    if initial and self.raise_on_initial_eintr:
+                        raise socket.timeout()
+                    continue
+                raise
+            if not nbytes:
+                raise OSError('Server unexpectedly closed connection')
+            return nbytes
+
+    def _recv_into_nonblocking(self, buf):
+        # called once the socket is readable, so this does not block.
+        return self._quick_recv_into(buf)
+
+    def _wait_readable(self):
+        if not self.pending() and not _wait_for_socket(
+                self.sock, readable=True, timeout=self._time_left())[0]:
+            raise socket.timeout()
+
+    def _read_into(self, dest, initial=False):
+        """Read exactly ``len(dest)`` bytes from the peer into ``dest``.
+
+        Bytes already in the receive buffer are copied, the rest is
+        received directly into ``dest`` with :meth:`_read_some_into`.
+        """
+        rbuf = self._read_buffer
+        view = memoryview(dest)
+        n = len(view)
+        have = min(len(rbuf), n)
+        if have:
+            view[:have] = rbuf.peek(have)
+            rbuf.skip(have)
+        try:
+            while have < n:
+                have += self._read_some_into(view[have:], initial)
+        except BaseException:
+            # keep what we got so the read can be retried.
+            rbuf.unread(bytes(view[:have]))
+            raise
+        return dest
+
+    def _read_some_into(self, buf, initial=False):
+        """Read at most ``len(buf)`` bytes of the stream into ``buf``."""
+        return self._recv_into(buf, initial)
+
     def _setup_transport(self):
         """Do any additional initialization of the class."""
         pass
@@ -257,8 +847,59 @@ class _AbstractTransport:
         """Completely write a string to the peer."""
         raise NotImplementedError('Must be overridden in subclass')
 
+    def _writev(self, buffers, coalesce=WRITEV_COALESCE_SIZE):
+        """Completely write a sequence of buffers to the peer."""
+        pending, size = [], 0
+        for buf in buffers:
+            pending.append(buf)
+            size += len(buf)
+            if size >= coalesce:
+                self._write(b''.join(pending))
+                pending, size = [], 0
+        if pending:
+            self._write(b''.join(pending))
+
+    def _writev_before_deadline(self, buffers,
+                                coalesce=WRITEV_COALESCE_SIZE):
+        """Completely write a sequence of buffers until the deadline.
+
+        Small buffers are joined, large ones such as body frames are
+        written as they are, without copying them.
+        """
+        write = self._write_before_deadline
+        pending, size = [], 0
+        for buf in buffers:
+            if len(buf) >= coalesce:
+                if pending:
+                    write(b''.join(pending))
+                    pending, size = [], 0
+                write(buf)
+                continue
+            pending.append(buf)
+            size += len(buf)
+            if size >= coalesce:
+                write(b''.join(pending))
+                pending, size = [], 0
+        if pending:
+            write(b''.join(pending))
+
+    def _sendfile(self, file, offset, count):
+        """Completely write part of a file to the peer."""
+        file.seek(offset)
+        while count:
+            data = file.read(min(count, WRITEV_COALESCE_SIZE))
+            if not data:
+                raise ValueError('File ended before all data was sent')
+            self._write(data)
+            count -= len(data)
+
     def close(self):
         if self.sock is not None:
+            try:
+                self.flush()
+            except OSError:
+                pass
+
             try:
                 self._shutdown_transport()
             except OSError:
@@ -291,12 +932,20 @@ class _AbstractTransport:
              octet    short     long        'size' octets        octet
 
         """
+        if self._write_buffer:
+            # the peer may wait for what we hold back before replying.
+            self.flush()
+        if self._write_queue:
+            self._send_until_readable()
         read = self._read
         read_frame_buffer = EMPTY_BUFFER
         try:
             frame_header = read(7, True)
             read_frame_buffer += frame_header
             frame_type, channel, size = unpack('>BHI', frame_header)
+            dest = None
+            if frame_type == 3 and self.body_target is not None:
+                dest = self.body_target(channel, size)
             # >I is an unsigned int, but the argument to sock.recv is signed,
             # so we know the size can be at most 2 * SIGNED_INT_MAX
             if size > SIGNED_INT_MAX:
@@ -311,12 +960,21 @@ class _AbstractTransport:
                     raise
 
                 payload = b''.join([part1, part2])
+            elif dest is not None:
+                payload = self._read_into(dest)
+            elif frame_type == 3 and self.zero_copy_body:
+                payload = read(size, view=True)
             else:
                 payload = read(size)
-            read_frame_buffer += payload
-            frame_end = ord(read(1))
+            try:
+                frame_end = ord(read(1))
+            except (socket.timeout, OSError, SSLError):
+                # keep the payload for the retry, without copying it
+                # for every frame read.
+                read_frame_buffer += payload
+                raise
         except socket.timeout:
-            self._read_buffer = read_frame_buffer + self._read_buffer
+            self._read_buffer.unread(read_frame_buffer)
             raise
         except (OSError, SSLError) as exc:
             if (
@@ -326,13 +984,13 @@ class _AbstractTransport:
                 # On windows we can get a read timeout with a winsock error
                 # code instead of a proper socket.timeout() error, see
                 # https://github.com/celery/py-amqp/issues/320
-                self._read_buffer = read_frame_buffer + self._read_buffer
+                self._read_buffer.unread(read_frame_buffer)
                 raise socket.timeout()
 
             if isinstance(exc, SSLError) and 'timed out' in str(exc):
                 # Don't disconnect for ssl read time outs
                 # http://bugs.python.org/issue10272
-                self._read_buffer = read_frame_buffer + self._read_buffer
+                self._read_buffer.unread(read_frame_buffer)
                 raise socket.timeout()
 
             if exc.errno not in _UNAVAIL:
@@ -345,9 +1003,84 @@ class _AbstractTransport:
             raise UnexpectedFrame(
                 f'Received frame_end {frame_end:#04x} while expecting 0xce')
 
-    def write(self, s):
+    def read_buffered_frame(self, unpack_from=unpack_from):
+        """Parse the next AMQP frame if it was already received completely.
+
+        Unlike :meth:`read_frame` this never touches the socket: it returns
+        :const:`None` when the read buffer does not hold a whole frame.
+        """
+        rbuf = self._read_buffer
+        available = len(rbuf)
+        if available < 8:
+            return None
+        frame_type, channel, size = unpack_from('>BHI', rbuf.peek(7))
+        if available < size + 8:
+            return None
+        rbuf.skip(7)
+        dest = None
+        if frame_type == 3 and self.body_target is not None:
+            dest = self.body_target(channel, size)
+        if dest is not None:
+            dest[:] = rbuf.peek(size)
+            rbuf.skip(size)
+            payload = dest
+        elif frame_type == 3 and self.zero_copy_body:
+            payload = rbuf.consume_view(size)
+        else:
+            payload = rbuf.consume(size)
+        frame_end = rbuf.peek(1)[0]
+        rbuf.skip(1)
+        # frame-end octet must contain '\xce' value
+        if frame_end == 206:
+            return frame_type, channel, payload
+        else:
+            raise UnexpectedFrame(
+                f'Received frame_end {frame_end:#04x} while expecting 0xce')
+
+    def pending(self):
+        """Return the number of bytes read from the socket but not received.
+
+        Such data, decrypted SSL records for instance, is not reported
+        by ``select`` on the socket.
+        """
+        return 0
+
+    def receive_available(self):
+        """Receive the data available without blocking.
+
+        The data is added to the receive buffer, to be parsed with
+        :meth:`read_buffered_frame`. Returns the number of bytes received,
+        zero when none was available. Used by event loops once the
+        socket is reported readable, the socket itself stays in
+        blocking mode.
+        """
+        return self._call_nonblocking(self._receive_available)
+
+    def _receive_available(self, flags=0):
+        rbuf = self._read_buffer
+        recv_into = self.sock.recv_into
+        received = 0
+        while True:
+            try:
+                nbytes = recv_into(
+                    rbuf.reserve(len(rbuf) + RECV_CHUNK_SIZE), 0, flags)
+            except (BlockingIOError, InterruptedError, SSLWantReadError):
+                return received
+            except OSError as exc:
+                if exc.errno not in _UNAVAIL:
+                    self.connected = False
+                raise
+            if not nbytes:
+                self.connected = False
+                raise OSError('Server unexpectedly closed connection')
+            rbuf.commit(nbytes)
+            received += nbytes
+            if not self.pending():
+                return received
+
+    def _send(self, write, *args):
         try:
-            self._write(s)
+            write(*args)
         except socket.timeout:
             raise
         except OSError as exc:
@@ -355,6 +1088,227 @@ class _AbstractTransport:
                 self.connected = False
             raise
 
+    @property
+    def write_queue_size(self):
+        """Number of bytes in the outbound queue."""
+        return self._write_queue_size
+
+    def write(self, s):
+        if self.write_high_water:
+            self._enqueue((s,))
+        elif self.write_buffer_size:
+            wbuf = self._write_buffer
+            wbuf += s
+            if len(wbuf) >= self.write_buffer_size:
+                self.flush()
+        elif self._deadline is None:
+            self._send(self._write, s)
+        else:
+            self._send(self._write_before_deadline, s)
+
+    def writev(self, buffers):
+        """Write a list of buffers to the peer, in order.
+
+        Used to send many frames at once without joining them first:
+        buffers can be memoryviews into the message body.
+        """
+        if self.write_high_water:
+            return self._enqueue(buffers)
+        self.flush()
+        if self._deadline is None:
+            self._send(self._writev, buffers)
+        else:
+            self._send(self._writev_before_deadline, buffers)
+
+    def sendfile(self, file, offset, count):
+        """Send ``count`` bytes of ``file`` starting at ``offset``.
+
+        This blocks until the outbound queue, if any, is sent first,
+        and is not bound by the deadline of :meth:`having_timeout`.
+        """
+        self.flush()
+        if self._deadline is None or not self._nonblocking_deadline:
+            return self._send(self._sendfile, file, offset, count)
+        # switched to non-blocking mode by having_timeout.
+        sock = self.sock
+        sock.settimeout(self._blocking_timeout)
+        try:
+            self._send(self._sendfile, file, offset, count)
+        finally:
+            sock.settimeout(0)
+
+    def flush(self):
+        """Send the frames held back in the output buffer or queue."""
+        wbuf = self._write_buffer
+        if wbuf:
+            self._write_buffer = bytearray()
+            if self._deadline is None:
+                self._send(self._write, wbuf)
+            else:
+                self._send(self._write_before_deadline, wbuf)
+        if self._write_queue:
+            self._send(self._send_queued, True)
+
+    def send_queued(self):
+        """Send what the socket accepts of the outbound queue, never blocking.
+
+        Returns the number of bytes still queued.
+        """
+        if self._write_queue:
+            self._send(self._send_queued)
+        return self._write_queue_size
+
+    def _enqueue(self, buffers):
+        if not self.writable:
+            # the producer ignored the backpressure, keep the queue bounded.
+            self._send(self._send_queued, True, self.write_low_water)
+        queue = self._write_queue
+        for s in buffers:
+            s = _frozen(s)
+            queue.append(s)
+            self._write_queue_size += len(s)
+        self._send(self._send_queued)
+
+    def _send_queued(self, block=False, low_water=0):
+        queue = self._write_queue
+        while queue and self._write_queue_size > low_water:
+            data = queue[0]
+            if len(queue) > 1 and len(data) < WRITEV_COALESCE_SIZE:
+                # send many small frames at once.
+                chunks, size = [], 0
+                while queue and size < WRITEV_COALESCE_SIZE:
+                    chunks.append(queue.popleft())
+                    size += len(chunks[-1])
+                data = b''.join(chunks)
+                queue.appendleft(data)
+            try:
+                n = self._send_nonblocking(data)
+            except (BlockingIOError, InterruptedError, ssl.SSLWantWriteError):
+                n = 0
+            if n:
+                self._write_queue_size -= n
+                if n < len(data):
+                    queue[0] = memoryview(data)[n:]
+                else:
+                    queue.popleft()
+            elif block:
+                self._wait_writable()
+            else:
+                break
+        self._update_writable()
+
+    def _write_before_deadline(self, s):
+        """Completely write a string to the peer until the deadline."""
+        data = memoryview(s).cast('B')
+        while data:
+            try:
+                n = self._send_nonblocking(data)
+            except (BlockingIOError, InterruptedError, ssl.SSLWantWriteError):
+                n = 0
+            if n:
+                data = data[n:]
+            else:
+                self._wait_writable()
+
+    def _send_nonblocking(self, data):
+        return self._call_nonblocking(self.sock.send, data)
+
+    def _wait_writable(self):
+        if not _wait_for_socket(
+                self.sock, writable=True, timeout=self._time_left())[1]:
+            raise socket.timeout()
+
+    def _send_until_readable(self):
+        """Send the outbound queue until there is something to read."""
+        while True:
+            self._send(self._send_queued)
+            if not self._write_queue or self.pending():
+                return
+            readable, writable = _wait_for_socket(
+                self.sock, True, True, self._time_left())
+            if readable:
+                return
+            if not writable:
+                raise socket.timeout()
+
+    def _update_writable(self):
+        size = self._write_queue_size
+        if self.writable:
+            if size < self.write_high_water:
+                return
+            self.writable = False
+        elif size <= self.write_low_water:
+            self.writable = True
+        else:
+            return
+        if self.on_writability_changed is not None:
+            self.on_writability_changed(self.writable)
+
+
+class TLSSessionCache:
+    """Cache of TLS sessions, for reconnects to resume them.
+
+    Resuming a session makes for an abbreviated handshake, cheaper for
+    both ends when many clients reconnect at once.  Sessions are keyed
+    by ``(host, port, server_hostname)`` and kept with the SSL context
+    they were negotiated with, the only one OpenSSL resumes them with,
+    for at most ``ttl`` seconds or the lifetime given by the server.
+    The least recently used sessions are evicted beyond ``maxsize``.
+
+    The cache is thread-safe, :data:`tls_session_cache` is shared by
+    the connections created with ``ssl_session_cache=True``.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, sslopts):
+        """Return the ``(context, session)`` to resume for ``key``.
+
+        Returns None when no session is cached, when it expired, or when
+        it was negotiated with other ``sslopts``.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, opts, context, session = entry
+            if expires <= monotonic() or opts != sslopts:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return context, session
+
+    def put(self, key, sslopts, context, session):
+        """Store the ``session`` negotiated with ``context``."""
+        lifetime = (session.ticket_lifetime_hint if session.has_ticket
+                    else session.timeout)
+        expires = monotonic() + min(self.ttl, lifetime or self.ttl)
+        with self._lock:
+            self._entries[key] = (expires, dict(sslopts), context, session)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, key):
+        """Forget the session cached for ``key``, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+#: Cache shared by the transports created with ``ssl_session_cache=True``.
+tls_session_cache = TLSSessionCache()
+
 
 class SSLTransport(_AbstractTransport):
     """Transport that works over SSL.
@@ -385,29 +1339,106 @@ class SSLTransport(_AbstractTransport):
                       passed to :attr:`~SSLTransport._wrap_socket_sni` as
                       parameters.
 
+        ssl_ktls: bool
+
+            when True, OpenSSL is asked to hand the encryption over to
+            the kernel (``ssl.OP_ENABLE_KTLS``, Python 3.12+ on Linux).
+            Where it did, :attr:`ktls_send` and :attr:`ktls_recv` are set
+            and frames are sent and received with plain socket calls,
+            ``sendfile(2)`` included. Otherwise the connection silently
+            keeps doing TLS in userspace.
+
+        ssl_session_cache: bool|TLSSessionCache
+
+            when set, the TLS session is stored in this cache, or in the
+            process-wide :data:`tls_session_cache` when True, and
+            resumed on reconnect to the same host, port and
+            ``server_hostname``.
+
         kwargs:
 
             additional arguments of
             :class:`~amqp.transport._AbstractTransport` class
     """
 
-    def __init__(self, host, connect_timeout=None, ssl=None, **kwargs):
+    def __init__(self, host, connect_timeout=None, ssl=None, ssl_ktls=False,
+                 ssl_session_cache=None, **kwargs):
         self.sslopts = ssl if isinstance(ssl, dict) else {}
-        self._read_buffer = EMPTY_BUFFER
+        self.ssl_ktls = ssl_ktls
+        if ssl_session_cache is True:
+            ssl_session_cache = tls_session_cache
+        elif ssl_session_cache is False:
+            ssl_session_cache = None
+        self.ssl_session_cache = ssl_session_cache
+        self._tls_context = None
+        #: True when the kernel encrypts what is sent.
+        self.ktls_send = False
+        #: True when the kernel decrypts what is received.
+        self.ktls_recv = False
         super().__init__(
             host, connect_timeout=connect_timeout, **kwargs)
 
     __slots__ = (
         "sslopts",
-        )
+        "ssl_ktls",
+        "ssl_session_cache",
+        "_tls_context",
+        "ktls_send",
+        "ktls_recv",
+    )
+
+    # ssl.sock.read may cause ENOENT if the
+    # operation couldn't be performed (Issue celery#1414).
+    _recv_errnos = (errno.ENOENT, errno.EAGAIN, errno.EINTR)
+
+    # SSLSocket takes no flags.
+    _nonblocking_deadline = True
 
     def _setup_transport(self):
         """Wrap the socket in an SSL object."""
         self.sock = self._wrap_socket(self.sock, **self.sslopts)
         # Explicitly set a timeout here to stop any hangs on handshake.
         self.sock.settimeout(self.connect_timeout)
-        self.sock.do_handshake()
-        self._quick_recv = self.sock.read
+        try:
+            self.sock.do_handshake()
+        except OSError:
+            self._forget_session()
+            raise
+        self._store_session(self.sock)
+        self._quick_recv_into = self.sock.recv_into
+        if self.ssl_ktls:
+            self._use_kernel_tls()
+
+    def _use_kernel_tls(self):
+        """Use plain socket calls in the directions done by the kernel."""
+        sock = self.sock
+        self.ktls_send = _ktls_offloaded(sock, TLS_TX)
+        self.ktls_recv = _ktls_offloaded(sock, TLS_RX)
+        if self.ktls_send:
+            self._write = partial(socket.socket.sendall, sock)
+        if self.ktls_recv:
+            self._quick_recv_into = self._recv_into_ktls
+
+    def _recv_into_nonblocking(self, buf):
+        # The socket being readable does not mean a whole TLS record
+        # arrived, and SSLSocket.recv_into would block until it does.
+        while True:
+            try:
+                return self._call_nonblocking(self._quick_recv_into, buf)
+            except SSLWantReadError:
+                self._wait_readable()
+
+    def _recv_into_ktls(self, buf):
+        sock = self.sock
+        if not sock.pending():
+            try:
+                return socket.socket.recv_into(sock, buf)
+            except OSError as exc:
+                if exc.errno != errno.EIO:
+                    raise
+        # plaintext still held by OpenSSL, or a TLS record other than
+        # data (e.g. a session ticket) the kernel leaves to OpenSSL.
+        return sock.recv_into(buf)
 
     def _wrap_socket(self, sock, context=None, **sslopts):
         if context:
@@ -437,7 +1468,7 @@ class SSLTransport(_AbstractTransport):
         """
         ctx = ssl.create_default_context(**ctx_options)
         ctx.check_hostname = check_hostname
-        return ctx.wrap_socket(sock, **sslopts)
+        return self._wrap_with_context(ctx, sock, **sslopts)
 
     def _wrap_socket_sni(self, sock, keyfile=None, certfile=None,
                          server_side=False, cert_reqs=None,
@@ -556,41 +1587,69 @@ class SSLTransport(_AbstractTransport):
             )
             context.load_default_certs(purpose)
 
-        sock = context.wrap_socket(**opts)
-        return sock
+        return self._wrap_with_context(context, **opts)
+
+    def _wrap_with_context(self, context, sock, **sslopts):
+        """Wrap ``sock`` with the SSL ``context`` once it is set up."""
+        context, session = self._resume_session(
+            context, sslopts.get('server_side'))
+        if session is not None:
+            sslopts['session'] = session
+        if self.ssl_ktls:
+            context.options |= _OP_ENABLE_KTLS
+        return context.wrap_socket(sock=sock, **sslopts)
+
+    def _session_key(self):
+        return self.host, self.port, self.sslopts.get('server_hostname')
+
+    def _resume_session(self, context, server_side=False):
+        """Return the context and session to resume, if one is cached."""
+        cache = self.ssl_session_cache
+        if cache is None or server_side:
+            return context, None
+        cached = cache.get(self._session_key(), self.sslopts)
+        if cached is not None:
+            context, session = cached
+        else:
+            session = None
+        self._tls_context = context
+        return context, session
+
+    def _store_session(self, sslobj):
+        """Cache the session of ``sslobj`` once it can be resumed.
+
+        TLS 1.3 sessions are only resumable once the ticket sent by the
+        server after the handshake was read, they are stored on close.
+        """
+        if self.ssl_session_cache is None or self._tls_context is None:
+            return
+        session = sslobj.session
+        if session is not None and (session.has_ticket or session.id):
+            self.ssl_session_cache.put(
+                self._session_key(), self.sslopts, self._tls_context,
+                session)
+
+    def _forget_session(self):
+        if self.ssl_session_cache is not None:
+            self.ssl_session_cache.discard(self._session_key())
+
+    def pending(self):
+        return self.sock.pending()
 
     def _shutdown_transport(self):
         """Unwrap a SSL socket, so we can call shutdown()."""
         if self.sock is not None:
+            self._store_session(self.sock)
             self.sock = self.sock.unwrap()
 
-    def _read(self, n, initial=False,
-              _errnos=(errno.ENOENT, errno.EAGAIN, errno.EINTR)):
+    def _read(self, n, initial=False, view=False):
         # According to SSL_read(3), it can at most return 16kb of data.
         # Thus, we use an internal read buffer like TCPTransport._read
         # to get the exact number of bytes wanted.
-        recv = self._quick_recv
         rbuf = self._read_buffer
-        try:
-            while len(rbuf) < n:
-                try:
-                    s = recv(n - len(rbuf))  # see note above
-                except OSError as exc:
-                    # ssl.sock.read may cause ENOENT if the
-                    # operation couldn't be performed (Issue celery#1414).
-                    if exc.errno in _errnos:
-                        if initial and self.raise_on_initial_eintr:
-                            raise socket.timeout()
-                        continue
-                    raise
-                if not s:
-                    raise OSError('Server unexpectedly closed connection')
-                rbuf += s
-        except:  # noqa
-            self._read_buffer = rbuf
-            raise
-        result, self._read_buffer = rbuf[:n], rbuf[n:]
-        return result
+        while len(rbuf) < n:
+            rbuf.commit(self._recv_into(rbuf.reserve(n), initial))
+        return rbuf.consume_view(n) if view else rbuf.consume(n)
 
     def _write(self, s):
         """Write a string out to the SSL socket fully."""
@@ -608,6 +1667,216 @@ class SSLTransport(_AbstractTransport):
                 raise OSError('Socket closed')
             s = s[n:]
 
+    def _sendfile(self, file, offset, count):
+        """Write part of a file with ``sendfile(2)`` under kernel TLS."""
+        if not self.ktls_send:
+            return super()._sendfile(file, offset, count)
+        if socket.socket.sendfile(self.sock, file, offset, count) < count:
+            raise ValueError('File ended before all data was sent')
+
+
+class SSLBIOTransport(SSLTransport):
+    """Transport doing TLS in memory over a plain TCP socket.
+
+    Ciphertext is received from the socket in blocks of
+    :data:`TLS_RECV_SIZE` bytes, and decrypted into the receive buffer
+    through an :class:`ssl.SSLObject`, many records at a time, so
+    frames are parsed from the plaintext like with
+    :class:`TCPTransport`. This saves the system call and SSL read made
+    for every frame header by :class:`SSLTransport`.
+
+    :attr:`sock` is the plain socket. The parameters are those of
+    :class:`SSLTransport`, the wrapping options that only apply to
+    :class:`ssl.SSLSocket` are ignored, and so is ``ssl_ktls``: kernel
+    TLS needs OpenSSL to own the socket.
+    """
+
+    def __init__(self, host, connect_timeout=None, ssl=None, **kwargs):
+        self._sslobj = None
+        self._incoming = None
+        self._outgoing = None
+        self._tls_buffer = None
+        super().__init__(
+            host, connect_timeout=connect_timeout, ssl=ssl, **kwargs)
+
+    __slots__ = (
+        "_sslobj",
+        "_incoming",
+        "_outgoing",
+        "_tls_buffer",
+    )
+
+    _recv_errnos = _AbstractTransport._recv_errnos
+    _nonblocking_deadline = _AbstractTransport._nonblocking_deadline
+    # the socket carries the ciphertext, no TLS record is waited for.
+    _recv_into_nonblocking = _AbstractTransport._recv_into_nonblocking
+
+    def _setup_transport(self):
+        """Set up the SSL object and do the handshake."""
+        self._sslobj = self._wrap_socket(self.sock, **self.sslopts)
+        self._tls_buffer = memoryview(bytearray(TLS_RECV_SIZE))
+        self._quick_recv_into = self.sock.recv_into
+        try:
+            with self.having_timeout(self.connect_timeout):
+                while True:
+                    try:
+                        self._sslobj.do_handshake()
+                    except SSLWantReadError:
+                        self._send_encrypted()
+                        self._receive_encrypted()
+                    else:
+                        break
+                self._send_encrypted()
+        except OSError:
+            self._forget_session()
+            raise
+        self._store_session(self._sslobj)
+
+    def _wrap_with_context(self, context, sock, server_side=False,
+                           server_hostname=None, session=None, **sslopts):
+        context, cached = self._resume_session(context, server_side)
+        self._incoming = ssl.MemoryBIO()
+        self._outgoing = ssl.MemoryBIO()
+        return context.wrap_bio(
+            self._incoming, self._outgoing, server_side=server_side,
+            server_hostname=server_hostname, session=cached or session)
+
+    def pending(self):
+        return self._sslobj.pending() if self._sslobj is not None else 0
+
+    def _shutdown_transport(self):
+        """Send the TLS close_notify alert, not waiting for the reply."""
+        if self._sslobj is not None and self.sock is not None:
+            self._store_session(self._sslobj)
+            try:
+                self._sslobj.unwrap()
+            except SSLWantReadError:
+                pass
+            self._send_encrypted()
+
+    def _read(self, n, initial=False, view=False):
+        rbuf = self._read_buffer
+        while len(rbuf) < n:
+            if not self._decrypt():
+                if self._outgoing.pending:
+                    # e.g. the reply to a TLS key update.
+                    self._send_encrypted()
+                self._receive_encrypted(initial)
+        return rbuf.consume_view(n) if view else rbuf.consume(n)
+
+    def receive_available(self):
+        tls_buffer = self._tls_buffer
+        while True:
+            try:
+                if MSG_DONTWAIT:
+                    nbytes = self.sock.recv_into(tls_buffer, 0, MSG_DONTWAIT)
+                else:
+                    nbytes = self._recv_nonblocking(tls_buffer)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as exc:
+                if exc.errno not in _UNAVAIL:
+                    self.connected = False
+                raise
+            if not nbytes:
+                self.connected = False
+                raise OSError('Server unexpectedly closed connection')
+            self._incoming.write(tls_buffer[:nbytes])
+            if nbytes < len(tls_buffer):
+                break
+        return self._decrypt()
+
+    def _recv_nonblocking(self, buf):
+        return self._call_nonblocking(self.sock.recv_into, buf)
+
+    def _read_some_into(self, buf, initial=False):
+        # the socket carries ciphertext: decrypt into buf instead.
+        read = self._sslobj.read
+        while True:
+            try:
+                nbytes = read(len(buf), buf)
+            except SSLWantReadError:
+                if self._outgoing.pending:
+                    self._send_encrypted()
+                self._receive_encrypted(initial)
+                continue
+            except SSLZeroReturnError:
+                nbytes = 0
+            if not nbytes:
+                self.connected = False
+                raise OSError('Server unexpectedly closed connection')
+            return nbytes
+
+    def _receive_encrypted(self, initial=False):
+        """Receive a block of ciphertext from the socket."""
+        nbytes = self._recv_into(self._tls_buffer, initial)
+        self._incoming.write(self._tls_buffer[:nbytes])
+
+    def _decrypt(self):
+        """Decrypt the complete records received into the receive buffer.
+
+        Returns the number of plaintext bytes added.
+        """
+        rbuf = self._read_buffer
+        read = self._sslobj.read
+        decrypted = 0
+        while True:
+            buf = rbuf.reserve(len(rbuf) + RECV_CHUNK_SIZE)
+            try:
+                nbytes = read(len(buf), buf)
+            except SSLWantReadError:
+                return decrypted
+            except SSLZeroReturnError:
+                nbytes = 0
+            if not nbytes:
+                self.connected = False
+                raise OSError('Server unexpectedly closed connection')
+            rbuf.commit(nbytes)
+            decrypted += nbytes
+
+    def _write(self, s):
+        """Write a string out to the peer fully."""
+        write = self._sslobj.write
+        data = memoryview(s).cast('B')
+        while data:
+            data = data[write(data):]
+        self._send_encrypted()
+
+    # _write already waits for the socket until the deadline.
+    _write_before_deadline = _write
+
+    def _send_nonblocking(self, data):
+        """Encrypt and send a record of ``data`` if the socket is writable.
+
+        The ciphertext the socket did not take at once is sent blocking.
+        """
+        if not _wait_for_socket(self.sock, writable=True, timeout=0)[1]:
+            raise BlockingIOError()
+        n = self._sslobj.write(memoryview(data)[:TLS_RECORD_SIZE])
+        self._send_encrypted()
+        return n
+
+    def _send_encrypted(self):
+        """Send the ciphertext produced so far."""
+        data = self._outgoing.read()
+        if self._deadline is None:
+            if data:
+                self.sock.sendall(data)
+            return
+        data = memoryview(data)
+        while data:
+            try:
+                if MSG_DONTWAIT:
+                    n = self.sock.send(data, MSG_DONTWAIT)
+                else:
+                    n = _AbstractTransport._send_nonblocking(self, data)
+            except (BlockingIOError, InterruptedError):
+                n = 0
+            if n:
+                data = data[n:]
+            else:
+                self._wait_writable()
+
 
 class TCPTransport(_AbstractTransport):
     """Transport that deals directly with TCP socket.
@@ -617,37 +1886,79 @@ class TCPTransport(_AbstractTransport):
 
     def _setup_transport(self):
         # Setup to _write() directly to the socket, and
-        # do our own buffered reads.
+        # do our own buffered reads straight into the receive buffer.
         self._write = self.sock.sendall
-        self._read_buffer = EMPTY_BUFFER
-        self._quick_recv = self.sock.recv
-
-    def _read(self, n, initial=False, _errnos=(errno.EAGAIN, errno.EINTR)):
-        """Read exactly n bytes from the socket."""
-        recv = self._quick_recv
-        rbuf = self._read_buffer
-        try:
-            while len(rbuf) < n:
-                try:
-                    s = recv(n - len(rbuf))
-                except OSError as exc:
-                    if exc.errno in _errnos:
-                        if initial and self.raise_on_initial_eintr:
-                            raise socket.timeout()
-                        continue
-                    raise
-                if not s:
-                    raise OSError('Server unexpectedly closed connection')
-                rbuf += s
-        except:  # noqa
-            self._read_buffer = rbuf
-            raise
-
-        result, self._read_buffer = rbuf[:n], rbuf[n:]
-        return result
+        self._read_buffer = RecvBuffer()
+        self._quick_recv_into = self.sock.recv_into
 
+    def _read(self, n, initial=False, view=False):
+        """Read exactly n bytes from the socket.
 
-def Transport(host, connect_timeout=None, ssl=False, **kwargs):
+        Every ``recv_into`` call fills as much of the receive buffer as the
+        kernel has data for, so the following frames are usually served
+        from the buffer without another system call.
+        """
+        rbuf = self._read_buffer
+        while len(rbuf) < n:
+            rbuf.commit(self._recv_into(rbuf.reserve(n), initial))
+        return rbuf.consume_view(n) if view else rbuf.consume(n)
+
+    def receive_available(self):
+        if MSG_DONTWAIT:
+            # no need to switch the socket to non-blocking mode.
+            return self._receive_available(MSG_DONTWAIT)
+        return super().receive_available()
+
+    def _send_nonblocking(self, data):
+        if MSG_DONTWAIT:
+            return self.sock.send(data, MSG_DONTWAIT)
+        return super()._send_nonblocking(data)
+
+    def _writev(self, buffers, iov_max=IOV_MAX):
+        """Write buffers with as few ``sendmsg`` calls as possible."""
+        if not HAS_SENDMSG:
+            return super()._writev(buffers)
+        self._sendmsg_all(self.sock.sendmsg, buffers, iov_max)
+
+    def _writev_before_deadline(self, buffers, iov_max=IOV_MAX):
+        """Write buffers with ``sendmsg`` until the deadline."""
+        if not HAS_SENDMSG:
+            return super()._writev_before_deadline(buffers)
+        self._sendmsg_all(self._sendmsg_nonblocking, buffers, iov_max)
+
+    def _sendmsg_nonblocking(self, buffers):
+        sock = self.sock
+        if MSG_DONTWAIT:
+            return sock.sendmsg(buffers, (), MSG_DONTWAIT)
+        return self._call_nonblocking(sock.sendmsg, buffers)
+
+    def _sendmsg_all(self, sendmsg, buffers, iov_max):
+        buffers = list(buffers)
+        pos, count = 0, len(buffers)
+        while pos < count:
+            try:
+                sent = sendmsg(buffers[pos:pos + iov_max])
+            except (BlockingIOError, InterruptedError):
+                sent = 0
+            if not sent:
+                # only when not blocking: wait until the deadline.
+                self._wait_writable()
+                continue
+            # skip the buffers sent completely, and trim the partial one.
+            while pos < count and sent >= len(buffers[pos]):
+                sent -= len(buffers[pos])
+                pos += 1
+            if sent:
+                buffers[pos] = memoryview(buffers[pos])[sent:]
+
+    def _sendfile(self, file, offset, count):
+        """Write part of a file with ``sendfile(2)`` where possible."""
+        if self.sock.sendfile(file, offset, count) < count:
+            raise ValueError('File ended before all data was sent')
+
+
+def Transport(host, connect_timeout=None, ssl=False, ssl_memory_bio=False,
+              **kwargs):
     """Create transport.
 
     Given a few parameters from the Connection constructor,
@@ -670,10 +1981,19 @@ def Transport(host, connect_timeout=None, ssl=False, **kwargs):
             and ``ssl`` parameter is passed to it. Otherwise
             :class:`~amqp.transport.TCPTransport` is used.
 
+        ssl_memory_bio: bool
+
+            If set along with ``ssl``,
+            :class:`~amqp.transport.SSLBIOTransport` is used instead of
+            :class:`~amqp.transport.SSLTransport`.
+
         kwargs:
 
             additional arguments of :class:`~amqp.transport._AbstractTransport`
             class
     """
-    transport = SSLTransport if ssl else TCPTransport
+    if ssl:
+        transport = SSLBIOTransport if ssl_memory_bio else SSLTransport
+    else:
+        transport = TCPTransport
     return transport(host, connect_timeout=connect_timeout, ssl=ssl, **kwargs)
@@ -51,6 +51,21 @@ class test_AbstractChannel:
         self.c.send_method((50, 60), 'iB', (30, 0), wait=(50, 61))
         self.c.wait.assert_called_with((50, 61), returns_tuple=False)
 
+    def test_send_method__template(self):
+        self.c.send_method(spec.Basic.Ack, 'Lb', (30, True))
+        self.conn.frame_writer.write_method.assert_called_with(
+            self.channel_id, spec.Basic.Ack, (30, True),
+        )
+        self.conn.frame_writer.assert_not_called()
+
+    def test_send_method__template_other_format(self):
+        self.c.send_method(spec.Basic.Ack, 'Lbb', (30, True, False))
+        self.conn.frame_writer.write_method.assert_not_called()
+        self.conn.frame_writer.assert_called_with(
+            1, self.channel_id, spec.Basic.Ack,
+            dumps('Lbb', (30, True, False)), None,
+        )
+
     def test_send_method__no_connection(self):
         self.c.connection = None
         with pytest.raises(RecoverableConnectionError):
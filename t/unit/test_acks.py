@@ -0,0 +1,125 @@
+from unittest.mock import MagicMock, Mock, call, patch
+
+import pytest
+
+from amqp.acks import AckBatcher
+from amqp.channel import Channel
+
+
+class test_AckBatcher:
+
+    @pytest.fixture(autouse=True)
+    def setup_channel(self):
+        self.conn = MagicMock(name='connection')
+        self.conn.is_closing = False
+        self.conn.channels = {}
+        self.conn.client_properties = {}
+        self.conn.before_read = set()
+        self.c = Channel(self.conn, 1)
+        self.c.basic_ack = Mock(name='basic_ack')
+        self.c.basic_reject = Mock(name='basic_reject')
+        self.batcher = AckBatcher(self.c, max_pending=3, max_delay=10)
+
+    def test_init__registers(self):
+        assert self.c.ack_batcher is self.batcher
+        assert self.batcher.flush in self.conn.before_read
+
+    def test_ack__held_back(self):
+        self.batcher.ack(1)
+        self.batcher.ack(2)
+        self.c.basic_ack.assert_not_called()
+        assert len(self.batcher) == 2
+
+    def test_ack__max_pending(self):
+        for tag in (2, 1, 3):
+            self.batcher.ack(tag)
+        self.c.basic_ack.assert_called_once_with(3, multiple=True)
+        assert not self.batcher.pending
+        assert self.batcher.settled_up_to == 3
+
+    def test_ack__max_pending_with_gap(self):
+        for tag in (2, 3, 4):
+            self.batcher.ack(tag)
+        assert self.c.basic_ack.call_args_list == [
+            call(2), call(3), call(4),
+        ]
+        assert self.batcher.settled_up_to == 0
+        # filling the gap only acks the missing tag.
+        self.c.basic_ack.reset_mock()
+        self.batcher.ack(1)
+        self.batcher.ack(6)
+        self.batcher.flush()
+        assert self.c.basic_ack.call_args_list == [
+            call(1, multiple=True), call(6),
+        ]
+        assert self.batcher.settled_up_to == 4
+        assert self.batcher._settled == {6}
+
+    def test_ack__max_delay(self):
+        self.batcher.max_delay = 0.1
+        with patch('amqp.acks.monotonic') as monotonic:
+            monotonic.return_value = 1.0
+            self.batcher.ack(1)
+            self.c.basic_ack.assert_not_called()
+            monotonic.return_value = 1.2
+            self.batcher.ack(2)
+        self.c.basic_ack.assert_called_once_with(2, multiple=True)
+
+    def test_ack__already_settled(self):
+        self.batcher.ack(1)
+        self.batcher.flush()
+        self.batcher.ack(1)
+        assert not self.batcher.pending
+
+    def test_reject__sent_right_away(self):
+        self.batcher.ack(1)
+        self.batcher.reject(2, requeue=False)
+        self.batcher.ack(3)
+        self.c.basic_reject.assert_called_once_with(2, False)
+        self.batcher.flush()
+        # the rejected message is skipped by the range.
+        assert self.c.basic_ack.call_args_list == [
+            call(1, multiple=True), call(3, multiple=True),
+        ]
+        assert self.batcher.settled_up_to == 3
+
+    def test_flush__nothing_pending(self):
+        self.batcher.flush()
+        self.c.basic_ack.assert_not_called()
+
+    def test_close(self):
+        self.batcher.ack(1)
+        self.batcher.close()
+        self.c.basic_ack.assert_called_once_with(1, multiple=True)
+        assert self.c.ack_batcher is None
+        assert not self.conn.before_read
+
+    def test_channel_close__flushes(self):
+        self.c.is_open = True
+        self.c.send_method = Mock(name='send_method')
+        self.batcher.ack(1)
+        self.c.close()
+        self.c.basic_ack.assert_called_once_with(1, multiple=True)
+        self.c.send_method.assert_called_once()
+        assert not self.conn.before_read
+
+    def test_channel_collect__detaches(self):
+        self.batcher.ack(1)
+        self.c.collect()
+        self.c.basic_ack.assert_not_called()
+        assert self.c.ack_batcher is None
+        assert not self.conn.before_read
+
+    def test_channel_revive__resets(self):
+        for tag in (1, 2, 3, 5):
+            self.batcher.ack(tag)
+        self.c.basic_ack.reset_mock()
+        self.c.open = Mock(name='open')
+        self.c._do_revive()
+        assert self.c.ack_batcher is self.batcher
+        assert self.batcher.settled_up_to == 0
+        assert not self.batcher.pending
+        for tag in (1, 2):
+            self.batcher.ack(tag)
+        self.batcher.flush()
+        self.c.basic_ack.assert_called_once_with(2, multiple=True)
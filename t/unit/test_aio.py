@@ -0,0 +1,312 @@
+import asyncio
+from struct import pack, unpack
+from unittest.mock import Mock
+
+import pytest
+
+from amqp import spec
+from amqp.aio import AsyncChannel, AsyncConnection, AsyncTransport
+from amqp.basic_message import Message
+from amqp.confirms import ConfirmTracker
+from amqp.exceptions import NotFound
+from amqp.serialization import dumps, loads
+
+
+class Broker:
+    """Just enough of an AMQP server to talk to one client."""
+
+    def __init__(self):
+        self.received = []
+        self.consume_tag = 'ctag'
+        self.published = 0
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.serve, '127.0.0.1', 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def send_method(self, channel, sig, format=None, args=None):
+        payload = pack('>HH', *sig) + (dumps(format, args) if format else b'')
+        self.send_frame(1, channel, payload)
+
+    def send_frame(self, frame_type, channel, payload):
+        self.writer.write(pack('>BHI', frame_type, channel, len(payload)))
+        self.writer.write(payload + b'\xce')
+
+    def deliver(self, channel, delivery_tag, body):
+        self.send_method(channel, spec.Basic.Deliver, 'sLbss',
+                         (self.consume_tag, delivery_tag, False, 'ex', 'rk'))
+        msg = Message(body, content_type='text/plain')
+        header = pack('>HHQ', 60, 0, len(body))
+        self.send_frame(2, channel, header + msg._serialize_properties())
+        self.send_frame(3, channel, body)
+
+    async def read_frame(self, reader):
+        frame_type, channel, size = unpack('>BHI', await reader.readexactly(7))
+        payload = await reader.readexactly(size + 1)
+        return frame_type, channel, payload[:-1]
+
+    async def serve(self, reader, writer):
+        self.writer = writer
+        assert await reader.readexactly(8) == b'AMQP\x00\x00\x09\x01'
+        self.send_method(0, spec.Connection.Start, 'ooFSS',
+                         (0, 9, {}, 'PLAIN AMQPLAIN', 'en_US'))
+        try:
+            while True:
+                frame = await self.read_frame(reader)
+                self.received.append(frame)
+                if frame[0] == 1:
+                    self.on_method(frame[1], unpack('>HH', frame[2][:4]),
+                                   frame[2])
+        except asyncio.IncompleteReadError:
+            writer.close()
+
+    def on_method(self, channel, sig, payload):
+        if sig == spec.Connection.StartOk:
+            self.send_method(0, spec.Connection.Tune, 'BlB', (10, 4096, 0))
+        elif sig == spec.Connection.Open:
+            self.send_method(0, spec.Connection.OpenOk, 's', ('',))
+        elif sig == spec.Channel.Open:
+            self.send_method(channel, spec.Channel.OpenOk, 's', ('',))
+        elif sig == spec.Channel.Close:
+            self.send_method(channel, spec.Channel.CloseOk)
+        elif sig == spec.Connection.Close:
+            self.send_method(0, spec.Connection.CloseOk)
+        elif sig == spec.Queue.Declare:
+            queue = loads('Bs', payload, 4)[0][1]
+            if queue == 'missing':
+                self.send_method(channel, spec.Channel.Close, 'BsBB',
+                                 (404, 'NOT_FOUND', 50, 10))
+            else:
+                self.send_method(channel, spec.Queue.DeclareOk, 'sll',
+                                 (queue, 3, 0))
+        elif sig == spec.Basic.Consume:
+            self.send_method(channel, spec.Basic.ConsumeOk, 's',
+                             (self.consume_tag,))
+            self.deliver(channel, 1, b'hello')
+            self.deliver(channel, 2, b'world')
+        elif sig == spec.Confirm.Select:
+            self.send_method(channel, spec.Confirm.SelectOk)
+        elif sig == spec.Basic.Publish:
+            self.published += 1
+            self.send_method(channel, spec.Basic.Ack, 'Lb',
+                             (self.published, False))
+        elif sig == spec.Basic.Get:
+            self.send_method(channel, spec.Basic.GetEmpty, 's', ('',))
+
+    def methods(self):
+        return [unpack('>HH', payload[:4])
+                for frame_type, _, payload in self.received
+                if frame_type == 1]
+
+
+def run(test):
+    async def main():
+        broker = Broker()
+        port = await broker.start()
+        try:
+            conn = AsyncConnection(f'127.0.0.1:{port}', connect_timeout=5)
+            await conn.connect()
+            try:
+                await asyncio.wait_for(test(broker, conn), 5)
+            finally:
+                await conn.close()
+        finally:
+            await broker.stop()
+    asyncio.run(main())
+
+
+class test_AsyncTransport:
+
+    def setup_method(self):
+        self.t = AsyncTransport(Mock(name='connection'))
+        self.t.connection_made(Mock(name='transport'))
+
+    def test_write__copies_reused_buffers(self):
+        buf = bytearray(b'frame')
+        self.t.write(memoryview(buf)[:3])
+        buf[:] = b'other'
+        data = self.t.transport.write.call_args[0][0]
+        assert isinstance(data, bytes)
+        assert data == b'fra'
+
+    def test_writev__copies_reused_buffers(self):
+        body = memoryview(b'body')
+        buf = bytearray(b'head')
+        self.t.writev([b'\x03', memoryview(buf), body])
+        buf[:] = b'xxxx'
+        buffers = self.t.transport.writelines.call_args[0][0]
+        assert buffers == [b'\x03', b'head', b'body']
+        assert buffers[2] is body
+
+    def test_writable(self):
+        on_writability_changed = self.t.connection.on_writability_changed
+        assert self.t.writable
+        self.t.pause_writing()
+        assert not self.t.writable
+        on_writability_changed.assert_called_with(False)
+        self.t.resume_writing()
+        assert self.t.writable
+        on_writability_changed.assert_called_with(True)
+
+    def test_writable__no_callback(self):
+        self.t.connection.on_writability_changed = None
+        self.t.pause_writing()
+        assert not self.t.writable
+
+
+class test_AsyncConnection:
+
+    def test_connect_and_close(self):
+        async def test(broker, conn):
+            assert conn.connected
+            assert conn.writable
+            assert conn.channel_max == 10
+            assert conn.frame_max == 4096
+        run(test)
+
+    def test_close(self):
+        async def test(broker, conn):
+            await conn.close()
+            assert not conn.connected
+            assert spec.Connection.Close in broker.methods()
+        run(test)
+
+    def test_stream_body_threshold_not_supported(self):
+        with pytest.raises(ValueError):
+            AsyncConnection('127.0.0.1', stream_body_threshold=1024)
+
+    def test_drain_events_not_supported(self):
+        async def test(broker, conn):
+            with pytest.raises(NotImplementedError):
+                conn.drain_events()
+        run(test)
+
+
+class test_AsyncChannel:
+
+    def test_channel_open_close(self):
+        async def test(broker, conn):
+            channel = await conn.channel()
+            assert isinstance(channel, AsyncChannel)
+            assert channel.is_open
+            assert await conn.channel(channel.channel_id) is channel
+            await channel.close()
+            assert channel.channel_id not in conn.channels
+        run(test)
+
+    def test_queue_declare(self):
+        async def test(broker, conn):
+            channel = await conn.channel()
+            ret = await channel.queue_declare('foo')
+            assert ret.queue == 'foo'
+            assert ret.message_count == 3
+        run(test)
+
+    def test_channel_error(self):
+        async def test(broker, conn):
+            channel = await conn.channel()
+            with pytest.raises(NotFound):
+                await channel.queue_declare('missing')
+            # the channel is reopened in the background.
+            await (await conn.channel()).queue_declare('foo')
+            assert spec.Channel.CloseOk in broker.methods()
+            assert channel.is_open
+        run(test)
+
+    def test_basic_consume(self):
+        async def test(broker, conn):
+            channel = await conn.channel()
+            received = asyncio.Queue()
+            tag = await channel.basic_consume(
+                'foo', callback=received.put_nowait)
+            assert tag == 'ctag'
+            msgs = [await received.get(), await received.get()]
+            assert [m.body for m in msgs] == [b'hello', b'world']
+            assert [m.delivery_tag for m in msgs] == [1, 2]
+            assert msgs[0].channel is channel
+        run(test)
+
+    def test_basic_consume__coroutine_callback(self):
+        async def test(broker, conn):
+            channel = await conn.channel()
+            done = asyncio.Event()
+            bodies = []
+
+            async def on_message(message):
+                await asyncio.sleep(0)
+                bodies.append(message.body)
+                if len(bodies) == 2:
+                    done.set()
+            await channel.basic_consume('foo', callback=on_message)
+            await done.wait()
+            assert bodies == [b'hello', b'world']
+        run(test)
+
+    def test_basic_get_many__not_supported(self):
+        async def test(broker, conn):
+            channel = await conn.channel()
+            sent = len(broker.methods())
+            with pytest.raises(NotImplementedError):
+                channel.basic_get_many('foo', 2)
+            await channel.queue_declare('foo')
+            assert spec.Basic.Get not in broker.methods()[sent:]
+        run(test)
+
+    def test_confirm_tracker__not_supported(self):
+        async def test(broker, conn):
+            channel = await conn.channel()
+            with pytest.raises(TypeError):
+                ConfirmTracker(channel)
+            await channel.queue_declare('foo')
+            assert spec.Confirm.Select not in broker.methods()
+        run(test)
+
+    def test_revive__discards_get_many(self):
+        async def test(broker, conn):
+            channel = await conn.channel()
+            channel._get_many_batches.append([1, []])
+            channel._do_revive()
+            assert not channel._get_many_batches
+            await channel.wait(spec.Channel.OpenOk)
+        run(test)
+
+    def test_basic_get__empty(self):
+        async def test(broker, conn):
+            channel = await conn.channel()
+            assert await channel.basic_get('foo') is None
+        run(test)
+
+    def test_basic_publish(self):
+        async def test(broker, conn):
+            channel = await conn.channel()
+            await channel.basic_publish(
+                Message('payload'), exchange='ex', routing_key='rk')
+            # a round trip so the broker has read the message.
+            await channel.queue_declare('foo')
+            frames = [f for f in broker.received if f[1] == channel.channel_id]
+            types = [f[0] for f in frames]
+            assert types[types.index(1, 1):][:3] == [1, 2, 3]
+            assert b'payload' in [f[2] for f in frames if f[0] == 3]
+        run(test)
+
+    def test_basic_publish_confirm(self):
+        async def test(broker, conn):
+            conn.confirm_publish = True
+            channel = await conn.channel()
+            await channel.basic_publish(Message('payload'), routing_key='rk')
+            await channel.basic_publish(Message('payload'), routing_key='rk')
+            assert broker.methods().count(spec.Confirm.Select) == 1
+            assert broker.published == 2
+        run(test)
+
+    def test_wait__timeout(self):
+        async def test(broker, conn):
+            channel = await conn.channel()
+            with pytest.raises(asyncio.TimeoutError):
+                await channel.wait(spec.Basic.QosOk, timeout=0.01)
+            assert spec.Basic.QosOk not in channel._pending
+        run(test)
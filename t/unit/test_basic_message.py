@@ -1,6 +1,6 @@
 from unittest.mock import Mock
 
-from amqp.basic_message import Message
+from amqp.basic_message import BodyReader, Message
 
 
 class test_Message:
@@ -16,3 +16,51 @@ class test_Message:
         assert m.channel
         assert m.headers == {'h': 'v'}
         assert m.delivery_tag == '1234'
+
+
+class test_BodyReader:
+
+    def setup_method(self):
+        self.connection = Mock(name='connection')
+        self.reader = BodyReader(self.connection, 16)
+        self.chunks = [b'thequick', b'brownfox']
+        self.connection.blocking_read.side_effect = (
+            lambda timeout: self.reader.feed(self.chunks.pop(0)))
+
+    def test_read(self):
+        assert self.reader.read() == b'thequickbrownfox'
+        assert self.reader.complete
+        assert self.connection.blocking_read.call_count == 2
+
+    def test_read__size(self):
+        assert self.reader.read(5) == b'thequ'
+        assert self.reader.read(5) == b'ick'
+        assert self.reader.read(100) == b'brownfox'
+        assert self.reader.read(5) == b''
+
+    def test_readinto(self):
+        buf = bytearray(16)
+        assert self.reader.readinto(memoryview(buf)[:8]) == 8
+        assert self.reader.readinto(memoryview(buf)[8:]) == 8
+        assert buf == b'thequickbrownfox'
+        assert self.reader.readinto(buf) == 0
+
+    def test_iter__buffered(self):
+        self.reader.feed(self.chunks.pop(0))
+        assert next(self.reader) == b'thequick'
+        self.connection.blocking_read.assert_not_called()
+        assert list(self.reader) == [b'brownfox']
+
+    def test_timeout(self):
+        self.reader.timeout = 3.0
+        self.reader.read()
+        self.connection.blocking_read.assert_called_with(3.0)
+
+    def test_close(self):
+        with self.reader as reader:
+            reader.feed(self.chunks.pop(0))
+        assert reader.closed
+        reader.feed(self.chunks.pop(0))
+        assert reader.complete
+        assert reader.read() == b''
+        assert 'BodyReader' in repr(reader)
@@ -1,6 +1,6 @@
 import socket
 from struct import pack
-from unittest.mock import ANY, MagicMock, Mock, patch
+from unittest.mock import ANY, MagicMock, Mock, call, patch
 
 import pytest
 from vine import promise
@@ -56,7 +56,11 @@ class test_Channel:
         self.c.cancel_callbacks['foo'] = Mock()
         self.c.events['bar'].add(Mock())
         self.c.no_ack_consumers.add('foo')
+        self.c._confirm_selected = True
+        self.c.next_publish_seq_no = 10
         self.c.collect()
+        assert not self.c._confirm_selected
+        assert self.c.next_publish_seq_no == 0
         assert not self.c.callbacks
         assert not self.c.cancel_callbacks
         assert not self.c.events
@@ -376,6 +380,98 @@ class test_Channel:
             'dtag', 'redelivered', 'ex', 'rkey', 'mcount', 'msg',
         )
 
+    def test_basic_get_many(self):
+        msgs = [Message(), Message()]
+        replies = [
+            (spec.Basic.GetOk, (1, False, 'ex', 'rkey', 2, msgs[0])),
+            (spec.Basic.GetOk, (2, False, 'ex', 'rkey', 1, msgs[1])),
+            (spec.Basic.GetEmpty, ('',)),
+        ]
+
+        def drain_events(timeout=None):
+            sig, args = replies.pop(0)
+            self.c._callbacks[sig](*args)
+        self.conn.drain_events.side_effect = drain_events
+
+        ret = self.c.basic_get_many('q', 3)
+        assert ret == msgs
+        assert [m.delivery_tag for m in ret] == [1, 2]
+        assert ret[0].channel is self.c
+        self.c.send_method.assert_has_calls(
+            [call(spec.Basic.Get, 'Bsb', (0, 'q', False))] * 3)
+        assert self.conn.drain_events.call_count == 3
+        assert spec.Basic.GetOk not in self.c._callbacks
+        assert spec.Basic.GetEmpty not in self.c._callbacks
+
+    def test_basic_get_many__error(self):
+        self.conn.drain_events.side_effect = KeyError()
+        with pytest.raises(KeyError):
+            self.c.basic_get_many('q', 2)
+        # the replies may still come.
+        assert spec.Basic.GetOk in self.c._callbacks
+
+    def test_basic_get_many__timeout(self):
+        msgs = [Message(), Message()]
+        replies = [
+            (spec.Basic.GetOk, (1, False, 'ex', 'rkey', 2, msgs[0])),
+            None,
+            (spec.Basic.GetOk, (2, False, 'ex', 'rkey', 1, msgs[1])),
+            (spec.Basic.GetEmpty, ('',)),
+        ]
+
+        def drain_events(timeout=None):
+            reply = replies.pop(0)
+            if reply is None:
+                raise socket.timeout()
+            self.c._callbacks[reply[0]](*reply[1])
+        self.conn.drain_events.side_effect = drain_events
+
+        with pytest.raises(socket.timeout) as excinfo:
+            self.c.basic_get_many('q', 3, timeout=1)
+        assert excinfo.value.messages == msgs[:1]
+        # the late replies are collected before the next basic_get.
+        self.c.send_method.return_value = ()
+        assert self.c.basic_get('q') is None
+        assert excinfo.value.messages == msgs
+        assert spec.Basic.GetOk not in self.c._callbacks
+        assert not self.c._get_many_batches
+
+    def test_basic_get_many__batches(self):
+        msgs = [Message(), Message()]
+        pending = []
+        self.conn.drain_events.side_effect = socket.timeout()
+        with pytest.raises(socket.timeout) as excinfo:
+            self.c.basic_get_many('q', 1)
+        pending.append((spec.Basic.GetOk, (1, False, 'ex', 'rk', 1, msgs[0])))
+        pending.append((spec.Basic.GetOk, (2, False, 'ex', 'rk', 0, msgs[1])))
+
+        def drain_events(timeout=None):
+            sig, args = pending.pop(0)
+            self.c._callbacks[sig](*args)
+        self.conn.drain_events.side_effect = drain_events
+        assert self.c.basic_get_many('q', 1) == msgs[1:]
+        assert excinfo.value.messages == msgs[:1]
+
+    def test_basic_get_many__send_error(self):
+        self.c.send_method.side_effect = [None, OSError()]
+        with pytest.raises(OSError) as excinfo:
+            self.c.basic_get_many('q', 3)
+        assert excinfo.value.messages == []
+        assert self.c._get_many_batches[0][0] == 1
+
+    def test_basic_get_many__channel_reopened(self):
+        self.conn.drain_events.side_effect = socket.timeout()
+        with pytest.raises(socket.timeout):
+            self.c.basic_get_many('q', 2)
+        self.c.open = Mock(name='open')
+        self.c._do_revive()
+        assert not self.c._get_many_batches
+        assert spec.Basic.GetOk not in self.c._callbacks
+
+    def test_basic_get_many__zero(self):
+        assert self.c.basic_get_many('q', 0) == []
+        self.c.send_method.assert_not_called()
+
     def test_on_get_empty(self):
         self.c._on_get_empty(1)
 
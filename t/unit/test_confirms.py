@@ -0,0 +1,127 @@
+from unittest.mock import MagicMock, Mock
+
+import pytest
+
+from amqp.channel import Channel
+from amqp.confirms import ConfirmTracker
+from amqp.exceptions import MessageNacked, RecoverableConnectionError
+
+
+class test_ConfirmTracker:
+
+    @pytest.fixture(autouse=True)
+    def setup_channel(self):
+        self.conn = MagicMock(name='connection')
+        self.conn.is_closing = False
+        self.conn.channels = {}
+        self.conn.client_properties = {}
+        self.c = Channel(self.conn, 1)
+        self.c.send_method = Mock(name='send_method')
+        self.tracker = ConfirmTracker(self.c, max_in_flight=3)
+
+    def publish(self, n):
+        return [self.tracker.publish('msg', routing_key='rkey')
+                for _ in range(n)]
+
+    def test_channel_close_event_not_fired(self):
+        on_close = Mock(name='on_close')
+        self.c.events['channel_close'].add(on_close)
+        self.publish(1)
+        self.c.collect()
+        on_close.assert_not_called()
+
+    def test_init__selects_confirm_mode(self):
+        assert self.c._confirm_selected
+        assert self.c.next_publish_seq_no == 1
+        self.c.send_method.assert_called_once()
+
+    def test_init__confirm_mode_already_selected(self):
+        self.c.send_method.reset_mock()
+        ConfirmTracker(self.c)
+        self.c.send_method.assert_not_called()
+
+    def test_publish__assigns_delivery_tags(self):
+        self.publish(3)
+        assert list(self.tracker.unconfirmed) == [1, 2, 3]
+        assert self.c.next_publish_seq_no == 4
+
+    def test_ack(self):
+        p1, p2 = self.publish(2)
+        self.c._on_basic_ack(2, False)
+        assert p2.ready and p2.value == ((2,), {})
+        assert not p1.ready
+        assert list(self.tracker.unconfirmed) == [1]
+
+    def test_ack__multiple(self):
+        p1, p2, p3 = self.publish(3)
+        self.c._on_basic_ack(2, True)
+        assert p1.ready and p2.ready and not p3.ready
+        assert len(self.tracker) == 1
+
+    def test_ack__unknown_tag(self):
+        self.publish(1)
+        self.c._on_basic_ack(42, False)
+        assert len(self.tracker) == 1
+
+    def test_nack(self):
+        p1, p2 = self.publish(2)
+        on_error = Mock(name='on_error')
+        p1.then(Mock(), on_error)
+        self.c._on_basic_nack(2, True)
+        assert isinstance(on_error.call_args[0][0], MessageNacked)
+        assert p2.failed and isinstance(p2.reason, MessageNacked)
+        assert not len(self.tracker)
+
+    def test_publish__waits_when_window_full(self):
+        self.publish(3)
+
+        def on_drain(timeout=None):
+            self.c._on_basic_ack(2, True)
+        self.conn.drain_events.side_effect = on_drain
+        self.publish(1)
+        self.conn.drain_events.assert_called_once_with(timeout=None)
+        assert list(self.tracker.unconfirmed) == [3, 4]
+
+    def test_wait_for_confirms(self):
+        self.publish(2)
+        acks = iter([(1, False), (2, False)])
+        self.conn.drain_events.side_effect = (
+            lambda timeout=None: self.c._on_basic_ack(*next(acks)))
+        self.tracker.wait_for_confirms(timeout=3)
+        assert self.conn.drain_events.call_count == 2
+        assert not len(self.tracker)
+
+    def test_close(self):
+        p, = self.publish(1)
+        self.tracker.close()
+        self.c._on_basic_ack(1, False)
+        assert not p.ready
+
+    def test_channel_collect__fails_unconfirmed(self):
+        p1, p2 = self.publish(2)
+        self.c.collect()
+        assert p1.failed and p2.failed
+        assert isinstance(p1.reason, RecoverableConnectionError)
+        assert str(p1.reason) == 'Channel 1 closed before confirm'
+        assert not len(self.tracker)
+        assert self.c.next_publish_seq_no == 0
+        assert not self.c._confirm_selected
+
+    def test_channel_revive__selects_confirm_mode_again(self):
+        p, = self.publish(1)
+        self.c.open = Mock(name='open')
+        self.c._do_revive()
+        assert p.failed
+        self.c.send_method.reset_mock()
+        self.publish(1)
+        assert self.c._confirm_selected
+        assert list(self.tracker.unconfirmed) == [1]
+        assert self.c.send_method.call_count == 2
+
+    def test_close__channel_close_not_tracked(self):
+        p, = self.publish(1)
+        assert self.c.confirm_tracker is self.tracker
+        self.tracker.close()
+        assert self.c.confirm_tracker is None
+        self.c.collect()
+        assert not p.ready
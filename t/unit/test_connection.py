@@ -1,6 +1,7 @@
 import re
 import socket
 import warnings
+from struct import pack
 from unittest.mock import Mock, call, patch
 
 import pytest
@@ -148,6 +149,15 @@ class test_Connection:
             self.conn.host, self.conn.connect_timeout, self.conn.ssl,
             self.conn.read_timeout, self.conn.write_timeout,
             socket_settings=self.conn.socket_settings,
+            write_buffer_size=self.conn.write_buffer_size,
+            zero_copy_body=self.conn.zero_copy_body,
+            write_high_water=self.conn.write_high_water,
+            write_low_water=self.conn.write_low_water,
+            on_writability_changed=self.conn.on_writability_changed,
+            ssl_memory_bio=self.conn.ssl_memory_bio,
+            ssl_ktls=self.conn.ssl_ktls,
+            ssl_session_cache=self.conn.ssl_session_cache,
+            resolver_cache=self.conn.resolver_cache,
         )
 
     def test_connect__already_connected(self):
@@ -386,6 +396,45 @@ class test_Connection:
         self.conn.drain_events(30)
         self.conn.blocking_read.assert_called_with(30)
 
+    def test_drain_events__batch(self):
+        deliver = pack('>HH', *spec.Basic.Deliver)
+        frames = [(1, 1, deliver), (2, 1, b'h'), (3, 1, b'b'),
+                  (1, 1, deliver), (2, 1, b'h'), (3, 1, b'b')]
+        self.conn.max_frames_per_drain = 100
+        self.conn.transport.having_timeout = ContextMock()
+        self.conn.transport.read_frame.return_value = frames[0]
+        self.conn.transport.read_buffered_frame.side_effect = (
+            [None] + frames[1:] + [None])
+        self.conn.on_inbound_frame = Mock(name='on_inbound_frame')
+        self.conn.on_inbound_frame.side_effect = (
+            lambda frame: frame[0] == 3)
+        self.conn.drain_events(30)
+        self.conn.transport.having_timeout.assert_called_once_with(30)
+        self.conn.on_inbound_frame.assert_has_calls(
+            [call(frame) for frame in frames])
+
+    def test_drain_events__batch_max_frames(self):
+        deliver = pack('>HH', *spec.Basic.Deliver)
+        self.conn.max_frames_per_drain = 2
+        self.conn.transport.read_buffered_frame.return_value = (
+            1, 1, deliver)
+        self.conn.on_inbound_frame = Mock(name='on_inbound_frame')
+        self.conn.on_inbound_frame.return_value = True
+        self.conn.drain_events(30)
+        assert self.conn.on_inbound_frame.call_count == 2
+        self.conn.transport.read_frame.assert_not_called()
+
+    def test_drain_events__batch_stops_at_synchronous_reply(self):
+        consume_ok = pack('>HH', *spec.Basic.ConsumeOk)
+        self.conn.max_frames_per_drain = 100
+        self.conn.transport.read_buffered_frame.return_value = (
+            1, 1, consume_ok)
+        self.conn.on_inbound_frame = Mock(name='on_inbound_frame')
+        self.conn.on_inbound_frame.return_value = True
+        self.conn.drain_events(30)
+        self.conn.on_inbound_frame.assert_called_once_with(
+            (1, 1, consume_ok))
+
     def test_blocking_read__no_timeout(self):
         self.conn.on_inbound_frame = Mock(name='on_inbound_frame')
         self.conn.transport.having_timeout = ContextMock()
@@ -396,21 +445,51 @@ class test_Connection:
         )
         assert ret is self.conn.on_inbound_frame()
 
+    def test_blocking_read__before_read(self):
+        callback = Mock(name='callback')
+        self.conn.before_read.add(callback)
+        self.conn.on_inbound_frame = Mock(name='on_inbound_frame')
+        self.conn.transport.having_timeout = ContextMock()
+        self.conn.transport.read_buffered_frame.return_value = None
+        self.conn.blocking_read(None)
+        callback.assert_called_once_with()
+        self.conn.on_inbound_frame.assert_called_with(
+            self.conn.transport.read_frame(),
+        )
+
+    def test_blocking_read__before_read_frame_buffered(self):
+        callback = Mock(name='callback')
+        self.conn.before_read.add(callback)
+        self.conn.on_inbound_frame = Mock(name='on_inbound_frame')
+        self.conn.transport.read_buffered_frame.return_value = (8, 0, b'')
+        self.conn.blocking_read(None)
+        callback.assert_not_called()
+        self.conn.transport.read_frame.assert_not_called()
+        self.conn.on_inbound_frame.assert_called_with((8, 0, b''))
+
+    def test_drain_events__batch_before_read(self):
+        callback = Mock(name='callback')
+        self.conn.before_read.add(callback)
+        self.conn.max_frames_per_drain = 100
+        self.conn.transport.having_timeout = ContextMock()
+        self.conn.transport.read_buffered_frame.return_value = None
+        self.conn.transport.read_frame.return_value = (8, 0, b'')
+        self.conn.on_inbound_frame = Mock(name='on_inbound_frame')
+        self.conn.on_inbound_frame.return_value = True
+        self.conn.drain_events(30)
+        callback.assert_called_once_with()
+
     def test_blocking_read__timeout(self):
         self.conn.transport = TCPTransport('localhost:5672')
         sock = self.conn.transport.sock = Mock(name='sock')
-        sock.gettimeout.return_value = 1
         self.conn.transport.read_frame = Mock(name='read_frame')
         self.conn.on_inbound_frame = Mock(name='on_inbound_frame')
         self.conn.blocking_read(3)
-        sock.gettimeout.assert_called_with()
-        sock.settimeout.assert_has_calls([call(3), call(1)])
+        sock.settimeout.assert_not_called()
         self.conn.transport.read_frame.assert_called_with()
         self.conn.on_inbound_frame.assert_called_with(
             self.conn.transport.read_frame(),
         )
-        sock.gettimeout.return_value = 3
-        self.conn.blocking_read(3)
 
     def test_blocking_read__SSLError(self):
         self.conn.on_inbound_frame = Mock(name='on_inbound_frame')
@@ -498,6 +577,15 @@ class test_Connection:
         self.conn.frame_writer.assert_called_with(
             8, 0, None, None, None,
         )
+        self.conn.transport.flush.assert_called_with()
+
+    def test_flush(self):
+        self.conn.flush()
+        self.conn.transport.flush.assert_called_with()
+
+    def test_flush__disconnected(self):
+        self.conn._transport = None
+        self.conn.flush()
 
     def test_heartbeat_tick__no_heartbeat(self):
         self.conn.heartbeat = 0
@@ -0,0 +1,147 @@
+import socket
+from struct import pack
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+
+from amqp import transport
+from amqp.eventloop import EventLoop
+from amqp.exceptions import ConnectionForced
+
+
+def frame(frame_type, channel, payload):
+    return pack('>BHI', frame_type, channel, len(payload)) + payload + b'\xce'
+
+
+class test_EventLoop:
+
+    @pytest.fixture(autouse=True)
+    def setup_loop(self):
+        self.loop = EventLoop()
+        self.sockets = []
+        yield
+        self.loop.selector.close()
+        for sock in self.sockets:
+            sock.close()
+
+    def connection(self, heartbeat=0):
+        a, b = socket.socketpair()
+        self.sockets += [a, b]
+        t = transport.TCPTransport('localhost:5672')
+        t.sock = a
+        t._setup_transport()
+        t.connected = True
+        conn = MagicMock(name='connection')
+        conn._transport = conn.transport = t
+        conn.sock = a
+        conn.heartbeat = heartbeat
+        conn.before_read = set()
+        conn.connected = True
+        conn.on_inbound_frame = Mock(name='on_inbound_frame')
+        return conn, b
+
+    def test_add_remove(self):
+        conn, _ = self.connection()
+        self.loop.add(conn)
+        assert conn in self.loop
+        assert len(self.loop) == 1
+        self.loop.remove(conn)
+        assert conn not in self.loop
+        self.loop.remove(conn)
+
+    def test_run_once__dispatches_readable(self):
+        conn1, peer1 = self.connection()
+        conn2, peer2 = self.connection()
+        self.loop.add(conn1)
+        self.loop.add(conn2)
+        peer2.sendall(frame(1, 1, b'foo') + frame(8, 0, b''))
+        assert self.loop.run_once(timeout=1) == 2
+        conn1.on_inbound_frame.assert_not_called()
+        assert conn2.on_inbound_frame.call_count == 2
+        conn2.on_inbound_frame.assert_any_call((1, 1, b'foo'))
+
+    def test_run_once__partial_frame(self):
+        conn, peer = self.connection()
+        self.loop.add(conn)
+        data = frame(1, 1, b'foobar')
+        peer.sendall(data[:5])
+        assert self.loop.run_once(timeout=1) == 0
+        peer.sendall(data[5:])
+        assert self.loop.run_once(timeout=1) == 1
+        conn.on_inbound_frame.assert_called_once_with((1, 1, b'foobar'))
+
+    def test_run_once__timeout(self):
+        conn, _ = self.connection()
+        self.loop.add(conn)
+        assert self.loop.run_once(timeout=0) == 0
+        conn.flush.assert_called_with()
+
+    def test_run_once__before_read(self):
+        conn, _ = self.connection()
+        callback = Mock(name='callback')
+        conn.before_read.add(callback)
+        conn._before_read.side_effect = lambda: callback()
+        self.loop.add(conn)
+        self.loop.run_once(timeout=0)
+        callback.assert_called_once_with()
+
+    def test_run_once__closed_connection(self):
+        conn, _ = self.connection()
+        self.loop.add(conn)
+        conn._transport = None
+        self.loop.run_once(timeout=0)
+        assert conn not in self.loop
+
+    def test_run_once__EOF(self):
+        conn, peer = self.connection()
+        self.loop.add(conn)
+        peer.close()
+        conn.connected = False
+        with pytest.raises(OSError):
+            self.loop.run_once(timeout=1)
+        assert conn not in self.loop
+
+    def test_run_once__on_error(self):
+        on_error = self.loop.on_error = Mock(name='on_error')
+        conn, peer = self.connection()
+        conn.on_inbound_frame.side_effect = KeyError()
+        self.loop.add(conn)
+        peer.sendall(frame(8, 0, b''))
+        self.loop.run_once(timeout=1)
+        on_error.assert_called_once()
+        assert on_error.call_args[0][0] is conn
+        assert conn in self.loop
+
+    def test_heartbeats(self):
+        conn, _ = self.connection(heartbeat=10)
+        with patch('amqp.eventloop.monotonic') as monotonic:
+            monotonic.return_value = 100.0
+            self.loop.add(conn)
+            self.loop.selector.close()
+            self.loop.selector = Mock(name='selector')
+            self.loop.selector.select.return_value = []
+            self.loop.run_once()
+            conn.heartbeat_tick.assert_not_called()
+            self.loop.selector.select.assert_called_with(5.0)
+            monotonic.return_value = 105.0
+            self.loop.run_once()
+            conn.heartbeat_tick.assert_called_once_with(rate=2)
+            assert self.loop._timers[0][0] == 110.0
+
+    def test_heartbeats__missed(self):
+        conn, _ = self.connection(heartbeat=10)
+        conn.heartbeat_tick.side_effect = ConnectionForced('missed')
+        self.loop.add(conn)
+        self.loop._timers[0] = (0, *self.loop._timers[0][1:])
+        with pytest.raises(ConnectionForced):
+            self.loop.run_once(timeout=0)
+        assert conn not in self.loop
+        assert not self.loop._timer_ids
+
+    def test_run__until_stopped(self):
+        conn, peer = self.connection()
+        conn.on_inbound_frame.side_effect = lambda frame: self.loop.stop()
+        self.loop.add(conn)
+        peer.sendall(frame(8, 0, b''))
+        self.loop.run()
+        conn.on_inbound_frame.assert_called_once_with((8, 0, b''))
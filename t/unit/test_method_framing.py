@@ -1,12 +1,16 @@
-from struct import pack
+import mmap
+from io import BytesIO
+from struct import pack, unpack_from
 from unittest.mock import Mock
 
 import pytest
 
 from amqp import spec
 from amqp.basic_message import Message
-from amqp.exceptions import UnexpectedFrame
-from amqp.method_framing import frame_handler, frame_writer
+from amqp.exceptions import IrrecoverableConnectionError, UnexpectedFrame
+from amqp.method_framing import (_compile_method_frame, frame_handler,
+                                 frame_writer)
+from amqp.serialization import LazyTable, dumps
 
 
 class test_frame_handler:
@@ -15,6 +19,9 @@ class test_frame_handler:
     def setup_conn(self):
         self.conn = Mock(name='connection')
         self.conn.bytes_recv = 0
+        self.conn.stream_body_threshold = None
+        self.conn.lazy_headers = False
+        self.conn.zero_copy_body = False
         self.callback = Mock(name='callback')
         self.g = frame_handler(self.conn, self.callback)
 
@@ -65,6 +72,73 @@ class test_frame_handler:
         )
         assert msg.body == b'thequickbrownfox'
 
+    def test_body_target(self):
+        assert self.g.body_target(1, 8) is None
+        self.g((1, 1, pack('>HH', *spec.Basic.Deliver)))
+        m = Message()
+        m.properties = {}
+        buf = pack('>HxxQ', m.CLASS_ID, 16)
+        buf += m._serialize_properties()
+        self.g((2, 1, buf))
+
+        target = self.g.body_target(1, 8)
+        target[:] = b'thequick'
+        assert not self.g((3, 1, target))
+        target = self.g.body_target(1, 8)
+        target[:] = b'brownfox'
+        assert self.g((3, 1, target))
+        msg = self.callback.call_args[0][3]
+        assert msg.body == b'thequickbrownfox'
+        assert self.g.body_target(1, 8) is None
+
+    def test_lazy_headers(self):
+        self.conn.lazy_headers = True
+        self.g((1, 1, pack('>HH', *spec.Basic.Deliver)))
+        m = Message(application_headers={'foo': 1})
+        buf = pack('>HxxQ', m.CLASS_ID, 0) + m._serialize_properties()
+        assert self.g((2, 1, buf))
+        headers = self.callback.call_args[0][3].headers
+        assert isinstance(headers, LazyTable)
+        assert not headers.decoded
+        assert headers == {'foo': 1}
+
+    def header_frame(self, body_size):
+        m = Message()
+        m.properties = {}
+        return pack('>HxxQ', m.CLASS_ID, body_size) + m._serialize_properties()
+
+    def test_stream_body(self):
+        self.conn.stream_body_threshold = 16
+        chunks = [b'thequick', b'brownfox']
+        self.conn.blocking_read.side_effect = lambda timeout: self.g(
+            (3, 1, chunks.pop(0)))
+        self.g((1, 1, pack('>HH', *spec.Basic.Deliver)))
+        assert self.g((2, 1, self.header_frame(16)))
+        msg = self.callback.call_args[0][3]
+        assert not msg.ready
+        assert self.g.body_target(1, 8) is None
+        assert list(msg.body) == [b'thequick', b'brownfox']
+        assert msg.ready
+        assert msg.body.read() == b''
+
+        # the next message is handled as usual
+        self.g((1, 1, pack('>HH', *spec.Basic.Deliver)))
+        assert not self.g((2, 1, self.header_frame(4)))
+        assert self.g((3, 1, b'slow'))
+        assert self.callback.call_args[0][3].body == b'slow'
+
+    def test_stream_body__not_read(self):
+        self.conn.stream_body_threshold = 16
+        self.g((1, 1, pack('>HH', *spec.Basic.Deliver)))
+        assert self.g((2, 1, self.header_frame(16)))
+        msg = self.callback.call_args[0][3]
+        assert not self.g((3, 1, b'thequick'))
+        msg.body.close()
+        assert not self.g((3, 1, b'brownfox'))
+        assert msg.ready
+        assert msg.body.read() == b''
+        self.conn.blocking_read.assert_not_called()
+
     def test_heartbeat_frame(self):
         assert not self.g((8, 1, ''))
         self.callback.assert_not_called()
@@ -81,6 +155,7 @@ class test_frame_writer:
         self.connection.bytes_sent = 0
         self.g = frame_writer(self.connection, self.transport)
         self.write = self.transport.write
+        self.writev = self.transport.writev
 
     def test_write_fast_header(self):
         frame = 1, 1, spec.Queue.Declare, b'x' * 30, None
@@ -98,9 +173,29 @@ class test_frame_writer:
         msg = Message(body=b'y' * 2048, content_type='utf-8')
         frame = 2, 1, spec.Basic.Publish, b'x' * 10, msg
         self.g(*frame)
-        self.write.assert_called()
+        self.writev.assert_called_once()
+        self.write.assert_not_called()
         assert 'content_encoding' not in msg.properties
 
+    def test_write_slow_content__frames(self):
+        body = bytes(range(256)) * 8
+        msg = Message(body=body)
+        frame = 1, 1, spec.Basic.Publish, b'x' * 10, msg
+        self.g(*frame)
+        buffers = self.writev.call_args[0][0]
+        chunks = [buf for buf in buffers if isinstance(buf, memoryview)]
+        assert all(chunk.obj is body for chunk in chunks)
+        assert b''.join(chunks) == body
+        data = b''.join(buffers)
+        offset, frames = 0, []
+        while offset < len(data):
+            frame_type, channel, size = unpack_from('>BHI', data, offset)
+            assert data[offset + 7 + size] == 0xce
+            assert size <= self.connection.frame_max - 8
+            frames.append(frame_type)
+            offset += 8 + size
+        assert frames == [1, 2] + [3] * len(chunks)
+
     def test_write_zero_len_body(self):
         msg = Message(body=b'', content_type='application/octet-stream')
         frame = 2, 1, spec.Basic.Publish, b'x' * 10, msg
@@ -122,9 +217,8 @@ class test_frame_writer:
         msg = Message(body='y' * 2048 + '\N{CHECK MARK}')
         frame = 2, 1, spec.Basic.Publish, b'x' * 10, msg
         self.g(*frame)
-        self.write.assert_called()
-        memory = self.write.call_args[0][0]
-        assert isinstance(memory, bytes)
+        self.writev.assert_called()
+        memory = b''.join(self.writev.call_args[0][0])
         assert '\N{CHECK MARK}'.encode() in memory
         assert msg.properties['content_encoding'] == 'utf-8'
 
@@ -138,6 +232,26 @@ class test_frame_writer:
         assert 'body'.encode('utf-16') in memory.tobytes()
         assert msg.properties['content_encoding'] == 'utf-16'
 
+    @pytest.mark.parametrize('method_sig,args', [
+        (spec.Basic.Ack, (2 ** 40, True)),
+        (spec.Basic.Ack, (1, False)),
+        (spec.Basic.Reject, (7, True)),
+    ])
+    def test_write_method(self, method_sig, args):
+        self.g.write_method(3, method_sig, args)
+        frame = self.write.call_args[0][0].tobytes()
+        self.g(1, 3, method_sig, dumps('Lb', args), None)
+        assert frame == self.write.call_args[0][0].tobytes()
+        assert self.connection.bytes_sent == 2
+
+    def test_compile_method_frame(self):
+        format = 'oblbbbbbbbbbB'
+        frame, framelen, values = _compile_method_frame(format)
+        args = (1, True, 2, True) + (False,) * 7 + (True, 3)
+        data = frame.pack(1, 0, framelen, 60, 80, *values(args), 0xce)
+        assert data[11:-1] == dumps(format, args)
+        assert framelen == len(data) - 8
+
     def test_write_frame__fast__buffer_store_resize(self):
         """The buffer_store is resized when the connection's frame_max is increased."""
         small_msg = Message(body='t')
@@ -159,3 +273,139 @@ class test_frame_writer:
         write_arg = self.write.call_args[0][0]
         assert isinstance(write_arg, memoryview)
         assert len(write_arg) > original_frame_max
+
+
+class test_frame_writer_streaming:
+
+    @pytest.fixture(autouse=True)
+    def setup_conn(self):
+        self.connection = Mock(name='connection')
+        self.transport = self.connection.Transport()
+        self.connection.frame_max = 512
+        self.connection.bytes_sent = 0
+        self.g = frame_writer(self.connection, self.transport)
+        self.data = bytearray()
+        self.transport.write.side_effect = self.data.extend
+        self.transport.writev.side_effect = (
+            lambda buffers: [self.data.extend(buf) for buf in buffers])
+
+        def sendfile(file, offset, count):
+            file.seek(offset)
+            self.data.extend(file.read(count))
+        self.transport.sendfile.side_effect = sendfile
+
+    def publish(self, msg):
+        self.g(1, 1, spec.Basic.Publish, b'x' * 10, msg)
+
+    def frames(self):
+        data, offset, frames = bytes(self.data), 0, []
+        while offset < len(data):
+            frame_type, channel, size = unpack_from('>BHI', data, offset)
+            assert data[offset + 7 + size] == 0xce
+            frames.append((frame_type, data[offset + 7:offset + 7 + size]))
+            offset += 8 + size
+        return frames
+
+    def assert_body(self, body):
+        frames = self.frames()
+        assert [t for t, _ in frames[:2]] == [1, 2]
+        assert unpack_from('>Q', frames[1][1], 4)[0] == len(body)
+        assert all(t == 3 and len(p) <= 504 for t, p in frames[2:])
+        assert b''.join(p for _, p in frames[2:]) == body
+
+    def test_file(self, tmp_path):
+        body = bytes(range(256)) * 8
+        path = tmp_path / 'body'
+        path.write_bytes(b'skip' + body)
+        with open(path, 'rb') as f:
+            f.seek(4)
+            self.publish(Message(body=f))
+            assert f.tell() == len(body) + 4
+        assert self.transport.sendfile.call_count == 5
+        self.assert_body(body)
+
+    def test_file__empty(self, tmp_path):
+        path = tmp_path / 'body'
+        path.write_bytes(b'')
+        with open(path, 'rb') as f:
+            self.publish(Message(body=f))
+        self.transport.sendfile.assert_not_called()
+        self.assert_body(b'')
+
+    def test_reader(self):
+        body = b'y' * 2000
+        self.publish(Message(body=BytesIO(body), body_size=2000))
+        self.transport.sendfile.assert_not_called()
+        self.assert_body(body)
+
+    def test_iterable(self):
+        chunks = [b'a' * 10, b'b' * 1000, bytearray(b'c' * 5)]
+        self.publish(Message(body=iter(chunks), body_size=1015))
+        self.assert_body(b''.join(chunks))
+
+    def test_iterable__no_body_size(self):
+        with pytest.raises(ValueError):
+            self.publish(Message(body=iter([b'foo'])))
+
+    def test_reader__no_body_size(self):
+        self.publish(Message(body=BytesIO(b'y' * 700)))
+        self.assert_body(b'y' * 700)
+
+    def test_reader__longer(self):
+        self.publish(Message(body=BytesIO(b'y' * 700), body_size=600))
+        self.assert_body(b'y' * 600)
+
+    def test_reader__shorter(self):
+        with pytest.raises(ValueError):
+            self.publish(Message(body=BytesIO(b'y' * 700), body_size=800))
+        assert not self.data
+
+    def test_reader__not_seekable_shorter(self):
+        body = Mock(name='body', spec=['read'])
+        body.read.side_effect = [b'y' * 504, b'']
+        with pytest.raises(IrrecoverableConnectionError):
+            self.publish(Message(body=body, body_size=800))
+        assert not self.transport.connected
+
+    def test_file__shorter(self, tmp_path):
+        path = tmp_path / 'body'
+        path.write_bytes(b'x' * 100)
+        with open(path, 'rb') as f:
+            with pytest.raises(ValueError):
+                self.publish(Message(body=f, body_size=200))
+        assert not self.data
+
+    def test_file__truncated(self, tmp_path):
+        path = tmp_path / 'body'
+        path.write_bytes(b'x' * 100)
+        self.transport.sendfile.side_effect = ValueError(
+            'File ended before all data was sent')
+        with open(path, 'rb') as f:
+            with pytest.raises(IrrecoverableConnectionError):
+                self.publish(Message(body=f))
+        assert not self.transport.connected
+
+    def test_iterable__longer(self):
+        with pytest.raises(IrrecoverableConnectionError):
+            self.publish(Message(body=[b'foo', b'bar'], body_size=4))
+        assert not self.transport.connected
+
+    def test_iterable__shorter(self):
+        with pytest.raises(IrrecoverableConnectionError):
+            self.publish(Message(body=[b'foo'], body_size=4))
+        assert not self.transport.connected
+
+    def test_unsupported_body(self):
+        with pytest.raises(TypeError):
+            self.publish(Message(body=1234))
+
+    @pytest.mark.parametrize('size', [16, 2048])
+    def test_mmap(self, size):
+        body = mmap.mmap(-1, size)
+        body.write(b'z' * size)
+        self.publish(Message(body=body))
+        self.assert_body(b'z' * size)
+
+    def test_memoryview(self):
+        self.publish(Message(body=memoryview(b'foobar')))
+        self.assert_body(b'foobar')
@@ -6,9 +6,11 @@ from struct import pack
 
 import pytest
 
+from amqp import serialization
 from amqp.basic_message import Message
 from amqp.exceptions import FrameSyntaxError
-from amqp.serialization import GenericContent, _read_item, dumps, loads
+from amqp.serialization import (GenericContent, LazyTable, PropertiesCodec,
+                                PropertiesTemplate, _read_item, dumps, loads)
 
 
 class _ANY:
@@ -124,6 +126,28 @@ class test_serialization:
         actual, _ = loads('BssbbbbbF', buf, 0)
         assert actual == expected
 
+    def test_codec_cache(self):
+        buf = dumps('BlLb', [1, 2, 3, True])
+        assert buf == pack('>HIQB', 1, 2, 3, 1)
+        assert loads('BlLb', buf, 0) == ([1, 2, 3, True], len(buf))
+        assert 'BlLb' in serialization._loaders
+        assert 'BlLb' in serialization._dumpers
+
+    def test_dumps_fewer_values(self):
+        assert dumps('BsB', [1, 'x']) == dumps('Bs', [1, 'x'])
+        with pytest.raises(IndexError):
+            dumps('B', [1, 2])
+
+    def test_dumps_unknown_type_skipped(self):
+        assert dumps('iB', (30, 1)) == pack('>H', 1)
+
+    def test_nine_bitflags_then_octet(self):
+        expected = [True] + [False] * 7 + [True, 7]
+        format = 'b' * 9 + 'o'
+        buf = dumps(format, expected)
+        assert buf == b'\x01\x01\x07'
+        assert loads(format, buf, 0) == (expected, 3)
+
     def test_sixteen_bitflags(self):
         expected = [True, False] * 8
         format = 'b' * len(expected)
@@ -132,6 +156,119 @@ class test_serialization:
         assert actual == expected
 
 
+class test_LazyTable:
+
+    def setup_method(self):
+        self.table = {'foo': 'bar', 'nested': {'a': [1, 2]}}
+        self.raw = dumps('F', [self.table])[4:]
+        self.lazy = LazyTable(self.raw)
+
+    def test_decode_on_access(self):
+        assert not self.lazy.decoded
+        assert self.lazy['nested'] == {'a': [1, 2]}
+        assert self.lazy.decoded
+        assert self.lazy.raw is None
+        assert self.lazy == self.table
+        assert len(self.lazy) == 2
+        assert sorted(self.lazy) == ['foo', 'nested']
+
+    def test_mutate(self):
+        self.lazy['x'] = 1
+        del self.lazy['foo']
+        assert self.lazy.copy() == {'nested': {'a': [1, 2]}, 'x': 1}
+        assert loads('F', dumps('F', [self.lazy]), 0)[0] == [self.lazy]
+
+    def test_dumps__not_decoded(self):
+        assert dumps('F', [self.lazy]) == dumps('F', [self.table])
+        assert not self.lazy.decoded
+
+    def test_nested_in_table(self):
+        assert loads('F', dumps('F', [{'h': self.lazy}]), 0)[0] == [
+            {'h': self.table}]
+
+    def test_pickle(self):
+        assert pickle.loads(pickle.dumps(self.lazy)) == self.table
+        assert repr(self.lazy) == repr(self.table)
+
+    def test_load_properties(self):
+        m = Message(application_headers=self.table, priority=1)
+        buf = m._serialize_properties()
+        m2 = Message()
+        m2._load_properties(m2.CLASS_ID, buf, 0, lazy_tables=True)
+        assert isinstance(m2.headers, LazyTable)
+        assert m2.priority == 1
+        assert m2.properties == m.properties
+        m3 = Message()
+        m3._load_properties(m3.CLASS_ID, buf, 0)
+        assert type(m3.headers) is dict
+
+
+class test_PropertiesTemplate:
+
+    def setup_method(self):
+        self.headers = {'task': 'add', 'args': [1, 2]}
+        self.template = PropertiesTemplate(
+            Message, content_type='application/json', delivery_mode=2,
+            application_headers=self.headers)
+
+    def serialize(self, **properties):
+        m = Message(properties_template=self.template, **properties)
+        plain = Message(**m.properties)
+        assert m._serialize_properties() == plain._serialize_properties()
+        return m
+
+    def test_message(self):
+        m = self.serialize(message_id='1')
+        assert m.content_type == 'application/json'
+        assert m.message_id == '1'
+        assert m.properties_template is self.template
+
+    def test_override(self):
+        self.serialize(content_type='text/plain', priority=3)
+        self.serialize(application_headers={'task': 'mul'})
+        self.serialize(delivery_mode=None)
+
+    def test_shared_value_changed(self):
+        m = self.serialize()
+        m.headers['task'] = 'mul'
+        m.headers['args'].append(3)
+        self.serialize()
+        assert self.template._encoded['application_headers'][0] == {
+            'task': 'add', 'args': [1, 2]}
+
+    def test_pickle(self):
+        m = pickle.loads(pickle.dumps(
+            Message(b'body', properties_template=self.template, priority=3)))
+        assert m.headers == self.headers
+        assert m.priority == 3
+        plain = Message(**m.properties)
+        assert m._serialize_properties() == plain._serialize_properties()
+
+    def test_mutable_values_not_shared(self):
+        m1 = Message(properties_template=self.template)
+        m1.properties['application_headers']['leak'] = True
+        m2 = self.serialize()
+        assert m2.headers == {'task': 'add', 'args': [1, 2]}
+        assert self.template.properties['application_headers'] is (
+            self.headers)
+        assert 'leak' not in self.headers
+
+    @pytest.mark.parametrize('value', [False, 0.0])
+    def test_value_of_other_type(self, value):
+        template = PropertiesTemplate(
+            Message, application_headers={'retries': 0, 'n': [1]})
+        m = Message(properties_template=template,
+                    application_headers={'retries': value, 'n': [1]})
+        plain = Message(**m.properties)
+        assert m._serialize_properties() == plain._serialize_properties()
+
+    def test_encoded_once(self, patching):
+        dumps = patching('amqp.serialization.dumps')
+        dumps.return_value = b''
+        self.template.encode(dict(self.template.properties, priority=1))
+        dumps.assert_called_once_with('o', (1,))
+
+
 class test_GenericContent:
 
     @pytest.fixture(autouse=True)
@@ -191,6 +328,27 @@ class test_GenericContent:
         m2 = Message()
         m2._load_properties(m2.CLASS_ID, s, 0)
 
+    def test_serialize_properties__ignores_unknown(self):
+        m = Message()
+        m.properties = {'foo': 'bar', 'priority': 3, 'content_type': None}
+        assert m._serialize_properties() == pack('>HB', 0x0800, 3)
+
+    def test_properties_codec__plans_cached(self):
+        codec = PropertiesCodec(Message.PROPERTIES)
+        props = {'delivery_mode': 2, 'priority': 7, 'message_id': 'id'}
+        buf = codec.encode(props)
+        assert codec.encode(dict(props)) == buf
+        assert len(codec._encoders) == 1
+        assert codec.decode(buf, 0) == (props, len(buf))
+        assert codec.decode(b'xx' + buf, 2) == (props, len(buf) + 2)
+        assert len(codec._decoders) == 1
+
+    def test_properties_codec__bit(self):
+        codec = PropertiesCodec([('a', 'bit'), ('b', 's')])
+        buf = codec.encode({'a': True, 'b': 'x'})
+        assert buf == pack('>HB', 0xc000, 1) + b'x'
+        assert codec.decode(buf, 0) == ({'b': 'x'}, 4)
+
     def test_inbound_header(self):
         m = Message()
         m.properties = {
@@ -216,13 +374,56 @@ class test_GenericContent:
     def test_inbound_body(self):
         m = Message()
         m.body_size = 16
-        m.body_received = 8
-        m._pending_chunks = [b'the', b'quick']
-        m.inbound_body(b'brown')
-        assert not m.ready
+        for chunk in (b'the', b'quick', b'brown'):
+            m.inbound_body(chunk)
+            assert not m.ready
         m.inbound_body(b'fox')
         assert m.ready
         assert m.body == b'thequickbrownfox'
+        assert isinstance(m.body, bytes)
+
+    def test_inbound_body__zero_copy(self):
+        m = Message()
+        m.body_size = 16
+        for chunk in (b'thequick', b'brownfox'):
+            m.inbound_body(chunk, zero_copy=True)
+        assert isinstance(m.body, memoryview)
+        assert m.body.readonly
+        assert m.body == b'thequickbrownfox'
+
+    def test_body_target(self):
+        m = Message()
+        m.body_size = 16
+        target = m.body_target(8)
+        target[:] = b'thequick'
+        m.inbound_body(target)
+        target = m.body_target(8)
+        target[:] = b'brownfox'
+        m.inbound_body(target)
+        assert m.ready
+        assert m.body == b'thequickbrownfox'
+
+    def test_body_target__single_frame(self):
+        m = Message()
+        m.body_size = 16
+        assert m.body_target(16) is None
+        m.inbound_body(b'thequickbrownfox')
+        assert m.body == b'thequickbrownfox'
+
+    def test_body_target__mixed(self):
+        m = Message()
+        m.body_size = 16
+        m.inbound_body(b'thequick')
+        target = m.body_target(8)
+        target[:] = b'brownfox'
+        m.inbound_body(target)
+        assert m.body == b'thequickbrownfox'
+
+    def test_body_target__too_large(self):
+        m = Message()
+        m.body_size = 16
+        assert m.body_target(8) is not None
+        assert m.body_target(32) is None
 
     def test_inbound_body__no_chunks(self):
         m = Message()
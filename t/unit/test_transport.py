@@ -1,10 +1,14 @@
 import errno
+import io
 import os
+import queue
 import re
 import ssl
 import socket
 import struct
+import threading
 from struct import pack
+from time import monotonic
 from unittest.mock import ANY, MagicMock, Mock, call, patch, sentinel
 
 import pytest
@@ -20,6 +24,30 @@ class DummyException(Exception):
     pass
 
 
+def recv_into_from(chunks):
+    """Create ``recv_into`` mock copying ``chunks`` into the buffer."""
+    chunks = list(chunks)
+
+    def recv_into(buf):
+        chunk = chunks.pop(0)
+        if isinstance(chunk, Exception):
+            raise chunk
+        buf[:len(chunk)] = chunk
+        return len(chunk)
+    return Mock(name='recv_into', side_effect=recv_into)
+
+
+def ktls_unsupported():
+    """Return why kernel TLS cannot be used here, or None."""
+    if not transport._OP_ENABLE_KTLS:
+        return 'ssl.OP_ENABLE_KTLS needs Python 3.12+'
+    if transport.SOL_TLS is None:
+        return 'no SOL_TLS on this platform'
+    if not os.path.exists('/sys/module/tls'):
+        return 'the tls kernel module is not loaded'
+    return None
+
+
 class MockSocket:
     options = {}
 
@@ -376,7 +404,7 @@ class test_AbstractTransport:
             self.t = transport.Transport(host, is_ssl)
             self.t.sock = Mock(name='socket')
             self.t.connected = True
-            self.t._quick_recv = Mock(name='recv', return_value='')
+            self.t._quick_recv_into = Mock(name='recv_into', return_value=0)
             with pytest.raises(
                 IOError,
                 match=r'.*Server unexpectedly closed connection.*'
@@ -394,6 +422,102 @@ class test_AbstractTransport:
         with pytest.raises(socket.timeout):
             self.t.write('foo')
 
+    def test_write__buffered(self):
+        self.t.write_buffer_size = 8
+        self.t._write = Mock()
+        self.t.write(b'foo')
+        self.t.write(memoryview(b'bar'))
+        self.t._write.assert_not_called()
+        self.t.write(b'baz')
+        self.t._write.assert_called_once_with(bytearray(b'foobarbaz'))
+        assert not self.t._write_buffer
+
+    def test_flush(self):
+        self.t.write_buffer_size = 1024
+        self.t._write = Mock()
+        self.t.flush()
+        self.t._write.assert_not_called()
+        self.t.write(b'foo')
+        self.t.flush()
+        self.t._write.assert_called_once_with(bytearray(b'foo'))
+
+    def test_flush__EBADF(self):
+        self.t.write_buffer_size = 1024
+        self.t.connected = True
+        self.t._write = Mock()
+        exc = OSError()
+        exc.errno = errno.EBADF
+        self.t._write.side_effect = exc
+        self.t.write(b'foo')
+        with pytest.raises(OSError):
+            self.t.flush()
+        assert not self.t.connected
+        assert not self.t._write_buffer
+
+    def test_writev__flushes_buffered(self):
+        self.t.write_buffer_size = 1024
+        self.t._write = Mock()
+        self.t.write(b'foo')
+        self.t.writev([b'bar'])
+        self.t._write.assert_has_calls([call(b'foo'), call(b'bar')])
+
+    def test_read_frame__flushes_buffered(self):
+        self.t.write_buffer_size = 1024
+        self.t._write = Mock()
+        self.t._read = Mock()
+        self.t._read.side_effect = socket.timeout()
+        self.t.write(b'foo')
+        with pytest.raises(socket.timeout):
+            self.t.read_frame()
+        self.t._write.assert_called_once_with(b'foo')
+
+    def test_close__flushes_buffered(self):
+        self.t.write_buffer_size = 1024
+        self.t._write = Mock()
+        self.t.sock = Mock()
+        self.t.write(b'foo')
+        self.t.close()
+        self.t._write.assert_called_once_with(b'foo')
+
+    def test_writev__coalesces(self):
+        self.t._write = Mock()
+        self.t._writev([b'ab', b'cd', b'ef'], coalesce=4)
+        self.t._write.assert_has_calls([call(b'abcd'), call(b'ef')])
+
+    def test_writev__deadline(self):
+        self.t._write_before_deadline = Mock(name='_write_before_deadline')
+        body = memoryview(b'x' * 8)
+        self.t._writev_before_deadline(
+            [b'ab', b'cd', body, b'e'], coalesce=4)
+        assert self.t._write_before_deadline.call_args_list == [
+            call(b'abcd'), call(body), call(b'e')]
+        # large buffers are not copied.
+        assert self.t._write_before_deadline.call_args_list[1][0][0] is body
+
+    def test_sendfile(self):
+        self.t._write = Mock(name='_write')
+        self.t.write_buffer_size = 1024
+        self.t.write(b'head')
+        f = io.BytesIO(b'foobarbaz')
+        self.t.sendfile(f, 3, 4)
+        assert [c[0][0] for c in self.t._write.call_args_list] == [
+            b'head', b'barb']
+
+    def test_sendfile__short(self):
+        self.t._write = Mock(name='_write')
+        with pytest.raises(ValueError):
+            self.t.sendfile(io.BytesIO(b'foo'), 1, 4)
+
+    def test_writev__EBADF(self):
+        self.t.connected = True
+        self.t._write = Mock()
+        exc = OSError()
+        exc.errno = errno.EBADF
+        self.t._write.side_effect = exc
+        with pytest.raises(OSError):
+            self.t.writev([b'foo'])
+        assert not self.t.connected
+
     def test_write__EINTR(self):
         self.t.connected = True
         self.t._write = Mock()
@@ -414,46 +538,37 @@ class test_AbstractTransport:
             assert actual_sock == self.t.sock
 
     def test_set_timeout(self):
-        # Checks that context manager sets and reverts timeout properly
+        # Checks that context manager sets and reverts the deadline,
+        # leaving the socket timeout alone.
         with patch.object(self.t, 'sock') as sock_mock:
-            sock_mock.gettimeout.return_value = 3
-            with self.t.having_timeout(5) as actual_sock:
-                assert actual_sock == self.t.sock
-            sock_mock.gettimeout.assert_called_with()
-            sock_mock.settimeout.assert_has_calls(
-                [
-                    call(5),
-                    call(3),
-                ]
-            )
+            with patch('amqp.transport.monotonic', return_value=100):
+                with self.t.having_timeout(5) as actual_sock:
+                    assert actual_sock == self.t.sock
+                    assert self.t._deadline == 105
+            assert self.t._deadline is None
+            sock_mock.settimeout.assert_not_called()
 
     def test_set_timeout_exception_raised(self):
-        # Checks that context manager sets and reverts timeout properly
+        # Checks that context manager reverts the deadline properly
         # when exception is raised.
         with patch.object(self.t, 'sock') as sock_mock:
-            sock_mock.gettimeout.return_value = 3
             with pytest.raises(DummyException):
                 with self.t.having_timeout(5) as actual_sock:
                     assert actual_sock == self.t.sock
                     raise DummyException()
-            sock_mock.gettimeout.assert_called_with()
-            sock_mock.settimeout.assert_has_calls(
-                [
-                    call(5),
-                    call(3),
-                ]
-            )
-
-    def test_set_same_timeout(self):
-        # Checks that context manager does not set timeout when
-        # it is same as currently set.
-        with patch.object(self.t, 'sock') as sock_mock:
-            sock_mock.gettimeout.return_value = 5
-            with self.t.having_timeout(5) as actual_sock:
-                assert actual_sock == self.t.sock
-            sock_mock.gettimeout.assert_called_with()
+            assert self.t._deadline is None
             sock_mock.settimeout.assert_not_called()
 
+    def test_set_timeout_nested(self):
+        with self.t.having_timeout(5):
+            deadline = self.t._deadline
+            with self.t.having_timeout(1):
+                assert self.t._deadline < deadline
+            with self.t.having_timeout(None):
+                assert self.t._deadline == deadline
+            assert self.t._deadline == deadline
+        assert self.t._deadline is None
+
     def test_set_timeout_ewouldblock_exc(self):
         # We expect EWOULDBLOCK to be handled as a timeout.
         with patch.object(self.t, 'sock') as sock_mock:
@@ -503,36 +618,108 @@ class test_AbstractTransport_connect:
                 self.t.connect()
             assert self.t.sock is None and self.t.connected is False
 
-    def test_connect_multiple_addr_entries_fails(self):
-        with patch('socket.socket', return_value=MockSocket()) as sock_mock, \
-            patch('socket.getaddrinfo',
-                  return_value=[
-                      (socket.AF_INET, 1, socket.IPPROTO_TCP,
-                       '', ('127.0.0.1', 5672)),
-                      (socket.AF_INET, 1, socket.IPPROTO_TCP,
-                       '', ('127.0.0.2', 5672))
-                  ]):
-            self.t.sock = Mock()
+    @pytest.fixture
+    def listener(self):
+        sock = socket.create_server(('127.0.0.1', 0))
+        yield sock
+        sock.close()
+
+    @pytest.fixture
+    def dead_address(self):
+        sock = socket.create_server(('127.0.0.1', 0))
+        address = sock.getsockname()
+        sock.close()
+        return address
+
+    @pytest.fixture
+    def hanging_address(self):
+        """Address of a listener with a full backlog: SYNs are dropped."""
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        sock.listen(0)
+        address = sock.getsockname()
+        fill = [socket.socket() for _ in range(3)]
+        for s in fill:
+            s.setblocking(False)
+            s.connect_ex(address)
+        yield address
+        for s in fill:
+            s.close()
+        sock.close()
+
+    def entries(self, *addresses):
+        return [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP,
+                 '', address) for address in addresses]
+
+    def test_connect_multiple_addr_entries_fails(self, dead_address):
+        with patch('socket.getaddrinfo',
+                   return_value=self.entries(dead_address, dead_address)):
+            with pytest.raises(ConnectionRefusedError):
+                self.t.connect()
+        assert self.t.sock is None and self.t.connected is False
+
+    def test_connect_multiple_addr_entries_succeed(self, listener,
+                                                   dead_address):
+        with patch('socket.getaddrinfo', return_value=self.entries(
+                dead_address, listener.getsockname())):
+            self.t.connect()
+        try:
+            assert self.t.connected
+            assert self.t.sock.getpeername() == listener.getsockname()
+        finally:
             self.t.close()
-            with patch.object(sock_mock.return_value, 'connect',
-                              side_effect=socket.error):
-                with pytest.raises(socket.error):
-                    self.t.connect()
 
-    def test_connect_multiple_addr_entries_succeed(self):
-        with patch('socket.socket', return_value=MockSocket()) as sock_mock, \
-            patch('socket.getaddrinfo',
-                  return_value=[
-                      (socket.AF_INET, 1, socket.IPPROTO_TCP,
-                       '', ('127.0.0.1', 5672)),
-                      (socket.AF_INET, 1, socket.IPPROTO_TCP,
-                       '', ('127.0.0.2', 5672))
-                  ]):
-            self.t.sock = Mock()
+    def test_connect_multiple_addr_entries_staggered(self, listener,
+                                                     hanging_address):
+        self.t.connect_timeout = 5
+        with patch('socket.getaddrinfo', return_value=self.entries(
+                hanging_address, listener.getsockname())):
+            start = monotonic()
+            self.t.connect()
+        try:
+            assert self.t.sock.getpeername() == listener.getsockname()
+            assert monotonic() - start < 1
+            assert transport.CONNECT_ATTEMPT_DELAY <= monotonic() - start
+        finally:
             self.t.close()
-            with patch.object(sock_mock.return_value, 'connect',
-                              side_effect=(socket.error, None)):
+
+    def test_connect_multiple_addr_entries_timeout(self, hanging_address):
+        self.t.connect_timeout = 0.3
+        with patch('socket.getaddrinfo', return_value=self.entries(
+                hanging_address, hanging_address)):
+            with pytest.raises(socket.timeout):
                 self.t.connect()
+        assert self.t.sock is None
+
+    def test_connect_resolver_cache(self, listener):
+        cache = transport.ResolverCache()
+        self.t.resolver_cache = cache
+        with patch('socket.getaddrinfo', return_value=self.entries(
+                listener.getsockname())) as getaddrinfo:
+            self.t.connect()
+            self.t.close()
+            self.t.connect()
+        self.t.close()
+        getaddrinfo.assert_called_once_with(
+            'localhost', 5672, socket.AF_UNSPEC, socket.SOCK_STREAM, ANY, ANY)
+
+    def test_connect_resolver_cache__invalidated(self, dead_address):
+        cache = self.t.resolver_cache = Mock(name='resolver_cache')
+        cache.getaddrinfo.return_value = self.entries(dead_address)
+        with pytest.raises(ConnectionRefusedError):
+            self.t.connect()
+        cache.invalidate.assert_called_with('localhost', 5672)
+
+    def test_resolver_cache_option(self):
+        t = self.Transport('localhost:5672', resolver_cache=True)
+        assert t.resolver_cache is transport.addrinfo_cache
+        assert self.Transport('localhost:5672').resolver_cache is None
+
+    def test_interleave_families(self):
+        entries = [(socket.AF_INET6, 1), (socket.AF_INET6, 2),
+                   (socket.AF_INET6, 3), (socket.AF_INET, 4)]
+        assert [e[1] for e in transport._interleave_families(entries)] == [
+            1, 4, 2, 3]
 
     def test_connect_calls_getaddrinfo_with_af_unspec(self):
         with patch('socket.socket', return_value=MockSocket()), \
@@ -578,6 +765,73 @@ class test_AbstractTransport_connect:
         assert self.t.sock is None and self.t.connected is False
 
 
+class test_ResolverCache:
+
+    entries = [(socket.AF_INET, socket.SOCK_STREAM, socket.IPPROTO_TCP,
+                '', ('127.0.0.1', 5672))]
+
+    @pytest.fixture(autouse=True)
+    def getaddrinfo(self, patching):
+        self.getaddrinfo = patching('socket.getaddrinfo')
+        self.getaddrinfo.return_value = self.entries
+        self.cache = transport.ResolverCache(ttl=60, negative_ttl=5)
+
+    def test_getaddrinfo(self):
+        assert self.cache.getaddrinfo('host', 5672) == self.entries
+        assert self.cache.getaddrinfo('host', 5672) == self.entries
+        self.getaddrinfo.assert_called_once_with('host', 5672, 0, 0, 0, 0)
+        self.cache.getaddrinfo('host', 5671)
+        self.cache.getaddrinfo('host', 5672, socket.AF_INET)
+        assert self.getaddrinfo.call_count == 3
+
+    def test_ttl(self):
+        with patch('amqp.transport.monotonic', return_value=100):
+            self.cache.getaddrinfo('host', 5672)
+        with patch('amqp.transport.monotonic', return_value=159):
+            self.cache.getaddrinfo('host', 5672)
+            assert self.getaddrinfo.call_count == 1
+        with patch('amqp.transport.monotonic', return_value=160):
+            self.cache.getaddrinfo('host', 5672)
+            assert self.getaddrinfo.call_count == 2
+
+    def test_negative_caching(self):
+        self.getaddrinfo.side_effect = socket.gaierror(
+            socket.EAI_NONAME, 'Name or service not known')
+        with patch('amqp.transport.monotonic', return_value=100):
+            for _ in range(2):
+                with pytest.raises(socket.gaierror) as excinfo:
+                    self.cache.getaddrinfo('host', 5672)
+                assert excinfo.value.errno == socket.EAI_NONAME
+            assert self.getaddrinfo.call_count == 1
+        self.getaddrinfo.side_effect = None
+        with patch('amqp.transport.monotonic', return_value=105):
+            assert self.cache.getaddrinfo('host', 5672) == self.entries
+        assert self.getaddrinfo.call_count == 2
+
+    def test_invalidate(self):
+        self.cache.getaddrinfo('host', 5672)
+        self.cache.getaddrinfo('host', 5671)
+        self.cache.getaddrinfo('other', 5672)
+        self.cache.invalidate('host', 5672)
+        assert len(self.cache) == 2
+        self.cache.invalidate('host')
+        assert len(self.cache) == 1
+        self.cache.clear()
+        assert not len(self.cache)
+
+    def test_eviction(self):
+        cache = transport.ResolverCache(maxsize=2)
+        cache.getaddrinfo('a', 1)
+        cache.getaddrinfo('b', 1)
+        cache.getaddrinfo('a', 1)
+        cache.getaddrinfo('c', 1)
+        assert self.getaddrinfo.call_count == 3
+        cache.getaddrinfo('a', 1)
+        assert self.getaddrinfo.call_count == 3
+        cache.getaddrinfo('b', 1)
+        assert self.getaddrinfo.call_count == 4
+
+
 class test_SSLTransport:
     class Transport(transport.SSLTransport):
 
@@ -613,7 +867,7 @@ class test_SSLTransport:
         self.t._setup_transport()
         self.t._wrap_socket.assert_called_with(sock, foo=30)
         self.t.sock.do_handshake.assert_called_with()
-        assert self.t._quick_recv is self.t.sock.read
+        assert self.t._quick_recv_into is self.t.sock.recv_into
 
     def test_wrap_socket(self):
         sock = Mock()
@@ -633,7 +887,7 @@ class test_SSLTransport:
             create_default_context.assert_called_with(bar=3)
             ctx = create_default_context()
             assert ctx.check_hostname
-            ctx.wrap_socket.assert_called_with(sock, f=1)
+            ctx.wrap_socket.assert_called_with(sock=sock, f=1)
 
     def test_wrap_socket_sni(self):
         # testing default values of _wrap_socket_sni()
@@ -833,10 +1087,32 @@ class test_SSLTransport:
         self.t.close()
         assert self.t.sock is None
 
+    def test_receive_available__drains_pending_records(self):
+        sock = self.t.sock = Mock(name='SSLSocket')
+        sock.gettimeout.return_value = None
+        chunks = [b'foo', b'bar']
+
+        def recv_into(buf, nbytes, flags):
+            chunk = chunks.pop(0)
+            buf[:len(chunk)] = chunk
+            return len(chunk)
+        sock.recv_into.side_effect = recv_into
+        sock.pending.side_effect = [3, 0]
+        assert self.t.receive_available() == 6
+        assert bytes(self.t._read_buffer) == b'foobar'
+        sock.settimeout.assert_has_calls([call(0), call(None)])
+
+    def test_receive_available__want_read(self):
+        sock = self.t.sock = Mock(name='SSLSocket')
+        sock.gettimeout.return_value = 3
+        sock.recv_into.side_effect = ssl.SSLWantReadError()
+        assert self.t.receive_available() == 0
+        sock.settimeout.assert_has_calls([call(0), call(3)])
+
     def test_read_EOF(self):
         self.t.sock = Mock(name='SSLSocket')
         self.t.connected = True
-        self.t._quick_recv = Mock(name='recv', return_value='')
+        self.t._quick_recv_into = Mock(name='recv_into', return_value=0)
         with pytest.raises(IOError,
                            match=r'.*Server unexpectedly closed connection.*'):
             self.t._read(64)
@@ -864,20 +1140,42 @@ class test_SSLTransport:
 
     def test_read_timeout(self):
         self.t.sock = Mock(name='SSLSocket')
-        self.t._quick_recv = Mock(name='recv', return_value='4')
-        self.t._quick_recv.side_effect = socket.timeout()
+        self.t._quick_recv_into = Mock(name='recv_into', return_value=4)
+        self.t._quick_recv_into.side_effect = socket.timeout()
         self.t._read_buffer = MagicMock(return_value='AA')
         with pytest.raises(socket.timeout):
             self.t._read(64)
 
     def test_read_SSLError(self):
         self.t.sock = Mock(name='SSLSocket')
-        self.t._quick_recv = Mock(name='recv', return_value='4')
-        self.t._quick_recv.side_effect = socket.timeout()
+        self.t._quick_recv_into = Mock(name='recv_into', return_value=4)
+        self.t._quick_recv_into.side_effect = socket.timeout()
         self.t._read_buffer = MagicMock(return_value='AA')
         with pytest.raises(socket.timeout):
             self.t._read(64)
 
+    def test_having_timeout__nonblocking_once(self):
+        sock = self.t.sock = Mock(name='SSLSocket')
+        sock.gettimeout.return_value = 3
+        sock.settimeout.side_effect = lambda t: setattr(
+            sock.gettimeout, 'return_value', t)
+        sock.send.return_value = 3
+        self.t._quick_recv_into = Mock(name='recv_into', return_value=3)
+        with self.t.having_timeout(5):
+            with self.t.having_timeout(1):
+                assert self.t._send_nonblocking(b'foo') == 3
+                assert self.t._recv_into_nonblocking(bytearray(3)) == 3
+            assert self.t._send_nonblocking(b'bar') == 3
+        assert sock.settimeout.call_args_list == [call(0), call(3)]
+        assert sock.gettimeout() == 3
+
+    def test_having_timeout__closed_in_block(self):
+        sock = self.t.sock = Mock(name='SSLSocket')
+        sock.gettimeout.return_value = None
+        with self.t.having_timeout(5):
+            sock.settimeout.side_effect = OSError(errno.EBADF, 'closed')
+        assert self.t._deadline is None
+
     def test_handshake_timeout(self):
         self.t.sock = Mock()
         self.t._wrap_socket = Mock()
@@ -887,6 +1185,463 @@ class test_SSLTransport:
             self.t._setup_transport()
 
 
+class test_SSLTransport_kTLS:
+
+    @pytest.fixture(autouse=True)
+    def setup_transport(self):
+        self.t = transport.SSLTransport('host', 3, ssl_ktls=True)
+        self.t.sock = Mock(name='SSLSocket')
+
+    def test_wrap_with_context(self):
+        context = Mock(name='context')
+        context.options = 0x10
+        with patch('amqp.transport._OP_ENABLE_KTLS', 0x8):
+            self.t._wrap_with_context(context, sentinel.sock, foo=1)
+        assert context.options == 0x18
+        context.wrap_socket.assert_called_with(sock=sentinel.sock, foo=1)
+
+    def test_wrap_with_context__disabled(self):
+        self.t.ssl_ktls = False
+        context = Mock(name='context')
+        context.options = 0x10
+        self.t._wrap_with_context(context, sentinel.sock)
+        assert context.options == 0x10
+
+    def test_setup_transport(self):
+        self.t._wrap_socket = Mock()
+        self.t._use_kernel_tls = Mock()
+        self.t._setup_transport()
+        self.t._use_kernel_tls.assert_called_with()
+
+    def test_ktls_offloaded(self):
+        sock = Mock(name='sock')
+        with patch('amqp.transport.SOL_TLS', 282):
+            assert transport._ktls_offloaded(sock, transport.TLS_TX)
+            sock.getsockopt.assert_called_with(282, transport.TLS_TX, 64)
+            sock.getsockopt.side_effect = OSError(errno.ENOPROTOOPT, '')
+            assert not transport._ktls_offloaded(sock, transport.TLS_RX)
+        with patch('amqp.transport.SOL_TLS', None):
+            assert not transport._ktls_offloaded(Mock(), transport.TLS_TX)
+
+    def test_use_kernel_tls(self):
+        with patch('amqp.transport._ktls_offloaded', return_value=True):
+            self.t._use_kernel_tls()
+        assert self.t.ktls_send and self.t.ktls_recv
+        assert self.t._write.func is socket.socket.sendall
+        assert self.t._write.args == (self.t.sock,)
+        assert self.t._quick_recv_into == self.t._recv_into_ktls
+
+    def test_use_kernel_tls__unavailable(self):
+        self.t._quick_recv_into = self.t.sock.recv_into
+        with patch('amqp.transport._ktls_offloaded', return_value=False):
+            self.t._use_kernel_tls()
+        assert not self.t.ktls_send and not self.t.ktls_recv
+        assert self.t._quick_recv_into is self.t.sock.recv_into
+        assert '_write' not in vars(self.t)
+
+    def test_recv_into_ktls(self):
+        self.t.sock.pending.return_value = 0
+        with patch('socket.socket.recv_into', return_value=3) as recv_into:
+            assert self.t._recv_into_ktls(sentinel.buf) == 3
+            recv_into.assert_called_with(self.t.sock, sentinel.buf)
+            self.t.sock.recv_into.assert_not_called()
+
+            recv_into.side_effect = OSError(errno.EIO, 'control record')
+            self.t.sock.recv_into.return_value = 5
+            assert self.t._recv_into_ktls(sentinel.buf) == 5
+            self.t.sock.recv_into.assert_called_with(sentinel.buf)
+
+            recv_into.side_effect = OSError(errno.ECONNRESET, 'reset')
+            with pytest.raises(OSError):
+                self.t._recv_into_ktls(sentinel.buf)
+
+    def test_recv_into_ktls__pending(self):
+        self.t.sock.pending.return_value = 10
+        with patch('socket.socket.recv_into') as recv_into:
+            self.t._recv_into_ktls(sentinel.buf)
+            recv_into.assert_not_called()
+        self.t.sock.recv_into.assert_called_with(sentinel.buf)
+
+    def test_sendfile(self):
+        self.t.ktls_send = True
+        with patch('socket.socket.sendfile', return_value=10) as sendfile:
+            self.t._sendfile(sentinel.file, 5, 10)
+            sendfile.assert_called_with(self.t.sock, sentinel.file, 5, 10)
+            with pytest.raises(ValueError):
+                self.t._sendfile(sentinel.file, 5, 20)
+
+
+class TLSPeer:
+    """Accept a single TLS connection on localhost from a thread."""
+
+    certs = os.path.join(os.path.dirname(__file__), os.pardir, 'certs')
+
+    def __init__(self, connections=1):
+        self.context = self.server_context()
+        self.listener = socket.create_server(('127.0.0.1', 0))
+        self.port = self.listener.getsockname()[1]
+        self.accepted = queue.Queue()
+        self.socks = []
+        self.thread = threading.Thread(
+            target=self._accept, args=(connections,), daemon=True)
+        self.thread.start()
+
+    @classmethod
+    def server_context(cls):
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(
+            os.path.join(cls.certs, 'client_certificate.pem'),
+            os.path.join(cls.certs, 'client_key.pem'))
+        return context
+
+    def _accept(self, connections):
+        for _ in range(connections):
+            sock, _ = self.listener.accept()
+            self.accepted.put(
+                self.context.wrap_socket(sock, server_side=True))
+
+    def accept(self):
+        sock = self.accepted.get(timeout=5)
+        self.socks.append(sock)
+        assert sock.recv(8) == transport.AMQP_PROTOCOL_HEADER
+        return sock
+
+    def close(self):
+        for sock in self.socks:
+            sock.close()
+        self.listener.close()
+
+
+class test_TLS_loopback:
+
+    @pytest.fixture(params=[{}, {'ssl_memory_bio': True}, {'ssl_ktls': True}],
+                    ids=['SSLSocket', 'MemoryBIO', 'kTLS'])
+    def peer(self, request):
+        peer = TLSPeer()
+        self.t = transport.Transport(
+            f'127.0.0.1:{peer.port}', 5, ssl={'cert_reqs': ssl.CERT_NONE},
+            **request.param)
+        self.t.connect()
+        yield peer.accept()
+        # not to wait for the close_notify reply of the peer.
+        peer.close()
+        self.t.close()
+
+    def test_transport_class(self, peer):
+        if isinstance(self.t, transport.SSLBIOTransport):
+            assert not isinstance(self.t.sock, ssl.SSLSocket)
+            return
+        assert isinstance(self.t.sock, ssl.SSLSocket)
+        if not self.t.ssl_ktls:
+            assert not self.t.ktls_send and not self.t.ktls_recv
+            return
+        reason = ktls_unsupported()
+        if reason:
+            pytest.skip(reason)
+        assert self.t.ktls_send
+        assert self.t.ktls_recv
+
+    def test_read_frame(self, peer):
+        payloads = [os.urandom(size) for size in (0, 3, 20000, 200000, 7)]
+        peer.sendall(b''.join(
+            pack('>BHI', 3, 1, len(payload)) + payload + b'\xce'
+            for payload in payloads))
+        for payload in payloads:
+            assert self.t.read_frame() == (3, 1, payload)
+
+    def test_read_frame__timeout(self, peer):
+        frame = pack('>BHI', 1, 1, 3) + b'foo\xce'
+        peer.sendall(frame[:5])
+        with pytest.raises(socket.timeout):
+            with self.t.having_timeout(0.01):
+                self.t.read_frame()
+        peer.sendall(frame[5:])
+        with self.t.having_timeout(5):
+            assert self.t.read_frame() == (1, 1, b'foo')
+
+    def test_read_frame__body_target(self, peer):
+        # bodies larger than the ciphertext and plaintext buffers.
+        payloads = [os.urandom(size) for size in (3, 200000, 7)]
+        peer.sendall(b''.join(
+            pack('>BHI', 3, 1, len(payload)) + payload + b'\xce'
+            for payload in payloads))
+        targets = []
+
+        def body_target(channel, size):
+            targets.append(bytearray(size))
+            return targets[-1]
+        self.t.body_target = body_target
+        for payload in payloads:
+            frame = self.t.read_frame()
+            assert frame[:2] == (3, 1)
+            assert frame[2] is targets[-1]
+            assert frame[2] == payload
+
+    def test_write(self, peer):
+        body = os.urandom(100000)
+        self.t.write(b'foo')
+        self.t.writev([b'bar', memoryview(body)])
+        received = bytearray()
+        while len(received) < len(body) + 6:
+            received += peer.recv(65536)
+        assert received == b'foobar' + body
+
+    def test_write__queued(self, peer):
+        self.t.write_high_water, self.t.write_low_water = 65536, 16384
+        body = os.urandom(1 << 20)
+        received = bytearray()
+
+        def reader():
+            while len(received) < len(body):
+                received.extend(peer.recv(65536))
+        thread = threading.Thread(target=reader)
+        thread.start()
+        self.t.write(body[:1000])
+        self.t.write(body[1000:])
+        self.t.flush()
+        thread.join(5)
+        assert received == body
+        assert self.t.writable
+
+    def test_sendfile(self, peer, tmp_path):
+        body = os.urandom(100000)
+        path = tmp_path / 'body'
+        path.write_bytes(body)
+        with open(path, 'rb') as f:
+            self.t.sendfile(f, 10, len(body) - 10)
+        received = bytearray()
+        while len(received) < len(body) - 10:
+            received += peer.recv(65536)
+        assert received == body[10:]
+
+    def test_sendfile__deadline(self, peer, tmp_path):
+        # more than the socket buffers take before the peer reads.
+        body = os.urandom(1 << 22)
+        path = tmp_path / 'body'
+        path.write_bytes(body)
+        received = bytearray()
+
+        def reader():
+            while len(received) < len(body):
+                received.extend(peer.recv(65536))
+        thread = threading.Timer(0.1, reader)
+        thread.start()
+        timeout = self.t.sock.gettimeout()
+        with open(path, 'rb') as f, self.t.having_timeout(5):
+            self.t.sendfile(f, 0, len(body))
+        thread.join(5)
+        assert received == body
+        assert self.t.sock.gettimeout() == timeout
+
+    def test_receive_available(self, peer):
+        peer.sendall(pack('>BHI', 8, 0, 0) + b'\xce')
+        assert transport._wait_for_socket(self.t.sock, True, timeout=5)[0]
+        while self.t.read_buffered_frame() is None:
+            self.t.receive_available()
+        assert self.t.read_buffered_frame() is None
+        assert self.t.receive_available() == 0
+
+    def test_close(self, peer):
+        closing = threading.Thread(target=self.t.close)
+        closing.start()
+        assert peer.recv(1) == b''
+        peer.close()
+        closing.join(5)
+        assert not self.t.connected
+
+
+class test_TLS_partial_record:
+    """TLS records reaching the client in several parts."""
+
+    @pytest.fixture(params=[{}, {'ssl_memory_bio': True}, {'ssl_ktls': True}],
+                    ids=['SSLSocket', 'MemoryBIO', 'kTLS'])
+    def peer(self, request):
+        listener = socket.create_server(('127.0.0.1', 0))
+        accepted = queue.Queue()
+        threading.Thread(
+            target=lambda: accepted.put(listener.accept()[0]),
+            daemon=True).start()
+        self.t = transport.Transport(
+            '127.0.0.1:{}'.format(listener.getsockname()[1]), 5,
+            ssl={'cert_reqs': ssl.CERT_NONE}, **request.param)
+        handshake = threading.Thread(target=self.t.connect)
+        handshake.start()
+        self.raw = accepted.get(timeout=5)
+        self.incoming, self.outgoing = ssl.MemoryBIO(), ssl.MemoryBIO()
+        self.sslobj = TLSPeer.server_context().wrap_bio(
+            self.incoming, self.outgoing, server_side=True)
+        while True:
+            try:
+                self.sslobj.do_handshake()
+            except ssl.SSLWantReadError:
+                self.raw.sendall(self.outgoing.read())
+                self.incoming.write(self.raw.recv(65536))
+            else:
+                break
+        self.raw.sendall(self.outgoing.read())
+        handshake.join(5)
+        yield
+        # not to wait for the close_notify reply of the peer.
+        self.raw.close()
+        listener.close()
+        self.t.close()
+
+    def test_read_frame__deadline(self, peer):
+        frame = pack('>BHI', 1, 1, 3) + b'foo\xce'
+        self.sslobj.write(frame)
+        record = self.outgoing.read()
+        self.raw.sendall(record[:10])
+        # without the deadline, the read would return once this is sent.
+        rest = threading.Timer(1, self.raw.sendall, (record[10:],))
+        rest.start()
+        try:
+            start = monotonic()
+            with pytest.raises(socket.timeout):
+                with self.t.having_timeout(0.05):
+                    self.t.read_frame()
+            assert monotonic() - start < 0.9
+        finally:
+            rest.join()
+        with self.t.having_timeout(5):
+            assert self.t.read_frame() == (1, 1, b'foo')
+
+
+class test_TLS_session_resumption:
+
+    @pytest.mark.parametrize('ssl_memory_bio', [False, True])
+    def test_reconnect(self, ssl_memory_bio):
+        cache = transport.TLSSessionCache()
+        peer = TLSPeer(connections=3)
+        try:
+            for resumed in (False, True, True):
+                t = transport.Transport(
+                    f'127.0.0.1:{peer.port}', 5,
+                    ssl={'cert_reqs': ssl.CERT_NONE},
+                    ssl_memory_bio=ssl_memory_bio, ssl_session_cache=cache)
+                t.connect()
+                sslobj = t._sslobj if ssl_memory_bio else t.sock
+                assert sslobj.session_reused == resumed
+                # TLS 1.3 tickets come after the handshake.
+                sock = peer.accept()
+                sock.sendall(pack('>BHI', 8, 0, 0) + b'\xce')
+                assert t.read_frame() == (8, 0, b'')
+                sock.close()
+                t.close()
+                assert len(cache) == 1
+        finally:
+            peer.close()
+
+    def test_shared_cache(self):
+        t = transport.SSLTransport('host', ssl_session_cache=True)
+        assert t.ssl_session_cache is transport.tls_session_cache
+        assert transport.SSLTransport('host').ssl_session_cache is None
+
+    def test_handshake_error__forgets_session(self):
+        cache = Mock(name='cache')
+        t = transport.SSLTransport(
+            'host:5671', 3, ssl={'server_hostname': 'sni'},
+            ssl_session_cache=cache)
+        t.sock = Mock(name='sock')
+        t._wrap_socket = Mock(return_value=t.sock)
+        t.sock.do_handshake.side_effect = ssl.SSLError()
+        with pytest.raises(ssl.SSLError):
+            t._setup_transport()
+        cache.discard.assert_called_with(('host', 5671, 'sni'))
+
+    def test_wrap_with_context__resumes(self):
+        cache = transport.TLSSessionCache()
+        session = Mock(name='session', has_ticket=True,
+                       ticket_lifetime_hint=60)
+        context = Mock(name='cached_context')
+        cache.put(('host', 5671, None), {}, context, session)
+        t = transport.SSLTransport('host:5671', ssl_session_cache=cache)
+        with patch('ssl.SSLContext') as SSLContext:
+            t._wrap_with_context(SSLContext(), sentinel.sock)
+        context.wrap_socket.assert_called_with(
+            sock=sentinel.sock, session=session)
+        SSLContext().wrap_socket.assert_not_called()
+
+        # server side sockets do not resume.
+        with patch('ssl.SSLContext') as SSLContext:
+            t._wrap_with_context(SSLContext(), sentinel.sock, server_side=True)
+        SSLContext().wrap_socket.assert_called_with(
+            sock=sentinel.sock, server_side=True)
+
+
+class test_TLSSessionCache:
+
+    def session(self, has_ticket=True, lifetime=7200):
+        return Mock(name='session', has_ticket=has_ticket, id=b'id',
+                    ticket_lifetime_hint=lifetime, timeout=lifetime)
+
+    def test_get_put(self):
+        cache = transport.TLSSessionCache()
+        session = self.session()
+        assert cache.get('key', {}) is None
+        cache.put('key', {'a': 1}, sentinel.context, session)
+        assert cache.get('key', {'a': 1}) == (sentinel.context, session)
+        # negotiated with other options.
+        assert cache.get('key', {'a': 2}) is None
+        assert not len(cache)
+
+    def test_expiry(self):
+        cache = transport.TLSSessionCache(ttl=60)
+        with patch('amqp.transport.monotonic', return_value=100):
+            cache.put('key', {}, sentinel.context, self.session())
+            cache.put('short', {}, sentinel.context,
+                      self.session(has_ticket=False, lifetime=10))
+        with patch('amqp.transport.monotonic', return_value=120):
+            assert cache.get('key', {}) is not None
+            assert cache.get('short', {}) is None
+        with patch('amqp.transport.monotonic', return_value=160):
+            assert cache.get('key', {}) is None
+
+    def test_eviction(self):
+        cache = transport.TLSSessionCache(maxsize=2)
+        for key in ('a', 'b'):
+            cache.put(key, {}, sentinel.context, self.session())
+        assert cache.get('a', {}) is not None
+        cache.put('c', {}, sentinel.context, self.session())
+        assert cache.get('b', {}) is None
+        assert cache.get('a', {}) is not None
+        assert cache.get('c', {}) is not None
+
+    def test_discard_clear(self):
+        cache = transport.TLSSessionCache()
+        cache.put('a', {}, sentinel.context, self.session())
+        cache.put('b', {}, sentinel.context, self.session())
+        cache.discard('a')
+        cache.discard('missing')
+        assert cache.get('a', {}) is None
+        cache.clear()
+        assert not len(cache)
+
+
+class test_SSLBIOTransport:
+
+    def test_Transport(self):
+        t = transport.Transport('host', ssl=True, ssl_memory_bio=True)
+        assert isinstance(t, transport.SSLBIOTransport)
+        t = transport.Transport('host', ssl=False, ssl_memory_bio=True)
+        assert isinstance(t, transport.TCPTransport)
+
+    def test_pending(self):
+        t = transport.SSLBIOTransport('host')
+        assert t.pending() == 0
+        t._sslobj = Mock(name='sslobj')
+        t._sslobj.pending.return_value = 3
+        assert t.pending() == 3
+
+    def test_read__peer_closed(self):
+        t = transport.SSLBIOTransport('host')
+        t._sslobj = Mock(name='sslobj')
+        t._sslobj.read.side_effect = ssl.SSLZeroReturnError()
+        t.connected = True
+        with pytest.raises(OSError, match='unexpectedly closed'):
+            t._read(7)
+        assert not t.connected
+
+
 class test_TCPTransport:
     class Transport(transport.TCPTransport):
 
@@ -919,12 +1674,166 @@ class test_TCPTransport:
         self.t._setup_transport()
         assert self.t._write is self.t.sock.sendall
         assert self.t._read_buffer is not None
-        assert self.t._quick_recv is self.t.sock.recv
+        assert self.t._quick_recv_into is self.t.sock.recv_into
+
+    def test_receive_available(self):
+        a, b = socket.socketpair()
+        try:
+            self.t.sock = a
+            self.t._setup_transport()
+            self.t.connected = True
+            assert self.t.receive_available() == 0
+            b.sendall(b'foo')
+            assert self.t.receive_available() == 3
+            assert bytes(self.t._read_buffer) == b'foo'
+            assert a.gettimeout() is None
+            b.close()
+            with pytest.raises(OSError):
+                self.t.receive_available()
+            assert not self.t.connected
+        finally:
+            a.close()
+            b.close()
+
+    def test_receive_available__without_MSG_DONTWAIT(self):
+        self.t.sock = Mock(name='socket')
+        self.t.sock.gettimeout.return_value = None
+        self.t.sock.recv_into.side_effect = BlockingIOError()
+        with patch('amqp.transport.MSG_DONTWAIT', 0):
+            assert self.t.receive_available() == 0
+        self.t.sock.settimeout.assert_has_calls([call(0), call(None)])
+
+    @pytest.fixture
+    def queued(self):
+        a, b = socket.socketpair()
+        a.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        b.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        self.changes = []
+        self.t = self.Transport(
+            'host', 3, write_high_water=65536,
+            on_writability_changed=self.changes.append)
+        self.t.sock = a
+        self.t._setup_transport()
+        self.t.connected = True
+        yield b
+        a.close()
+        b.close()
+
+    def receive_all(self, peer, size):
+        received = bytearray()
+        while len(received) < size:
+            self.t.send_queued()
+            received += peer.recv(65536)
+        return received
+
+    def test_write__queued(self, queued):
+        assert self.t.write_low_water == 16384
+        self.t.write(b'foo')
+        assert self.t.write_queue_size == 0
+        assert queued.recv(3) == b'foo'
+        assert self.t.writable
+        assert not self.changes
+
+    def test_write__backpressure(self, queued):
+        data = os.urandom(1 << 20)
+        self.t.write(data)
+        assert not self.t.writable
+        assert self.changes == [False]
+        assert 0 < self.t.write_queue_size <= len(data)
+        assert self.receive_all(queued, len(data)) == data
+        assert self.t.writable
+        assert self.changes == [False, True]
+        assert self.t.write_queue_size == 0
+
+    def test_write__not_writable_sends_down_to_low_water(self, queued):
+        self.t.writable = False
+        self.t._send_queued = Mock(name='_send_queued')
+        self.t.write(b'foo')
+        self.t._send_queued.assert_has_calls([call(True, 16384), call()])
+
+    def test_write__copies_mutable_buffers(self, queued):
+        self.t._send_queued = Mock(name='_send_queued')
+        buf = bytearray(b'foo')
+        self.t.write(buf)
+        buf[:] = b'bar'
+        assert self.t._write_queue[-1] == b'foo'
+
+    def test_writev__queued(self, queued):
+        self.t.writev([b'foo', memoryview(b'bar'), b'baz'])
+        assert self.receive_all(queued, 9) == b'foobarbaz'
+
+    def test_flush__sends_queue(self, queued):
+        data = os.urandom(1 << 18)
+        self.t.write(data)
+        received = bytearray()
+
+        def reader():
+            while len(received) < len(data):
+                received.extend(queued.recv(65536))
+        thread = threading.Thread(target=reader)
+        thread.start()
+        self.t.flush()
+        thread.join(5)
+        assert received == data
+        assert self.t.write_queue_size == 0
+
+    def test_read_frame__sends_queue_until_readable(self, queued):
+        data = os.urandom(1 << 20)
+        self.t.write(data)
+        queued.sendall(pack('>BHI', 8, 0, 0) + b'\xce')
+        assert self.t.read_frame() == (8, 0, b'')
+        assert self.t.write_queue_size
+
+    def test_read_frame__queue_timeout(self, queued):
+        self.t.write(os.urandom(1 << 20))
+        with pytest.raises(socket.timeout):
+            with self.t.having_timeout(0.01):
+                self.t.read_frame()
+
+    @pytest.fixture
+    def peer(self):
+        a, b = socket.socketpair()
+        self.t.sock = a
+        self.t._setup_transport()
+        self.t.connected = True
+        yield b
+        a.close()
+        b.close()
+
+    def test_read_frame__deadline(self, peer):
+        frame = pack('>BHI', 1, 1, 3) + b'foo\xce'
+        peer.sendall(frame[:5])
+        with pytest.raises(socket.timeout):
+            with self.t.having_timeout(0.01):
+                self.t.read_frame()
+        assert self.t.sock.gettimeout() is None
+        assert self.t.connected
+        peer.sendall(frame[5:])
+        with self.t.having_timeout(1):
+            assert self.t.read_frame() == (1, 1, b'foo')
+
+    def test_write__deadline(self, peer):
+        peer.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        with self.t.having_timeout(1):
+            self.t.write(b'foo')
+            self.t.writev([b'bar', memoryview(b'baz')])
+        assert peer.recv(9) == b'foobarbaz'
+        with pytest.raises(socket.timeout):
+            with self.t.having_timeout(0.01):
+                self.t.write(os.urandom(1 << 22))
+        assert self.t.sock.gettimeout() is None
+
+    def test_writev__deadline(self, peer):
+        peer.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        with pytest.raises(socket.timeout):
+            with self.t.having_timeout(0.01):
+                self.t.writev([b'head', memoryview(os.urandom(1 << 22))])
+        assert self.t.sock.gettimeout() is None
 
     def test_read_EOF(self):
         self.t.sock = Mock(name='socket')
         self.t.connected = True
-        self.t._quick_recv = Mock(name='recv', return_value='')
+        self.t._quick_recv_into = Mock(name='recv_into', return_value=0)
         with pytest.raises(IOError,
                            match=r'.*Server unexpectedly closed connection.*'):
             self.t._read(64)
@@ -935,9 +1844,7 @@ class test_TCPTransport:
         See https://github.com/celery/py-amqp/issues/320
         """
 
-        self.t._quick_recv = Mock()
-
-        self.t._quick_recv.side_effect = [
+        self.t._quick_recv_into = recv_into_from([
             pack('>BHI', 1, 1, 16),
             socket.error(
                 10035,
@@ -946,7 +1853,7 @@ class test_TCPTransport:
             ),
             b'thequickbrownfox',
             b'\xce'
-        ]
+        ])
 
         monkeypatch.setattr(os, 'name', 'nt')
         monkeypatch.setattr(errno, 'EWOULDBLOCK', 10035)
@@ -964,3 +1871,253 @@ class test_TCPTransport:
         assert frame_type == 1
         assert channel == 1
         assert payload == b'thequickbrownfox'
+
+    def test_read__many_frames_single_recv(self):
+        frames = [pack('>BHI', 1, 1, 3) + b'foo\xce',
+                  pack('>BHI', 3, 2, 5) + b'hello\xce']
+        self.t._quick_recv_into = recv_into_from([b''.join(frames)])
+        assert self.t.read_frame() == (1, 1, b'foo')
+        assert self.t.read_frame() == (3, 2, b'hello')
+        assert self.t._quick_recv_into.call_count == 1
+        assert len(self.t._read_buffer) == 0
+
+    def test_writev__sendmsg(self):
+        self.t.sock = Mock(name='socket')
+        sent = []
+
+        def sendmsg(buffers):
+            # accept at most 4 bytes per call.
+            data = b''.join(buffers)[:4]
+            sent.append(data)
+            return len(data)
+        self.t.sock.sendmsg.side_effect = sendmsg
+        body = memoryview(b'thequickbrownfox')
+        self.t.writev([b'\x03', b'', body[:8], body[8:], b'\xce'])
+        assert b''.join(sent) == b'\x03thequickbrownfox\xce'
+
+    def test_writev__deadline_sendmsg(self):
+        self.t.sock = Mock(name='socket')
+        self.t.sock.sendmsg.side_effect = [BlockingIOError(), 3, 10, 6]
+        self.t._wait_writable = Mock(name='_wait_writable')
+        body = memoryview(b'thequickbrownfox')
+        with self.t.having_timeout(5):
+            self.t.writev([b'foo', body])
+        self.t._wait_writable.assert_called_once_with()
+        calls = self.t.sock.sendmsg.call_args_list
+        assert calls[2][0][0] == [body]
+        assert calls[2][0][0][0] is body
+        assert bytes(calls[3][0][0][0]) == b'brownfox'[2:]
+
+    def test_writev__iov_max(self):
+        self.t.sock = Mock(name='socket')
+        self.t.sock.sendmsg.side_effect = lambda bufs: sum(map(len, bufs))
+        self.t._writev([b'a'] * 5, iov_max=2)
+        assert [len(c[0][0]) for c in self.t.sock.sendmsg.call_args_list] == [
+            2, 2, 1]
+
+    def test_sendfile(self):
+        self.t.sock = Mock(name='socket')
+        self.t.sock.sendfile.return_value = 3
+        f = Mock(name='file')
+        self.t.sendfile(f, 2, 3)
+        self.t.sock.sendfile.assert_called_once_with(f, 2, 3)
+
+    def test_sendfile__short(self):
+        self.t.sock = Mock(name='socket')
+        self.t.sock.sendfile.return_value = 1
+        with pytest.raises(ValueError):
+            self.t.sendfile(Mock(name='file'), 2, 3)
+
+    def test_writev__no_sendmsg(self, patching):
+        patching('amqp.transport.HAS_SENDMSG', False)
+        self.t.sock = Mock(name='socket')
+        self.t._write = Mock(name='sendall')
+        self.t.writev([b'foo', b'bar'])
+        self.t._write.assert_called_once_with(b'foobar')
+        self.t.sock.sendmsg.assert_not_called()
+
+    def test_read_buffered_frame(self):
+        frame = pack('>BHI', 1, 1, 3) + b'foo\xce'
+        self.t._quick_recv_into = recv_into_from([frame + frame[:5]])
+        assert self.t.read_frame() == (1, 1, b'foo')
+        assert self.t.read_buffered_frame() is None
+        assert len(self.t._read_buffer) == 5
+        self.t._quick_recv_into = recv_into_from([frame[5:] + frame])
+        assert self.t.read_frame() == (1, 1, b'foo')
+        assert self.t.read_buffered_frame() == (1, 1, b'foo')
+        assert self.t.read_buffered_frame() is None
+        assert self.t._quick_recv_into.call_count == 1
+
+    def test_read_buffered_frame__bad_frame_end(self):
+        data = pack('>BHI', 1, 1, 3) + b'foo\x13'
+        self.t._read_buffer.unread(data)
+        with pytest.raises(UnexpectedFrame):
+            self.t.read_buffered_frame()
+
+    def test_read_frame__zero_copy_body(self):
+        self.t.zero_copy_body = True
+        frames = pack('>BHI', 1, 1, 3) + b'foo\xce'
+        frames += pack('>BHI', 3, 1, 3) + b'bar\xce'
+        self.t._quick_recv_into = recv_into_from([frames + frames])
+        method = self.t.read_frame()[2]
+        body = self.t.read_frame()[2]
+        assert isinstance(method, bytes)
+        assert isinstance(body, memoryview) and body == b'bar'
+        method = self.t.read_buffered_frame()[2]
+        body = self.t.read_buffered_frame()[2]
+        assert isinstance(method, bytes)
+        assert isinstance(body, memoryview) and body == b'bar'
+
+    def test_read_frame__body_target(self):
+        dest = bytearray(8)
+        self.t.body_target = Mock(
+            name='body_target', return_value=memoryview(dest)[2:8])
+        header = pack('>BHI', 3, 1, 6)
+        self.t._quick_recv_into = recv_into_from(
+            [header + b'fo', b'obar', b'\xce'])
+        frame_type, channel, payload = self.t.read_frame()
+        self.t.body_target.assert_called_once_with(1, 6)
+        assert payload.obj is dest
+        assert dest == b'\0\0foobar'
+
+    def test_read_frame__body_target_timeout(self):
+        dest = bytearray(6)
+        self.t.body_target = Mock(name='body_target', return_value=dest)
+        frame = pack('>BHI', 3, 1, 6) + b'foobar\xce'
+        self.t._quick_recv_into = recv_into_from(
+            [frame[:9], b'ob', socket.timeout()])
+        with pytest.raises(socket.timeout):
+            self.t.read_frame()
+        assert bytes(self.t._read_buffer) == frame[:11]
+        self.t._quick_recv_into = recv_into_from([b'ar', b'\xce'])
+        assert self.t.read_frame() == (3, 1, dest)
+        assert dest == b'foobar'
+
+    def test_read_buffered_frame__body_target(self):
+        dest = bytearray(3)
+        self.t.body_target = Mock(name='body_target', return_value=dest)
+        self.t._read_buffer.unread(pack('>BHI', 3, 1, 3) + b'foo\xce')
+        assert self.t.read_buffered_frame() == (3, 1, dest)
+        assert dest == b'foo'
+
+    def test_read_frame__no_body_target(self):
+        self.t.body_target = Mock(name='body_target', return_value=None)
+        self.t._quick_recv_into = recv_into_from(
+            [pack('>BHI', 3, 1, 3) + b'foo\xce'])
+        assert self.t.read_frame() == (3, 1, b'foo')
+
+    def test_read__EINTR_retries(self):
+        exc = OSError()
+        exc.errno = errno.EINTR
+        self.t._quick_recv_into = recv_into_from([exc, b'abc'])
+        assert self.t._read(3) == b'abc'
+
+    def test_read__initial_EINTR_raises_timeout(self):
+        exc = OSError()
+        exc.errno = errno.EINTR
+        self.t._quick_recv_into = recv_into_from([exc])
+        with pytest.raises(socket.timeout):
+            self.t._read(3, initial=True)
+
+
+class test_RecvBuffer:
+
+    def fill(self, rbuf, data):
+        view = rbuf.reserve(len(data))
+        view[:len(data)] = data
+        rbuf.commit(len(data))
+
+    def test_consume(self):
+        rbuf = transport.RecvBuffer(16)
+        self.fill(rbuf, b'foobarbaz')
+        assert len(rbuf) == 9
+        assert rbuf.consume(3) == b'foo'
+        assert bytes(rbuf) == b'barbaz'
+        assert rbuf.consume(6) == b'barbaz'
+        assert len(rbuf) == 0
+        assert rbuf.start == rbuf.end == 0
+
+    def test_reserve__compacts(self):
+        rbuf = transport.RecvBuffer(16)
+        self.fill(rbuf, b'x' * 12 + b'abcd')
+        rbuf.consume(12)
+        view = rbuf.reserve(8)
+        assert rbuf.start == 0
+        assert len(view) == 12
+        assert bytes(rbuf) == b'abcd'
+        assert rbuf.capacity == 16
+
+    def test_reserve__grows(self):
+        rbuf = transport.RecvBuffer(16)
+        self.fill(rbuf, b'abcd')
+        rbuf.reserve(100)
+        assert rbuf.capacity >= 100
+        assert bytes(rbuf) == b'abcd'
+
+    def test_clear__releases_large_buffer(self, patching):
+        patching('amqp.transport.RECV_BUFFER_MAX_IDLE', 32)
+        rbuf = transport.RecvBuffer(16)
+        self.fill(rbuf, b'x' * 64)
+        rbuf.consume(64)
+        assert rbuf.capacity == 16
+
+    def test_consume_view(self):
+        rbuf = transport.RecvBuffer(16)
+        self.fill(rbuf, b'foobar')
+        view = rbuf.consume_view(3)
+        assert isinstance(view, memoryview) and view.readonly
+        assert view == b'foo'
+        assert rbuf.exported
+        assert rbuf.consume(3) == b'bar'
+        # the region handed out is not reused
+        self.fill(rbuf, b'bazbaz')
+        assert rbuf.start == 6
+        assert view == b'foo'
+
+    def test_consume_view__never_overwritten(self):
+        rbuf = transport.RecvBuffer(16)
+        self.fill(rbuf, b'x' * 10 + b'abc')
+        view = rbuf.consume_view(10)
+        first = rbuf._buf
+        self.fill(rbuf, b'd' * 8)
+        assert rbuf._buf is not first
+        assert bytes(rbuf) == b'abc' + b'd' * 8
+        assert view == b'x' * 10
+        assert not rbuf.exported
+
+    def test_consume_view__retired_buffer_reused(self):
+        rbuf = transport.RecvBuffer(16)
+        self.fill(rbuf, b'x' * 16)
+        view = rbuf.consume_view(16)
+        first = rbuf._buf
+        self.fill(rbuf, b'y' * 16)
+        assert rbuf._buf is not first
+        assert rbuf._retired == [first]
+        rbuf.consume_view(16)
+        self.fill(rbuf, b'z')
+        # the first buffer is still referenced by view.
+        assert rbuf._buf is not first
+        del view
+        rbuf.consume_view(1)
+        self.fill(rbuf, b'w' * 16)
+        assert rbuf._buf is first
+
+    def test_unread__exported(self):
+        rbuf = transport.RecvBuffer(16)
+        self.fill(rbuf, b'foobar')
+        view = rbuf.consume_view(6)
+        rbuf.unread(b'baz')
+        assert bytes(rbuf) == b'baz'
+        assert view == b'foobar'
+
+    def test_unread(self):
+        rbuf = transport.RecvBuffer(16)
+        self.fill(rbuf, b'foobar')
+        head = rbuf.consume(3)
+        rbuf.unread(head)
+        assert bytes(rbuf) == b'foobar'
+        rbuf.consume(6)
+        rbuf.unread(b'foo')
+        assert bytes(rbuf) == b'foo'
+        self.fill(rbuf, b'bar')
+        assert rbuf.consume(6) == b'foobar'